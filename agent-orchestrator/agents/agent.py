@@ -1,13 +1,26 @@
+import asyncio
+import logging
+import time
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import update
 
 from agents.tools import registry
+from agents.unit_of_work import StepUnitOfWork
+from api.config import settings
 from api.database import get_session
-from api.models import ShortTermMemory, Task, TaskStep, TaskStatus, ToolCall
-from memory.long_term import LongTermMemoryStore
-from memory.short_term import ShortTermMemoryStore
+from api.events import event_bus
+from api.ledger import meter
+from api.models import Task, TaskStep, TaskStatus, ToolCall
+from llm.providers import CompletionRequest, providers
+from memory.short_term import short_term_store
+
+logger = logging.getLogger(f"{settings.app_name}.agent")
+
+
+class LongTermMemoryDisabled(RuntimeError):
+    pass
 
 
 @dataclass
@@ -15,28 +28,120 @@ class AgentContext:
     task_id: int
     step_id: int
     agent_type: str
+    unit_of_work: Optional[StepUnitOfWork] = None
+
+
+class DeltaPublisher:
+    def __init__(self, task_id: int, step_id: int, flush_interval: float) -> None:
+        self.task_id = task_id
+        self.step_id = step_id
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._sequence = 0
+        self._flushed_at = time.monotonic()
+
+    async def write(self, text: str) -> None:
+        self._buffer.append(text)
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        self._flushed_at = time.monotonic()
+        if not self._buffer:
+            return
+        text, self._buffer = "".join(self._buffer), []
+        await event_bus.publish(
+            self.task_id, "llm.delta", {"step_id": self.step_id, "sequence": self._sequence, "text": text}
+        )
+        self._sequence += 1
 
 
 class AgentBase:
+    role = "general-purpose assistant"
+
     def __init__(self, context: AgentContext) -> None:
         self.context = context
-        self.short_term = ShortTermMemoryStore()
-        self.long_term = LongTermMemoryStore()
+        self.short_term = short_term_store
 
     async def run(self, instruction: str) -> None:
         await self.record_memory("last_instruction", instruction)
         if "remember" in instruction.lower():
-            await self.long_term.add_text(instruction, {"task_id": self.context.task_id})
-        if "calculate" in instruction.lower():
-            await self.call_tool("calculator", {"expression": "1 + 1"})
+            await self.remember(instruction)
+        calls = self.tool_calls(instruction)
+        if calls:
+            await self.call_tools(calls)
+        output = await self.generate(instruction)
+        if output is not None:
+            await self.record_memory("output", output)
         await self.record_memory("last_status", "completed")
 
+    def tool_calls(self, instruction: str) -> List[Tuple[str, Dict[str, Any]]]:
+        calls: List[Tuple[str, Dict[str, Any]]] = []
+        if "calculate" in instruction.lower():
+            calls.append(("calculator", {"expression": "1 + 1"}))
+        return calls
+
+    def build_prompt(self, instruction: str) -> str:
+        return f"You are a {self.role}.\nTask: {instruction}\nResponse:"
+
+    async def generate(self, instruction: str) -> Optional[str]:
+        provider = providers.for_agent(self.context.agent_type)
+        if provider is None:
+            return None
+        unit_of_work = self.context.unit_of_work
+        if unit_of_work is not None:
+            await unit_of_work.check_budget()
+        request = CompletionRequest(
+            prompt=self.build_prompt(instruction),
+            max_tokens=settings.llm_max_tokens,
+            temperature=settings.llm_temperature,
+        )
+        if settings.llm_stream:
+            publisher = DeltaPublisher(
+                self.context.task_id, self.context.step_id, settings.llm_stream_flush_ms / 1000
+            )
+            completion = await provider.stream(request, publisher.write)
+            await publisher.flush()
+        else:
+            completion = await provider.complete(request)
+        if unit_of_work is not None:
+            unit_of_work.record_usage(
+                "llm",
+                f"{completion.provider}/{completion.model}",
+                meter(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens),
+            )
+        return completion.text
+
     async def record_memory(self, key: str, value: str) -> None:
-        await self.short_term.write(self.context.task_id, key, value)
+        await self.short_term.write(self.context.task_id, key, value, self.context.step_id)
+
+    async def remember(self, text: str) -> None:
+        if not settings.ml_enabled:
+            logger.warning("long_term_write_rejected task_id=%s reason=ml_disabled", self.context.task_id)
+            raise LongTermMemoryDisabled("Long-term memory writes need ML_ENABLED=true; this worker runs without it")
+        from memory.long_term import load_long_term_store
+
+        long_term = await load_long_term_store()
+        await long_term.add_text(text, {"task_id": self.context.task_id})
 
     async def call_tool(self, tool_name: str, arguments: Dict[str, Any]) -> str:
         registry.validate(tool_name)
-        response = registry.call(tool_name, arguments)
+        unit_of_work = self.context.unit_of_work
+        if unit_of_work is not None:
+            await unit_of_work.check_budget()
+        started = time.perf_counter()
+        result = await registry.execute(tool_name, arguments)
+        if unit_of_work is not None:
+            unit_of_work.record_tool_call(self.context.agent_type, tool_name, arguments, result.cached)
+            unit_of_work.record_usage(
+                "tool",
+                tool_name,
+                meter(
+                    compute_seconds=time.perf_counter() - started,
+                    base_cost=0.0 if result.cached else settings.tool_costs.get(tool_name, 0.0),
+                ),
+            )
+            return result.output
         async with get_session() as session:
             session.add(
                 ToolCall(
@@ -44,19 +149,33 @@ class AgentBase:
                     agent_type=self.context.agent_type,
                     tool_name=tool_name,
                     arguments=arguments,
+                    cached=result.cached,
                 )
             )
             await session.commit()
-        return response
+        return result.output
+
+    async def call_tools(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        results = await asyncio.gather(
+            *(self.call_tool(tool_name, arguments) for tool_name, arguments in calls), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return list(results)
 
 
 class ResearchAgent(AgentBase):
+    role = "research agent that investigates the task and summarizes its findings"
+
     async def run(self, instruction: str) -> None:
         await self.record_memory("research_note", f"Reviewed: {instruction}")
         await super().run(instruction)
 
 
 class BuilderAgent(AgentBase):
+    role = "builder agent that turns the task into concrete implementation steps"
+
     async def run(self, instruction: str) -> None:
         await self.record_memory("build_note", f"Executing: {instruction}")
         await super().run(instruction)
@@ -68,8 +187,13 @@ class GeneralAgent(AgentBase):
         await super().run(instruction)
 
 
-async def resolve_agent(step: TaskStep) -> AgentBase:
-    context = AgentContext(task_id=step.task_id, step_id=step.id, agent_type=step.agent_type)
+async def resolve_agent(step: TaskStep, unit_of_work: Optional[StepUnitOfWork] = None) -> AgentBase:
+    context = AgentContext(
+        task_id=step.task_id,
+        step_id=step.id,
+        agent_type=step.agent_type,
+        unit_of_work=unit_of_work,
+    )
     if step.agent_type == "research":
         return ResearchAgent(context)
     if step.agent_type == "builder":
@@ -77,28 +201,13 @@ async def resolve_agent(step: TaskStep) -> AgentBase:
     return GeneralAgent(context)
 
 
-async def update_cost(task_id: int, step_id: int, delta: float) -> None:
-    async with get_session() as session:
-        result = await session.execute(select(Task).where(Task.id == task_id))
-        task = result.scalar_one()
-        task.cost += delta
-        step_result = await session.execute(select(TaskStep).where(TaskStep.id == step_id))
-        step = step_result.scalar_one()
-        step.cost += delta
-        await session.commit()
-
-
 async def mark_step_status(step_id: int, status: TaskStatus) -> None:
     async with get_session() as session:
-        result = await session.execute(select(TaskStep).where(TaskStep.id == step_id))
-        step = result.scalar_one()
-        step.status = status
+        await session.execute(update(TaskStep).where(TaskStep.id == step_id).values(status=status))
         await session.commit()
 
 
 async def mark_task_status(task_id: int, status: TaskStatus) -> None:
     async with get_session() as session:
-        result = await session.execute(select(Task).where(Task.id == task_id))
-        task = result.scalar_one()
-        task.status = status
+        await session.execute(update(Task).where(Task.id == task_id).values(status=status))
         await session.commit()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import redis.asyncio as redis
+
+from api.config import settings
+from api.metrics import metrics
+
+logger = logging.getLogger(f"{settings.app_name}.tool_cache")
+
+
+def tool_cache_key(tool_name: str, arguments: Dict[str, Any]) -> str:
+    canonical = json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{tool_name}\0{canonical}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ToolCacheStats:
+    hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class ToolResultCache:
+    def __init__(self, max_entries: int, redis_url: Optional[str] = None, prefix: str = "tool_cache") -> None:
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self.redis = redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        self.stats = ToolCacheStats()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: str, output: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    async def get(self, tool_name: str, arguments: Dict[str, Any]) -> Optional[str]:
+        key = tool_cache_key(tool_name, arguments)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, output = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                metrics.inc("tool_cache_hits_total", tool=tool_name, tier="memory")
+                return output
+            del self._entries[key]
+            self.stats.expirations += 1
+        if self.redis is not None:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    output, ttl_ms = await pipe.get(f"{self.prefix}:{key}").pttl(f"{self.prefix}:{key}").execute()
+            except redis.RedisError as exc:
+                logger.warning("tool_cache_redis_unavailable tool=%s error=%s", tool_name, exc)
+                output = None
+            if output is not None and ttl_ms > 0:
+                self._remember(key, output, time.monotonic() + ttl_ms / 1000)
+                self.stats.redis_hits += 1
+                metrics.inc("tool_cache_hits_total", tool=tool_name, tier="redis")
+                return output
+        self.stats.misses += 1
+        metrics.inc("tool_cache_misses_total", tool=tool_name)
+        return None
+
+    async def put(self, tool_name: str, arguments: Dict[str, Any], output: str, ttl: float) -> None:
+        key = tool_cache_key(tool_name, arguments)
+        self._remember(key, output, time.monotonic() + ttl)
+        if self.redis is not None:
+            try:
+                await self.redis.set(f"{self.prefix}:{key}", output, px=max(1, int(ttl * 1000)))
+            except redis.RedisError as exc:
+                logger.warning("tool_cache_redis_unavailable tool=%s error=%s", tool_name, exc)
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            await self.redis.close()
+
+
+tool_cache = ToolResultCache(
+    settings.tool_cache_size,
+    redis_url=settings.redis_url if settings.tool_cache_redis else None,
+)
@@ -1,30 +1,229 @@
+import ast
+import asyncio
+import multiprocessing
+import operator
+import resource
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Optional
+
+from agents.tool_cache import ToolResultCache, tool_cache
+from api.config import settings
+from api.metrics import metrics
+
+TOOL_MODES = ("inline", "async", "thread", "process")
+
+
+class ToolExecutionError(RuntimeError):
+    pass
+
+
+class ToolTimeoutError(ToolExecutionError):
+    pass
 
 
 @dataclass(frozen=True)
 class Tool:
     name: str
-    handler: Callable[[Dict[str, Any]], str]
+    handler: Callable[[Dict[str, Any]], Any]
+    mode: str = "thread"
+    timeout: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    memory_limit_mb: Optional[int] = None
+    cpu_time_limit: Optional[int] = None
+    cache_ttl: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        if self.mode not in TOOL_MODES:
+            raise ValueError(f"Unknown tool mode '{self.mode}'")
+
+
+def _run_with_limits(
+    handler: Callable[[Dict[str, Any]], str],
+    arguments: Dict[str, Any],
+    memory_limit_mb: Optional[int],
+    cpu_time_limit: Optional[int],
+) -> str:
+    previous = {limit: resource.getrlimit(limit) for limit in (resource.RLIMIT_AS, resource.RLIMIT_CPU)}
+    if memory_limit_mb is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_mb * 1024 * 1024, previous[resource.RLIMIT_AS][1]))
+    if cpu_time_limit is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_time_limit, previous[resource.RLIMIT_CPU][1]))
+    try:
+        return handler(arguments)
+    finally:
+        for limit, values in previous.items():
+            resource.setrlimit(limit, values)
+
+
+@dataclass
+class ToolResult:
+    output: str
+    cached: bool = False
 
 
 class ToolRegistry:
-    def __init__(self) -> None:
+    def __init__(self, cache: Optional[ToolResultCache] = None) -> None:
+        self.cache = cache
         self._tools: Dict[str, Tool] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
 
     def register(self, tool: Tool) -> None:
         self._tools[tool.name] = tool
+        self._semaphores.pop(tool.name, None)
 
     def validate(self, tool_name: str) -> None:
         if tool_name not in self._tools:
             raise ValueError(f"Tool '{tool_name}' is not registered")
 
-    def call(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+    def _executor(self, mode: str) -> Executor:
+        if mode == "thread":
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=settings.tool_thread_workers, thread_name_prefix="tool"
+                )
+            return self._thread_pool
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=settings.tool_process_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return self._process_pool
+
+    def _semaphore(self, tool: Tool) -> Optional[asyncio.Semaphore]:
+        if tool.max_concurrency is None:
+            return None
+        if tool.name not in self._semaphores:
+            self._semaphores[tool.name] = asyncio.Semaphore(tool.max_concurrency)
+        return self._semaphores[tool.name]
+
+    async def _invoke(self, tool: Tool, arguments: Dict[str, Any]) -> str:
+        if tool.mode == "inline":
+            return tool.handler(arguments)
+        if tool.mode == "async":
+            return await tool.handler(arguments)
+        loop = asyncio.get_running_loop()
+        if tool.mode == "thread":
+            return await loop.run_in_executor(self._executor("thread"), tool.handler, arguments)
+        try:
+            return await loop.run_in_executor(
+                self._executor("process"),
+                _run_with_limits,
+                tool.handler,
+                arguments,
+                tool.memory_limit_mb,
+                tool.cpu_time_limit,
+            )
+        except BrokenProcessPool as exc:
+            self._process_pool = None
+            raise ToolExecutionError(f"Tool '{tool.name}' exceeded its resource limits") from exc
+        except MemoryError as exc:
+            raise ToolExecutionError(f"Tool '{tool.name}' exceeded its memory limit") from exc
+
+    async def execute(self, tool_name: str, arguments: Dict[str, Any]) -> ToolResult:
+        started = time.perf_counter()
+        result = await self._execute(tool_name, arguments)
+        metrics.observe(
+            "tool_call_duration_seconds",
+            time.perf_counter() - started,
+            tool=tool_name,
+            cached=str(result.cached).lower(),
+        )
+        return result
+
+    async def _execute(self, tool_name: str, arguments: Dict[str, Any]) -> ToolResult:
         self.validate(tool_name)
-        return self._tools[tool_name].handler(arguments)
+        tool = self._tools[tool_name]
+        if tool.cache_ttl is None or self.cache is None:
+            return ToolResult(output=await self._run(tool, arguments))
+        output = await self.cache.get(tool_name, arguments)
+        if output is not None:
+            return ToolResult(output=output, cached=True)
+        output = await self._run(tool, arguments)
+        await self.cache.put(tool_name, arguments, output, tool.cache_ttl)
+        return ToolResult(output=output)
+
+    async def call(self, tool_name: str, arguments: Dict[str, Any]) -> str:
+        return (await self.execute(tool_name, arguments)).output
+
+    async def _run(self, tool: Tool, arguments: Dict[str, Any]) -> str:
+        timeout = tool.timeout if tool.timeout is not None else settings.tool_timeout
+        semaphore = self._semaphore(tool)
+        try:
+            if semaphore is None:
+                return await asyncio.wait_for(self._invoke(tool, arguments), timeout=timeout)
+            async with semaphore:
+                return await asyncio.wait_for(self._invoke(tool, arguments), timeout=timeout)
+        except asyncio.TimeoutError as exc:
+            raise ToolTimeoutError(f"Tool '{tool.name}' timed out after {timeout}s") from exc
+
+    async def close(self) -> None:
+        if self.cache is not None:
+            await self.cache.close()
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+
+registry = ToolRegistry(cache=tool_cache)
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_MAX_EXPRESSION_LENGTH = 256
+_MAX_NODES = 64
+_MAX_INTEGER_BITS = 4096
+_MAX_EXPONENT = 1024
+
+
+def _check_magnitude(value: Any) -> Any:
+    if isinstance(value, int) and value.bit_length() > _MAX_INTEGER_BITS:
+        raise ValueError("Result is too large")
+    return value
+
+
+def _evaluate(node: ast.AST) -> Any:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return _check_magnitude(node.value)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left = _evaluate(node.left)
+        right = _evaluate(node.right)
+        if isinstance(node.op, ast.Pow):
+            if abs(right) > _MAX_EXPONENT:
+                raise ValueError("Exponent is too large")
+            if isinstance(left, int) and isinstance(right, int) and left.bit_length() * right > _MAX_INTEGER_BITS:
+                raise ValueError("Result is too large")
+        return _check_magnitude(_BINARY_OPERATORS[type(node.op)](left, right))
+    raise ValueError(f"Unsupported expression element: {type(node).__name__}")
 
 
-registry = ToolRegistry()
+def evaluate_expression(expression: str) -> Any:
+    if len(expression) > _MAX_EXPRESSION_LENGTH:
+        raise ValueError("Expression is too long")
+    tree = ast.parse(expression, mode="eval")
+    if sum(1 for _ in ast.walk(tree)) > _MAX_NODES:
+        raise ValueError("Expression is too complex")
+    return _evaluate(tree)
 
 
 def _echo_tool(arguments: Dict[str, Any]) -> str:
@@ -32,13 +231,13 @@ def _echo_tool(arguments: Dict[str, Any]) -> str:
 
 
 def _math_tool(arguments: Dict[str, Any]) -> str:
-    expression = arguments.get("expression", "0")
+    expression = str(arguments.get("expression", "0"))
     try:
-        result = eval(expression, {"__builtins__": {}}, {})
-    except Exception as exc:
+        result = evaluate_expression(expression)
+    except (SyntaxError, ValueError, ArithmeticError) as exc:
         raise ValueError(f"Invalid expression: {expression}") from exc
     return str(result)
 
 
-registry.register(Tool(name="echo", handler=_echo_tool))
-registry.register(Tool(name="calculator", handler=_math_tool))
+registry.register(Tool(name="echo", handler=_echo_tool, mode="inline"))
+registry.register(Tool(name="calculator", handler=_math_tool, mode="inline", cache_ttl=3600))
@@ -0,0 +1,132 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+
+from api.database import get_session
+from api.events import event_bus
+from api.ledger import Usage, budgets, rollup_increment, usage_day
+from api.models import ShortTermMemory, Task, TaskStatus, TaskStep, ToolCall, UsageLedgerEntry
+from memory.short_term import ShortTermMemoryStore
+
+
+@dataclass
+class StepUnitOfWork:
+    task_id: int
+    step_id: int
+    short_term: ShortTermMemoryStore
+    user_id: Optional[str] = None
+    task_budget: Optional[float] = None
+    status: Optional[TaskStatus] = None
+    usage: Dict[Tuple[str, str], Usage] = field(default_factory=dict)
+    tool_calls: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def cost_delta(self) -> float:
+        return sum(usage.cost for usage in self.usage.values())
+
+    def set_status(self, status: TaskStatus) -> None:
+        self.status = status
+
+    def record_usage(self, kind: str, name: str, usage: Usage) -> None:
+        self.usage[(kind, name)] = self.usage.get((kind, name), Usage()) + usage
+
+    async def check_budget(self) -> None:
+        await budgets.check(self.user_id, self.task_id, self.task_budget, pending=self.cost_delta)
+
+    def record_tool_call(self, agent_type: str, tool_name: str, arguments: Dict[str, Any], cached: bool = False) -> None:
+        self.tool_calls.append(
+            {
+                "task_id": self.task_id,
+                "agent_type": agent_type,
+                "tool_name": tool_name,
+                "arguments": arguments,
+                "cached": cached,
+            }
+        )
+
+    async def flush(self) -> None:
+        memories = self.short_term.drain(self.task_id, self.step_id)
+        if self.status is None and not self.usage and not memories and not self.tool_calls:
+            return
+        try:
+            await self._write(memories)
+        except Exception:
+            self.short_term.restore(self.task_id, memories, self.step_id)
+            raise
+        budgets.add(self.user_id, self.task_id, self.cost_delta)
+        await self._publish()
+        self.status = None
+        self.usage = {}
+        self.tool_calls = []
+
+    async def _publish(self) -> None:
+        for tool_call in self.tool_calls:
+            await event_bus.publish(
+                self.task_id,
+                "tool_call",
+                {
+                    "step_id": self.step_id,
+                    "agent_type": tool_call["agent_type"],
+                    "tool_name": tool_call["tool_name"],
+                    "arguments": tool_call["arguments"],
+                    "cached": tool_call["cached"],
+                },
+            )
+        if self.usage:
+            await event_bus.publish(
+                self.task_id,
+                "cost",
+                {
+                    "step_id": self.step_id,
+                    "delta": self.cost_delta,
+                    "usage": [{"kind": kind, "name": name, **asdict(usage)} for (kind, name), usage in self.usage.items()],
+                },
+            )
+        if self.status is not None:
+            await event_bus.publish(self.task_id, "step.status", {"step_id": self.step_id, "status": self.status.value})
+
+    async def _write(self, memories: List[Dict[str, Any]]) -> None:
+        async with get_session() as session:
+            step_values: Dict[str, Any] = {}
+            if self.status is not None:
+                step_values["status"] = self.status
+            cost_delta = self.cost_delta
+            if cost_delta:
+                step_values["cost"] = TaskStep.cost + cost_delta
+                await session.execute(update(Task).where(Task.id == self.task_id).values(cost=Task.cost + cost_delta))
+            if self.usage:
+                await session.execute(
+                    insert(UsageLedgerEntry),
+                    [
+                        {
+                            "task_id": self.task_id,
+                            "step_id": self.step_id,
+                            "user_id": self.user_id,
+                            "kind": kind,
+                            "name": name,
+                            **asdict(usage),
+                        }
+                        for (kind, name), usage in self.usage.items()
+                    ],
+                )
+            if self.user_id is not None and (self.usage or self.tool_calls):
+                totals = sum(self.usage.values(), Usage())
+                await session.execute(
+                    rollup_increment(
+                        self.user_id,
+                        usage_day(),
+                        tool_calls=len(self.tool_calls),
+                        prompt_tokens=totals.prompt_tokens,
+                        completion_tokens=totals.completion_tokens,
+                        compute_seconds=totals.compute_seconds,
+                        cost=totals.cost,
+                    )
+                )
+            if step_values:
+                await session.execute(update(TaskStep).where(TaskStep.id == self.step_id).values(**step_values))
+            if memories:
+                await session.execute(insert(ShortTermMemory), memories)
+            if self.tool_calls:
+                await session.execute(insert(ToolCall), self.tool_calls)
+            await session.commit()
@@ -1,3 +1,5 @@
+from typing import Dict, List, Optional
+
 from pydantic import BaseSettings, Field
 
 
@@ -5,10 +7,127 @@ class Settings(BaseSettings):
     app_name: str = "agent-orchestrator"
     postgres_dsn: str = Field(..., env="POSTGRES_DSN")
     redis_url: str = Field(..., env="REDIS_URL")
+    db_pool_size: int = Field(10, env="DB_POOL_SIZE")
+    db_max_overflow: int = Field(20, env="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(30.0, env="DB_POOL_TIMEOUT")
+    db_pool_pre_ping: bool = Field(True, env="DB_POOL_PRE_PING")
+    db_pool_recycle: int = Field(1800, env="DB_POOL_RECYCLE")
+    db_statement_cache_size: int = Field(100, env="DB_STATEMENT_CACHE_SIZE")
+    db_admission_wait_threshold: float = Field(0.5, env="DB_ADMISSION_WAIT_THRESHOLD")
+    db_admission_half_life: float = Field(2.0, env="DB_ADMISSION_HALF_LIFE")
     faiss_index_path: str = Field("/data/faiss.index", env="FAISS_INDEX_PATH")
+    ingest_batch_size: int = Field(256, env="INGEST_BATCH_SIZE")
+    memory_bulk_max_items: int = Field(1000, env="MEMORY_BULK_MAX_ITEMS")
+    memory_exact_search_max_ids: int = Field(20000, env="MEMORY_EXACT_SEARCH_MAX_IDS")
+    memory_filter_max_ids: int = Field(200000, env="MEMORY_FILTER_MAX_IDS")
+    memory_filter_max_fetch: int = Field(10000, env="MEMORY_FILTER_MAX_FETCH")
+    memory_hybrid_candidates: int = Field(4, env="MEMORY_HYBRID_CANDIDATES")
+    memory_rrf_k: int = Field(60, env="MEMORY_RRF_K")
+    vector_service_socket: Optional[str] = Field(None, env="VECTOR_SERVICE_SOCKET")
+    vector_service_pool_size: int = Field(8, env="VECTOR_SERVICE_POOL_SIZE")
+    vector_service_refresh_interval: float = Field(15.0, env="VECTOR_SERVICE_REFRESH_INTERVAL")
+    faiss_checkpoint_every: int = Field(10000, env="FAISS_CHECKPOINT_EVERY")
+    faiss_checkpoint_interval: float = Field(300.0, env="FAISS_CHECKPOINT_INTERVAL")
+    faiss_index_type: str = Field("flat", env="FAISS_INDEX_TYPE")
+    faiss_metric: str = Field("l2", env="FAISS_METRIC")
+    faiss_nlist: int = Field(1024, env="FAISS_NLIST")
+    faiss_pq_m: int = Field(16, env="FAISS_PQ_M")
+    faiss_pq_bits: int = Field(8, env="FAISS_PQ_BITS")
+    faiss_hnsw_m: int = Field(32, env="FAISS_HNSW_M")
+    faiss_ef_construction: int = Field(200, env="FAISS_EF_CONSTRUCTION")
+    faiss_nprobe: int = Field(16, env="FAISS_NPROBE")
+    faiss_ef_search: int = Field(64, env="FAISS_EF_SEARCH")
+    faiss_train_min_vectors: Optional[int] = Field(None, env="FAISS_TRAIN_MIN_VECTORS")
     embedding_dim: int = Field(384, env="EMBEDDING_DIM")
+    embedding_backend: str = Field("sentence_transformers", env="EMBEDDING_BACKEND")
+    embedding_model: str = Field("sentence-transformers/all-MiniLM-L6-v2", env="EMBEDDING_MODEL")
+    embedding_max_batch_size: int = Field(64, env="EMBEDDING_MAX_BATCH_SIZE")
+    embedding_max_wait_ms: float = Field(5.0, env="EMBEDDING_MAX_WAIT_MS")
+    embedding_workers: int = Field(1, env="EMBEDDING_WORKERS")
+    embedding_cache_size: int = Field(10000, env="EMBEDDING_CACHE_SIZE")
+    embedding_cache_dir: Optional[str] = Field(None, env="EMBEDDING_CACHE_DIR")
+    embedding_disk_cache_size: int = Field(1_000_000, env="EMBEDDING_DISK_CACHE_SIZE")
     rate_limit_per_user: int = Field(60, env="RATE_LIMIT_PER_USER")
     rate_limit_per_task: int = Field(30, env="RATE_LIMIT_PER_TASK")
+    rate_limit_local_fraction: float = Field(0.1, env="RATE_LIMIT_LOCAL_FRACTION")
+    rate_limit_timeout: float = Field(0.05, env="RATE_LIMIT_TIMEOUT")
+    rate_limit_failure_mode: str = Field("open", env="RATE_LIMIT_FAILURE_MODE")
+    short_term_cache_tasks: int = Field(1024, env="SHORT_TERM_CACHE_TASKS")
+    short_term_flush_interval: float = Field(1.0, env="SHORT_TERM_FLUSH_INTERVAL")
+    queue_backend: str = Field("postgres", env="QUEUE_BACKEND")
+    queue_visibility_timeout: float = Field(60.0, env="QUEUE_VISIBILITY_TIMEOUT")
+    queue_poll_interval: float = Field(1.0, env="QUEUE_POLL_INTERVAL")
+    queue_max_attempts: int = Field(3, env="QUEUE_MAX_ATTEMPTS")
+    event_backend: str = Field("redis", env="EVENT_BACKEND")
+    event_stream_maxlen: int = Field(1000, env="EVENT_STREAM_MAXLEN")
+    event_stream_ttl: int = Field(86400, env="EVENT_STREAM_TTL")
+    event_subscriber_queue: int = Field(1000, env="EVENT_SUBSCRIBER_QUEUE")
+    event_keepalive_interval: float = Field(15.0, env="EVENT_KEEPALIVE_INTERVAL")
+    dedup_backend: str = Field("redis", env="DEDUP_BACKEND")
+    dedup_window: float = Field(60.0, env="DEDUP_WINDOW")
+    idempotency_ttl: float = Field(86400.0, env="IDEMPOTENCY_TTL")
+    dedup_cache_size: int = Field(10000, env="DEDUP_CACHE_SIZE")
+    dedup_timeout: float = Field(0.05, env="DEDUP_TIMEOUT")
+    dedup_pending_ttl: float = Field(30.0, env="DEDUP_PENDING_TTL")
+    dedup_wait_timeout: float = Field(5.0, env="DEDUP_WAIT_TIMEOUT")
+    tool_timeout: float = Field(30.0, env="TOOL_TIMEOUT")
+    tool_thread_workers: int = Field(8, env="TOOL_THREAD_WORKERS")
+    tool_process_workers: int = Field(2, env="TOOL_PROCESS_WORKERS")
+    tool_cache_size: int = Field(4096, env="TOOL_CACHE_SIZE")
+    tool_cache_redis: bool = Field(False, env="TOOL_CACHE_REDIS")
+    llm_provider: str = Field("none", env="LLM_PROVIDER")
+    llm_base_url: Optional[str] = Field(None, env="LLM_BASE_URL")
+    llm_api_key: Optional[str] = Field(None, env="LLM_API_KEY")
+    llm_model: str = Field("mock-1", env="LLM_MODEL")
+    llm_max_concurrency: int = Field(16, env="LLM_MAX_CONCURRENCY")
+    llm_max_connections: int = Field(32, env="LLM_MAX_CONNECTIONS")
+    llm_timeout: float = Field(60.0, env="LLM_TIMEOUT")
+    llm_max_retries: int = Field(3, env="LLM_MAX_RETRIES")
+    llm_backoff_base: float = Field(0.5, env="LLM_BACKOFF_BASE")
+    llm_backoff_max: float = Field(8.0, env="LLM_BACKOFF_MAX")
+    llm_batch_size: int = Field(16, env="LLM_BATCH_SIZE")
+    llm_batch_wait_ms: float = Field(5.0, env="LLM_BATCH_WAIT_MS")
+    llm_max_tokens: int = Field(256, env="LLM_MAX_TOKENS")
+    llm_temperature: float = Field(0.0, env="LLM_TEMPERATURE")
+    llm_stream: bool = Field(False, env="LLM_STREAM")
+    llm_stream_flush_ms: float = Field(100.0, env="LLM_STREAM_FLUSH_MS")
+    llm_providers: Dict[str, Dict[str, str]] = Field(default_factory=dict, env="LLM_PROVIDERS")
+    llm_agent_providers: Dict[str, str] = Field(default_factory=dict, env="LLM_AGENT_PROVIDERS")
+    maintenance_enabled: bool = Field(True, env="MAINTENANCE_ENABLED")
+    maintenance_interval: float = Field(300.0, env="MAINTENANCE_INTERVAL")
+    maintenance_batch_size: int = Field(1000, env="MAINTENANCE_BATCH_SIZE")
+    maintenance_batch_pause: float = Field(0.05, env="MAINTENANCE_BATCH_PAUSE")
+    maintenance_lock_timeout: float = Field(2.0, env="MAINTENANCE_LOCK_TIMEOUT")
+    memory_compaction: bool = Field(True, env="MEMORY_COMPACTION")
+    retention_days: Optional[float] = Field(None, env="RETENTION_DAYS")
+    task_retention_days: Optional[float] = Field(None, env="TASK_RETENTION_DAYS")
+    retention_archive_path: Optional[str] = Field(None, env="RETENTION_ARCHIVE_PATH")
+    tool_call_partitioning: bool = Field(False, env="TOOL_CALL_PARTITIONING")
+    tool_call_partition_interval: str = Field("month", env="TOOL_CALL_PARTITION_INTERVAL")
+    tool_call_partitions_ahead: int = Field(2, env="TOOL_CALL_PARTITIONS_AHEAD")
+    metrics_enabled: bool = Field(True, env="METRICS_ENABLED")
+    metrics_namespace: str = Field("orchestrator", env="METRICS_NAMESPACE")
+    metrics_port: Optional[int] = Field(None, env="METRICS_PORT")
+    planner_router: str = Field("keyword", env="PLANNER_ROUTER")
+    planner_routes: Optional[Dict[str, Dict[str, float]]] = Field(None, env="PLANNER_ROUTES")
+    planner_prototypes: Optional[Dict[str, List[str]]] = Field(None, env="PLANNER_PROTOTYPES")
+    planner_embedding_threshold: float = Field(0.35, env="PLANNER_EMBEDDING_THRESHOLD")
+    planner_cache_size: int = Field(4096, env="PLANNER_CACHE_SIZE")
+    cost_per_step: float = Field(0.01, env="COST_PER_STEP")
+    cost_per_1k_prompt_tokens: float = Field(0.0, env="COST_PER_1K_PROMPT_TOKENS")
+    cost_per_1k_completion_tokens: float = Field(0.0, env="COST_PER_1K_COMPLETION_TOKENS")
+    cost_per_compute_second: float = Field(0.0, env="COST_PER_COMPUTE_SECOND")
+    tool_costs: Dict[str, float] = Field(default_factory=dict, env="TOOL_COSTS")
+    user_budget: Optional[float] = Field(None, env="USER_BUDGET")
+    user_budgets: Dict[str, float] = Field(default_factory=dict, env="USER_BUDGETS")
+    budget_period: str = Field("month", env="BUDGET_PERIOD")
+    task_budget: Optional[float] = Field(None, env="TASK_BUDGET")
+    budget_cache_ttl: float = Field(5.0, env="BUDGET_CACHE_TTL")
+    ml_enabled: bool = Field(True, env="ML_ENABLED")
+    warm_up: bool = Field(True, env="WARM_UP")
+    step_fan_out: int = Field(4, env="STEP_FAN_OUT")
+    worker_concurrency: int = Field(8, env="WORKER_CONCURRENCY")
+    embedded_worker: bool = Field(False, env="EMBEDDED_WORKER")
 
 
 settings = Settings()
@@ -1,17 +1,99 @@
-from contextlib import asynccontextmanager
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
 
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from api.config import settings
+from api.metrics import metrics
 
 Base = declarative_base()
 
-engine = create_async_engine(settings.postgres_dsn, future=True, echo=False)
+
+def engine_options(dsn: str) -> Dict[str, Any]:
+    url = make_url(dsn)
+    options: Dict[str, Any] = {
+        "future": True,
+        "echo": False,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    if url.get_backend_name() != "sqlite":
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+        )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+    return options
+
+
+engine = create_async_engine(settings.postgres_dsn, **engine_options(settings.postgres_dsn))
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 
+class PoolPressure:
+    def __init__(self, half_life: float) -> None:
+        self.half_life = half_life
+        self._wait = 0.0
+        self._updated = time.monotonic()
+
+    def current(self) -> float:
+        elapsed = time.monotonic() - self._updated
+        return self._wait * 0.5 ** (elapsed / self.half_life)
+
+    def record(self, wait: float) -> None:
+        self._wait = max(wait, (self.current() + wait) / 2)
+        self._updated = time.monotonic()
+
+
+pool_pressure = PoolPressure(settings.db_admission_half_life)
+
+
+@dataclass
+class StatementCounter:
+    statements: int = 0
+
+
+_statement_counter: ContextVar[Optional[StatementCounter]] = ContextVar("statement_counter", default=None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter = _statement_counter.get()
+    if counter is not None:
+        counter.statements += 1
+
+
+@contextmanager
+def count_statements() -> Iterator[StatementCounter]:
+    counter = StatementCounter()
+    token = _statement_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _statement_counter.reset(token)
+
+
 @asynccontextmanager
 async def get_session():
+    started = time.perf_counter()
     async with SessionLocal() as session:
-        yield session
+        await session.connection()
+        wait = time.perf_counter() - started
+        pool_pressure.record(wait)
+        metrics.set_gauge("db_pool_checkout_wait_seconds", wait)
+        metrics.observe("db_pool_wait_seconds", wait)
+        try:
+            yield session
+        finally:
+            metrics.observe("db_session_duration_seconds", time.perf_counter() - started)
+
+
+metrics.track("db_pool_checked_out", lambda: getattr(engine.pool, "checkedout", lambda: 0)())
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import redis.asyncio as redis
+
+from api.config import settings
+
+logger = logging.getLogger(f"{settings.app_name}.dedup")
+
+
+class IdempotencyConflict(ValueError):
+    pass
+
+
+class SubmissionInProgress(RuntimeError):
+    pass
+
+
+def submission_fingerprint(user_id: str, description: str, metadata: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        [user_id, description, metadata], sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def submission_key(user_id: str, fingerprint: str, idempotency_key: Optional[str]) -> str:
+    if idempotency_key is None:
+        return f"content:{fingerprint}"
+    return "key:" + hashlib.sha256(f"{user_id}\0{idempotency_key}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Submission:
+    fingerprint: str
+    task_id: int
+    expires_at: float
+
+
+class SubmissionDeduplicator:
+    def __init__(
+        self,
+        redis_url: Optional[str],
+        max_entries: int,
+        timeout: float,
+        pending_ttl: float,
+        wait_timeout: float,
+        prefix: str = "task_submission",
+    ) -> None:
+        self.redis = redis.from_url(redis_url, decode_responses=True) if redis_url else None
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.pending_ttl = pending_ttl
+        self.wait_timeout = wait_timeout
+        self.prefix = prefix
+        self._recent: "OrderedDict[str, _Submission]" = OrderedDict()
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    def _lookup(self, key: str) -> Optional[_Submission]:
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._recent[key]
+            return None
+        self._recent.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, fingerprint: str, task_id: int, ttl: float) -> None:
+        self._recent[key] = _Submission(fingerprint, task_id, time.monotonic() + ttl)
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    @staticmethod
+    def _check(fingerprint: str, stored: str) -> None:
+        if stored != fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+
+    async def submit(
+        self, key: str, fingerprint: str, ttl: float, create: Callable[[], Awaitable[int]]
+    ) -> Tuple[int, bool]:
+        entry = self._lookup(key)
+        if entry is not None:
+            self._check(fingerprint, entry.fingerprint)
+            return entry.task_id, True
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._check(fingerprint, in_flight[0])
+            return await asyncio.shield(in_flight[1]), True
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (fingerprint, future)
+        try:
+            task_id, deduplicated = await self._submit_once(key, fingerprint, ttl, create)
+        except asyncio.CancelledError:
+            future.set_exception(SubmissionInProgress("The identical submission being processed was cancelled"))
+            future.exception()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        self._remember(key, fingerprint, task_id, ttl)
+        future.set_result(task_id)
+        return task_id, deduplicated
+
+    async def _submit_once(
+        self, key: str, fingerprint: str, ttl: float, create: Callable[[], Awaitable[int]]
+    ) -> Tuple[int, bool]:
+        if self.redis is None:
+            return await create(), False
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                existing = await self._claim(key, fingerprint)
+            except (asyncio.TimeoutError, redis.RedisError) as exc:
+                logger.warning("dedup_redis_unavailable key=%s error=%s", key, exc or type(exc).__name__)
+                return await create(), False
+            if existing is None:
+                break
+            self._check(fingerprint, existing["fingerprint"])
+            if existing.get("task_id") is not None:
+                return int(existing["task_id"]), True
+            if time.monotonic() >= deadline:
+                raise SubmissionInProgress("An identical submission is still being processed")
+            await asyncio.sleep(0.05)
+        try:
+            task_id = await create()
+        except BaseException:
+            await self._release(key)
+            raise
+        await self._store(key, fingerprint, task_id, ttl)
+        return task_id, False
+
+    async def _claim(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        pending = json.dumps({"fingerprint": fingerprint, "task_id": None})
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"{self.prefix}:{key}", pending, nx=True, px=int(self.pending_ttl * 1000))
+            pipe.get(f"{self.prefix}:{key}")
+            claimed, value = await asyncio.wait_for(pipe.execute(), timeout=self.timeout)
+        if claimed or value is None:
+            return None
+        return json.loads(value)
+
+    async def _store(self, key: str, fingerprint: str, task_id: int, ttl: float) -> None:
+        try:
+            await asyncio.wait_for(
+                self.redis.set(
+                    f"{self.prefix}:{key}",
+                    json.dumps({"fingerprint": fingerprint, "task_id": task_id}),
+                    px=max(1, int(ttl * 1000)),
+                ),
+                timeout=self.timeout,
+            )
+        except (asyncio.TimeoutError, redis.RedisError) as exc:
+            logger.warning("dedup_redis_unavailable key=%s error=%s", key, exc or type(exc).__name__)
+
+    async def _release(self, key: str) -> None:
+        try:
+            await asyncio.wait_for(self.redis.delete(f"{self.prefix}:{key}"), timeout=self.timeout)
+        except (asyncio.TimeoutError, redis.RedisError) as exc:
+            logger.warning("dedup_redis_unavailable key=%s error=%s", key, exc or type(exc).__name__)
+
+    async def close(self) -> None:
+        if self.redis is not None:
+            await self.redis.close()
+
+
+def create_deduplicator() -> SubmissionDeduplicator:
+    return SubmissionDeduplicator(
+        redis_url=settings.redis_url if settings.dedup_backend == "redis" else None,
+        max_entries=settings.dedup_cache_size,
+        timeout=settings.dedup_timeout,
+        pending_ttl=settings.dedup_pending_ttl,
+        wait_timeout=settings.dedup_wait_timeout,
+    )
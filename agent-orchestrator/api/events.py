@@ -0,0 +1,228 @@
+import asyncio
+import contextlib
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+import redis.asyncio as redis
+
+from api.config import settings
+
+logger = logging.getLogger(f"{settings.app_name}.events")
+
+TERMINAL_STATUSES = ("completed", "failed")
+EVENT_ID_PATTERN = re.compile(r"\d+(-\d+)?")
+
+_PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'event', ARGV[2], 'data', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', KEYS[2], id .. '\\n' .. ARGV[2] .. '\\n' .. ARGV[3])
+return id
+"""
+
+
+def is_valid_event_id(event_id: str) -> bool:
+    return EVENT_ID_PATTERN.fullmatch(event_id) is not None
+
+
+def _event_key(event_id: str) -> Tuple[int, int]:
+    first, _, second = event_id.partition("-")
+    return int(first), int(second or 0)
+
+
+@dataclass
+class TaskEvent:
+    id: str
+    task_id: int
+    event: str
+    data: Dict[str, Any]
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.event == "task.status" and self.data.get("status") in TERMINAL_STATUSES
+
+
+class SubscriptionOverflow(Exception):
+    pass
+
+
+@dataclass(eq=False)
+class Subscription:
+    task_id: int
+    cursor: str
+    replay: List[TaskEvent] = field(default_factory=list)
+    queue: "asyncio.Queue[Optional[TaskEvent]]" = field(default_factory=asyncio.Queue)
+    overflowed: bool = False
+
+    def deliver(self, event: TaskEvent) -> None:
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= settings.event_subscriber_queue:
+            self.overflowed = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    async def next(self, timeout: float) -> Optional[TaskEvent]:
+        while True:
+            if self.replay:
+                event = self.replay.pop(0)
+            else:
+                try:
+                    event = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    return None
+                if event is None:
+                    raise SubscriptionOverflow(self.task_id)
+            if _event_key(event.id) <= _event_key(self.cursor):
+                continue
+            self.cursor = event.id
+            return event
+
+
+class EventBus(ABC):
+    def __init__(self) -> None:
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    @abstractmethod
+    async def publish(self, task_id: int, event: str, data: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _open(self, task_id: int, last_event_id: Optional[str]) -> Tuple[str, List[TaskEvent]]:
+        raise NotImplementedError
+
+    def _dispatch(self, event: TaskEvent) -> None:
+        for subscription in list(self._subscribers.get(event.task_id, ())):
+            subscription.deliver(event)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, task_id: int, last_event_id: Optional[str] = None) -> AsyncIterator[Subscription]:
+        subscription = Subscription(task_id=task_id, cursor=last_event_id or "0-0")
+        self._subscribers.setdefault(task_id, set()).add(subscription)
+        try:
+            subscription.cursor, subscription.replay = await self._open(task_id, last_event_id)
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[task_id]
+
+    async def close(self) -> None:
+        return None
+
+
+class InMemoryEventBus(EventBus):
+    def __init__(self, max_events: int, max_tasks: int = 1024) -> None:
+        super().__init__()
+        self.max_events = max_events
+        self.max_tasks = max_tasks
+        self._history: "OrderedDict[int, Deque[TaskEvent]]" = OrderedDict()
+        self._sequence = 0
+
+    async def publish(self, task_id: int, event: str, data: Dict[str, Any]) -> None:
+        self._sequence += 1
+        task_event = TaskEvent(id=f"0-{self._sequence}", task_id=task_id, event=event, data=data)
+        history = self._history.setdefault(task_id, deque(maxlen=self.max_events))
+        history.append(task_event)
+        self._history.move_to_end(task_id)
+        while len(self._history) > self.max_tasks:
+            self._history.popitem(last=False)
+        self._dispatch(task_event)
+
+    async def _open(self, task_id: int, last_event_id: Optional[str]) -> Tuple[str, List[TaskEvent]]:
+        history = list(self._history.get(task_id, ()))
+        if last_event_id is None:
+            return (history[-1].id if history else "0-0"), []
+        after = _event_key(last_event_id)
+        return last_event_id, [event for event in history if _event_key(event.id) > after]
+
+
+class RedisEventBus(EventBus):
+    def __init__(self, max_events: int, ttl: int, prefix: str = "task_events") -> None:
+        super().__init__()
+        self.max_events = max_events
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis = redis.from_url(settings.redis_url, decode_responses=True)
+        self._publish = self.redis.register_script(_PUBLISH_SCRIPT)
+        self._pubsub: Optional[redis.client.PubSub] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._listener_lock = asyncio.Lock()
+
+    def _stream_key(self, task_id: int) -> str:
+        return f"{self.prefix}:{task_id}"
+
+    def _channel(self, task_id: int) -> str:
+        return f"{self.prefix}:live:{task_id}"
+
+    async def publish(self, task_id: int, event: str, data: Dict[str, Any]) -> None:
+        try:
+            await self._publish(
+                keys=[self._stream_key(task_id), self._channel(task_id)],
+                args=[self.max_events, event, json.dumps(data, default=str), self.ttl],
+            )
+        except redis.RedisError as exc:
+            logger.warning("task_event_publish_failed task_id=%s event=%s error=%s", task_id, event, exc)
+
+    async def _ensure_listener(self) -> None:
+        async with self._listener_lock:
+            if self._listener is not None and not self._listener.done():
+                return
+            self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.psubscribe(f"{self.prefix}:live:*")
+            self._listener = asyncio.create_task(self._listen(self._pubsub))
+
+    async def _listen(self, pubsub: "redis.client.PubSub") -> None:
+        while True:
+            try:
+                message = await pubsub.get_message(timeout=1.0)
+            except redis.RedisError as exc:
+                logger.warning("task_event_listener_failed error=%s", exc)
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message.get("type") != "pmessage":
+                continue
+            task_id = int(message["channel"].rsplit(":", 1)[1])
+            if task_id not in self._subscribers:
+                continue
+            event_id, event, data = message["data"].split("\n", 2)
+            self._dispatch(TaskEvent(id=event_id, task_id=task_id, event=event, data=json.loads(data)))
+
+    async def _open(self, task_id: int, last_event_id: Optional[str]) -> Tuple[str, List[TaskEvent]]:
+        await self._ensure_listener()
+        key = self._stream_key(task_id)
+        if last_event_id is None:
+            latest = await self.redis.xrevrange(key, count=1)
+            return (latest[0][0] if latest else "0-0"), []
+        entries = await self.redis.xrange(key, min=f"({last_event_id}")
+        return last_event_id, [
+            TaskEvent(id=entry_id, task_id=task_id, event=fields["event"], data=json.loads(fields["data"]))
+            for entry_id, fields in entries
+        ]
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        await self.redis.close()
+
+
+def create_event_bus(backend: Optional[str] = None) -> EventBus:
+    backend = backend or settings.event_backend
+    if backend == "redis":
+        return RedisEventBus(settings.event_stream_maxlen, settings.event_stream_ttl)
+    if backend == "memory":
+        return InMemoryEventBus(settings.event_stream_maxlen)
+    raise ValueError(f"Unknown event backend '{backend}'")
+
+
+event_bus = create_event_bus()
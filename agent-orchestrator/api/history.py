@@ -0,0 +1,112 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, tuple_
+
+from api.database import get_session
+from api.models import ShortTermMemory, Task, TaskStatus, TaskStep, ToolCall
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+@dataclass
+class Page:
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(values: List[Any]) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def _decode_id_cursor(cursor: str) -> int:
+    (value,) = decode_cursor(cursor, 1)
+    if not isinstance(value, int):
+        raise InvalidCursor("Malformed cursor")
+    return value
+
+
+async def _page(statement, limit: Optional[int], key: List[str]) -> Page:
+    if limit is not None:
+        statement = statement.limit(limit + 1)
+    async with get_session() as session:
+        result = await session.execute(statement)
+        rows = [dict(row) for row in result.mappings().all()]
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][name] for name in key])
+    return Page(items=rows, next_cursor=next_cursor)
+
+
+async def list_user_tasks(
+    user_id: str, limit: int, cursor: Optional[str] = None, status: Optional[TaskStatus] = None
+) -> Page:
+    statement = select(
+        Task.id, Task.description, Task.status, Task.created_at, Task.updated_at, Task.cost
+    ).where(Task.user_id == user_id)
+    if status is not None:
+        statement = statement.where(Task.status == status)
+    if cursor is not None:
+        created_at, task_id = decode_cursor(cursor, 2)
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError) as exc:
+            raise InvalidCursor("Malformed cursor") from exc
+        if not isinstance(task_id, int):
+            raise InvalidCursor("Malformed cursor")
+        statement = statement.where(tuple_(Task.created_at, Task.id) < tuple_(created_at, task_id))
+    statement = statement.order_by(Task.created_at.desc(), Task.id.desc())
+    return await _page(statement, limit, ["created_at", "id"])
+
+
+async def list_task_steps(task_id: int, limit: Optional[int], cursor: Optional[str] = None) -> Page:
+    statement = select(
+        TaskStep.id,
+        TaskStep.step_index,
+        TaskStep.instruction,
+        TaskStep.status,
+        TaskStep.agent_type,
+        TaskStep.cost,
+        TaskStep.depends_on,
+    ).where(TaskStep.task_id == task_id)
+    if cursor is not None:
+        statement = statement.where(TaskStep.step_index > _decode_id_cursor(cursor))
+    statement = statement.order_by(TaskStep.step_index)
+    return await _page(statement, limit, ["step_index"])
+
+
+async def list_tool_calls(task_id: int, limit: int, cursor: Optional[str] = None) -> Page:
+    statement = select(
+        ToolCall.id, ToolCall.agent_type, ToolCall.tool_name, ToolCall.arguments, ToolCall.cached, ToolCall.created_at
+    ).where(ToolCall.task_id == task_id)
+    if cursor is not None:
+        statement = statement.where(ToolCall.id > _decode_id_cursor(cursor))
+    statement = statement.order_by(ToolCall.id)
+    return await _page(statement, limit, ["id"])
+
+
+async def list_memory_entries(task_id: int, limit: int, cursor: Optional[str] = None) -> Page:
+    statement = select(
+        ShortTermMemory.id, ShortTermMemory.key, ShortTermMemory.value, ShortTermMemory.created_at
+    ).where(ShortTermMemory.task_id == task_id)
+    if cursor is not None:
+        statement = statement.where(ShortTermMemory.id > _decode_id_cursor(cursor))
+    statement = statement.order_by(ShortTermMemory.id)
+    return await _page(statement, limit, ["id"])
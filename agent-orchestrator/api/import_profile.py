@@ -0,0 +1,63 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import List
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int
+
+
+def profile_imports(module: str) -> List[ImportTiming]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append(
+                ImportTiming(
+                    module=name,
+                    self_seconds=int(self_us) / 1_000_000,
+                    cumulative_seconds=int(cumulative_us) / 1_000_000,
+                    depth=(len(indent) - 1) // 2,
+                )
+            )
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show per-module import time for a module.")
+    parser.add_argument("module", nargs="?", default="api.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--sort", choices=("cumulative", "self"), default="cumulative")
+    args = parser.parse_args()
+    timings = profile_imports(args.module)
+    key = (lambda item: item.cumulative_seconds) if args.sort == "cumulative" else (lambda item: item.self_seconds)
+    print(f"{'cumulative_s':>12} {'self_s':>8}  module")
+    for timing in sorted(timings, key=key, reverse=True)[: args.top]:
+        print(f"{timing.cumulative_seconds:12.3f} {timing.self_seconds:8.3f}  {timing.module}")
+    loaded = {timing.module.split(".")[0] for timing in timings}
+    heavy = sorted(loaded & {"faiss", "numpy", "sentence_transformers", "torch", "transformers"})
+    print(f"total_s={sum(timing.self_seconds for timing in timings):.3f} modules={len(timings)} ml={','.join(heavy) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+
+from api.config import settings
+from api.database import engine, get_session
+from api.models import Task, UsageRollup
+
+ROLLUP_FIELDS = ("tasks", "tool_calls", "prompt_tokens", "completion_tokens", "compute_seconds", "cost")
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    compute_seconds: float = 0.0
+    cost: float = 0.0
+
+    def __add__(self, other: "Usage") -> "Usage":
+        return Usage(
+            calls=self.calls + other.calls,
+            prompt_tokens=self.prompt_tokens + other.prompt_tokens,
+            completion_tokens=self.completion_tokens + other.completion_tokens,
+            compute_seconds=self.compute_seconds + other.compute_seconds,
+            cost=self.cost + other.cost,
+        )
+
+
+def meter(
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    compute_seconds: float = 0.0,
+    base_cost: float = 0.0,
+    calls: int = 1,
+) -> Usage:
+    cost = (
+        base_cost
+        + prompt_tokens / 1000 * settings.cost_per_1k_prompt_tokens
+        + completion_tokens / 1000 * settings.cost_per_1k_completion_tokens
+        + compute_seconds * settings.cost_per_compute_second
+    )
+    return Usage(
+        calls=calls,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        compute_seconds=compute_seconds,
+        cost=cost,
+    )
+
+
+def usage_day(moment: Optional[datetime] = None) -> date:
+    return (moment or datetime.utcnow()).date()
+
+
+def budget_period_start(today: Optional[date] = None) -> date:
+    today = today or usage_day()
+    if settings.budget_period == "day":
+        return today
+    return today.replace(day=1)
+
+
+def rollup_increment(user_id: str, day: date, **amounts: float):
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(UsageRollup).values(user_id=user_id, day=day, **amounts)
+    return statement.on_conflict_do_update(
+        index_elements=[UsageRollup.user_id, UsageRollup.day],
+        set_={name: getattr(UsageRollup, name) + statement.excluded[name] for name in amounts},
+    )
+
+
+def task_budget(metadata: Optional[Dict[str, Any]]) -> Optional[float]:
+    requested = (metadata or {}).get("budget")
+    if isinstance(requested, bool) or not isinstance(requested, (int, float)):
+        return settings.task_budget
+    if settings.task_budget is None:
+        return float(requested)
+    return min(float(requested), settings.task_budget)
+
+
+def user_budget(user_id: str) -> Optional[float]:
+    return settings.user_budgets.get(user_id, settings.user_budget)
+
+
+class BudgetExceeded(RuntimeError):
+    def __init__(self, scope: str, limit: float, spent: float) -> None:
+        super().__init__(f"{scope.capitalize()} budget of {limit:.4f} exhausted ({spent:.4f} spent)")
+        self.scope = scope
+        self.limit = limit
+        self.spent = spent
+
+
+@dataclass
+class _Counter:
+    spent: float
+    refreshed_at: float
+    period: Optional[date] = None
+
+
+class BudgetTracker:
+    def __init__(self, ttl: float, max_users: int = 10000, max_tasks: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_users = max_users
+        self.max_tasks = max_tasks
+        self._users: "OrderedDict[str, _Counter]" = OrderedDict()
+        self._tasks: "OrderedDict[int, _Counter]" = OrderedDict()
+
+    async def _load_user_spent(self, user_id: str, period: date) -> float:
+        async with get_session() as session:
+            result = await session.execute(
+                select(func.coalesce(func.sum(UsageRollup.cost), 0.0)).where(
+                    UsageRollup.user_id == user_id, UsageRollup.day >= period
+                )
+            )
+            return float(result.scalar_one())
+
+    async def _load_task_spent(self, task_id: int) -> float:
+        async with get_session() as session:
+            result = await session.execute(select(Task.cost).where(Task.id == task_id))
+            return float(result.scalar_one_or_none() or 0.0)
+
+    async def user_spent(self, user_id: str) -> float:
+        period = budget_period_start()
+        counter = self._users.get(user_id)
+        now = time.monotonic()
+        if counter is None or counter.period != period or now - counter.refreshed_at > self.ttl:
+            counter = _Counter(await self._load_user_spent(user_id, period), now, period)
+            self._users[user_id] = counter
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_id)
+        return counter.spent
+
+    async def task_spent(self, task_id: int) -> float:
+        counter = self._tasks.get(task_id)
+        now = time.monotonic()
+        if counter is None or now - counter.refreshed_at > self.ttl:
+            counter = _Counter(await self._load_task_spent(task_id), now)
+            self._tasks[task_id] = counter
+            while len(self._tasks) > self.max_tasks:
+                self._tasks.popitem(last=False)
+        self._tasks.move_to_end(task_id)
+        return counter.spent
+
+    async def check(
+        self, user_id: Optional[str], task_id: int, task_limit: Optional[float], pending: float = 0.0
+    ) -> None:
+        if task_limit is not None:
+            spent = await self.task_spent(task_id) + pending
+            if spent >= task_limit:
+                raise BudgetExceeded("task", task_limit, spent)
+        user_limit = user_budget(user_id) if user_id is not None else None
+        if user_limit is not None:
+            spent = await self.user_spent(user_id) + pending
+            if spent >= user_limit:
+                raise BudgetExceeded("user", user_limit, spent)
+
+    def add(self, user_id: Optional[str], task_id: int, cost: float) -> None:
+        if task_id in self._tasks:
+            self._tasks[task_id].spent += cost
+        if user_id is not None and user_id in self._users:
+            self._users[user_id].spent += cost
+
+    def forget_task(self, task_id: int) -> None:
+        self._tasks.pop(task_id, None)
+
+
+async def get_user_usage(user_id: str, days: int) -> Dict[str, Any]:
+    today = usage_day()
+    period = budget_period_start(today)
+    since = min(today - timedelta(days=days - 1), period)
+    async with get_session() as session:
+        result = await session.execute(
+            select(UsageRollup.day, *(getattr(UsageRollup, name) for name in ROLLUP_FIELDS))
+            .where(UsageRollup.user_id == user_id, UsageRollup.day >= since)
+            .order_by(UsageRollup.day.desc())
+        )
+        rows = [dict(row) for row in result.mappings().all()]
+    daily: List[Dict[str, Any]] = [row for row in rows if row["day"] > today - timedelta(days=days)]
+    totals = {name: sum(row[name] for row in daily) for name in ROLLUP_FIELDS}
+    period_cost = sum(row["cost"] for row in rows if row["day"] >= period)
+    limit = user_budget(user_id)
+    return {
+        "user_id": user_id,
+        "period_start": period,
+        "period_cost": period_cost,
+        "budget": limit,
+        "remaining": None if limit is None else max(limit - period_cost, 0.0),
+        "totals": totals,
+        "daily": daily,
+    }
+
+
+budgets = BudgetTracker(settings.budget_cache_ttl)
@@ -1,47 +1,138 @@
+import json
 import logging
+import math
+import time
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy import select
 
+from agents.tools import registry
 from api.config import settings
-from api.database import Base, engine, get_session
-from api.models import Task
-from api.orchestrator import create_task, list_steps, schedule_task
+from api.database import Base, engine, get_session, pool_pressure
+from api.dedup import (
+    IdempotencyConflict,
+    SubmissionInProgress,
+    create_deduplicator,
+    submission_fingerprint,
+    submission_key,
+)
+from api.events import SubscriptionOverflow, TaskEvent, event_bus, is_valid_event_id
+from api.history import (
+    InvalidCursor,
+    list_memory_entries,
+    list_task_steps,
+    list_tool_calls,
+    list_user_tasks,
+)
+from api.ledger import get_user_usage
+from api.maintenance import maintenance
+from api.metrics import metrics
+from api.models import Task, TaskStatus
+from api.orchestrator import create_task, get_task_status
+from api.queue import create_task_queue
 from api.rate_limit import RateLimiter
 from api.schemas import (
+    MemoryBulkRequest,
+    MemoryBulkResponse,
+    MemoryEntryPage,
+    MemoryEntryResponse,
+    MemoryImportResponse,
+    MemoryItem,
     MemorySearchRequest,
     MemorySearchResponse,
     MemorySearchResult,
     TaskCreate,
     TaskDetailResponse,
+    TaskPage,
     TaskResponse,
+    TaskStepPage,
     TaskStepResponse,
+    TaskSummary,
+    ToolCallPage,
+    ToolCallResponse,
+    UsageResponse,
 )
-from memory.long_term import LongTermMemoryStore
+from api.startup import align_embedding_sequence, close_ml_components, ml_loaders, readiness, upgrade_schema
+from api.worker import Worker
+from llm.providers import providers
+
+if TYPE_CHECKING:
+    from memory.long_term import LongTermMemoryStore
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(settings.app_name)
 
 app = FastAPI(title="Agent Orchestrator", version="1.0.0")
 rate_limiter = RateLimiter()
-long_term_store = LongTermMemoryStore()
+deduplicator = create_deduplicator()
+task_queue = create_task_queue()
+embedded_worker = Worker(task_queue, settings.worker_concurrency) if settings.embedded_worker else None
+
+
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
+if metrics.enabled:
+    app.middleware("http")(record_request_metrics)
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+        await align_embedding_sequence(conn)
+    providers.configure()
+    await maintenance.prepare()
+    readiness.start(ml_loaders())
+    if embedded_worker is not None:
+        embedded_worker.start()
+        if settings.maintenance_enabled:
+            maintenance.start()
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
+    await readiness.stop()
+    await maintenance.stop()
+    if embedded_worker is not None:
+        await embedded_worker.stop()
+    await task_queue.close()
     await rate_limiter.close()
+    await deduplicator.close()
+    await event_bus.close()
+    await registry.close()
+    await providers.close()
+    await close_ml_components()
 
 
 async def enforce_rate_limit(task_key: str, limit: int) -> None:
-    allowed = await rate_limiter.hit(task_key, limit, window_seconds=60)
-    if not allowed:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    decision = await rate_limiter.hit(task_key, limit, window_seconds=60)
+    if not decision.allowed:
+        metrics.inc("rate_limit_rejections_total", scope=task_key.split(":", 1)[0])
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))},
+        )
 
 
 @app.get("/health")
@@ -49,12 +140,33 @@ async def health() -> dict:
     return {"status": "ok"}
 
 
-@app.post("/tasks", response_model=TaskResponse)
-async def submit_task(payload: TaskCreate) -> TaskResponse:
-    await enforce_rate_limit(f"user:{payload.user_id}", settings.rate_limit_per_user)
-    task = await create_task(payload.user_id, payload.description, payload.metadata)
-    schedule_task(task.id)
-    logger.info("task_submitted", extra={"task_id": task.id, "user_id": payload.user_id})
+@app.get("/ready")
+async def ready() -> JSONResponse:
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.snapshot())
+
+
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+def enforce_admission(route: str) -> None:
+    pressure = pool_pressure.current()
+    if pressure <= settings.db_admission_wait_threshold:
+        return
+    metrics.inc("admission_rejections_total", route=route)
+    logger.warning("request_shed route=%s pool_wait=%.3f", route, pressure)
+    raise HTTPException(
+        status_code=503,
+        detail="Service is overloaded",
+        headers={"Retry-After": str(max(1, math.ceil(pressure)))},
+    )
+
+
+def task_response(task: Task) -> TaskResponse:
     return TaskResponse(
         id=task.id,
         user_id=task.user_id,
@@ -67,49 +179,269 @@ async def submit_task(payload: TaskCreate) -> TaskResponse:
     )
 
 
+async def accept_task(payload: TaskCreate) -> Task:
+    await enforce_rate_limit(f"user:{payload.user_id}", settings.rate_limit_per_user)
+    task = await create_task(payload.user_id, payload.description, payload.metadata)
+    await task_queue.enqueue(task.id)
+    logger.info("task_submitted task_id=%s user_id=%s", task.id, payload.user_id)
+    return task
+
+
+@app.post("/tasks", response_model=TaskResponse)
+async def submit_task(
+    payload: TaskCreate, response: Response, idempotency_key: Optional[str] = Header(None)
+) -> TaskResponse:
+    enforce_admission("/tasks")
+    ttl = settings.idempotency_ttl if idempotency_key is not None else settings.dedup_window
+    if ttl <= 0:
+        return task_response(await accept_task(payload))
+    created: List[Task] = []
+
+    async def create() -> int:
+        created.append(await accept_task(payload))
+        return created[0].id
+
+    fingerprint = submission_fingerprint(payload.user_id, payload.description, payload.metadata)
+    try:
+        task_id, deduplicated = await deduplicator.submit(
+            submission_key(payload.user_id, fingerprint, idempotency_key), fingerprint, ttl, create
+        )
+    except IdempotencyConflict as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    except SubmissionInProgress as exc:
+        raise HTTPException(status_code=409, detail=str(exc), headers={"Retry-After": "1"}) from exc
+    if created:
+        return task_response(created[0])
+    response.headers["Idempotent-Replayed"] = "true"
+    metrics.inc("deduplicated_submissions_total", source="key" if idempotency_key is not None else "content")
+    logger.info("task_submission_deduplicated task_id=%s user_id=%s", task_id, payload.user_id)
+    async with get_session() as session:
+        task = await session.get(Task, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task_response(task)
+
+
+async def load_task_detail(task_id: int) -> Optional[TaskDetailResponse]:
+    async with get_session() as session:
+        result = await session.execute(
+            select(
+                Task.id,
+                Task.user_id,
+                Task.description,
+                Task.status,
+                Task.created_at,
+                Task.updated_at,
+                Task.cost,
+                Task.meta.label("metadata"),
+            ).where(Task.id == task_id)
+        )
+        task = result.mappings().one_or_none()
+    if task is None:
+        return None
+    steps = await list_task_steps(task_id, limit=None)
+    return TaskDetailResponse(**task, steps=[TaskStepResponse(**step) for step in steps.items])
+
+
 @app.get("/tasks/{task_id}", response_model=TaskDetailResponse)
 async def get_task(task_id: int) -> TaskDetailResponse:
-    async with get_session() as session:
-        result = await session.execute(select(Task).where(Task.id == task_id))
-        task = result.scalar_one_or_none()
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-    steps = await list_steps(task_id)
-    return TaskDetailResponse(
-        id=task.id,
-        user_id=task.user_id,
-        description=task.description,
-        status=task.status,
-        created_at=task.created_at,
-        updated_at=task.updated_at,
-        cost=task.cost,
-        metadata=task.meta,
-        steps=[
-            TaskStepResponse(
-                id=step.id,
-                step_index=step.step_index,
-                instruction=step.instruction,
-                status=step.status,
-                agent_type=step.agent_type,
-                cost=step.cost,
-            )
-            for step in steps
-        ],
+    detail = await load_task_detail(task_id)
+    if detail is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return detail
+
+
+async def iter_task_events(task_id: int, last_event_id: Optional[str]) -> AsyncIterator[Optional[TaskEvent]]:
+    async with event_bus.subscribe(task_id, last_event_id) as subscription:
+        if last_event_id is None:
+            detail = await load_task_detail(task_id)
+            if detail is None:
+                return
+            yield TaskEvent(id=subscription.cursor, task_id=task_id, event="snapshot", data=json.loads(detail.json()))
+            if detail.status.value in ("completed", "failed"):
+                return
+        while True:
+            event = await subscription.next(settings.event_keepalive_interval)
+            yield event
+            if event is not None and event.is_terminal:
+                return
+
+
+def format_sse(event: Optional[TaskEvent]) -> str:
+    if event is None:
+        return ": keepalive\n\n"
+    return f"id: {event.id}\nevent: {event.event}\ndata: {json.dumps(event.data, default=str)}\n\n"
+
+
+@app.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: int, last_event_id: Optional[str] = Header(None)) -> StreamingResponse:
+    async def body() -> AsyncIterator[str]:
+        try:
+            async for event in iter_task_events(task_id, last_event_id):
+                yield format_sse(event)
+        except SubscriptionOverflow:
+            logger.warning("task_event_subscriber_overflow task_id=%s", task_id)
+
+    if last_event_id is not None and not is_valid_event_id(last_event_id):
+        raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    if await get_task_status(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.websocket("/tasks/{task_id}/events")
+async def websocket_task_events(websocket: WebSocket, task_id: int, last_event_id: Optional[str] = None) -> None:
+    await websocket.accept()
+    if last_event_id is not None and not is_valid_event_id(last_event_id):
+        await websocket.close(code=4400)
+        return
+    if await get_task_status(task_id) is None:
+        await websocket.close(code=4404)
+        return
+    try:
+        async for event in iter_task_events(task_id, last_event_id):
+            if event is not None:
+                await websocket.send_json({"id": event.id, "event": event.event, "data": event.data})
+    except (SubscriptionOverflow, WebSocketDisconnect):
+        return
+    await websocket.close()
+
+
+@app.get("/users/{user_id}/tasks", response_model=TaskPage)
+async def get_user_tasks(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[TaskStatus] = None,
+) -> TaskPage:
+    try:
+        page = await list_user_tasks(user_id, limit, cursor, status)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return TaskPage(items=[TaskSummary(**item) for item in page.items], next_cursor=page.next_cursor)
+
+
+@app.get("/users/{user_id}/usage", response_model=UsageResponse)
+async def get_usage(user_id: str, days: int = Query(30, ge=1, le=366)) -> UsageResponse:
+    return UsageResponse(**await get_user_usage(user_id, days))
+
+
+@app.get("/tasks/{task_id}/steps", response_model=TaskStepPage)
+async def get_task_steps(task_id: int, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None) -> TaskStepPage:
+    try:
+        page = await list_task_steps(task_id, limit, cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return TaskStepPage(items=[TaskStepResponse(**item) for item in page.items], next_cursor=page.next_cursor)
+
+
+@app.get("/tasks/{task_id}/tool-calls", response_model=ToolCallPage)
+async def get_task_tool_calls(
+    task_id: int, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None
+) -> ToolCallPage:
+    try:
+        page = await list_tool_calls(task_id, limit, cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return ToolCallPage(items=[ToolCallResponse(**item) for item in page.items], next_cursor=page.next_cursor)
+
+
+@app.get("/tasks/{task_id}/memory", response_model=MemoryEntryPage)
+async def get_task_memory(
+    task_id: int, limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None
+) -> MemoryEntryPage:
+    try:
+        page = await list_memory_entries(task_id, limit, cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return MemoryEntryPage(items=[MemoryEntryResponse(**item) for item in page.items], next_cursor=page.next_cursor)
+
+
+async def memory_store() -> "LongTermMemoryStore":
+    if not settings.ml_enabled:
+        raise HTTPException(status_code=503, detail="Long-term memory is disabled in this process")
+    from memory.long_term import load_long_term_store
+
+    return await load_long_term_store()
+
+
 @app.post("/memory/search", response_model=MemorySearchResponse)
 async def search_memory(payload: MemorySearchRequest) -> MemorySearchResponse:
     await enforce_rate_limit("memory:search", settings.rate_limit_per_task)
-    results = await long_term_store.search(payload.query, k=payload.limit)
+    long_term_store = await memory_store()
+    outcome = await long_term_store.search(
+        payload.query,
+        k=payload.limit,
+        nprobe=payload.nprobe,
+        ef_search=payload.ef_search,
+        filters=payload.filters,
+        hybrid=payload.hybrid,
+    )
     return MemorySearchResponse(
         results=[
             MemorySearchResult(
-                id=record.embedding_id,
-                content=record.content,
-                metadata=record.meta,
-                distance=distance,
+                id=hit.record.embedding_id,
+                content=hit.record.content,
+                metadata=hit.record.meta,
+                distance=hit.distance,
+                score=hit.score,
             )
-            for record, distance in results
-        ]
+            for hit in outcome.hits
+        ],
+        timings=outcome.timings,
+        truncated=outcome.truncated,
+    )
+
+
+@app.post("/memory/bulk", response_model=MemoryBulkResponse)
+async def bulk_add_memory(payload: MemoryBulkRequest) -> MemoryBulkResponse:
+    if len(payload.items) > settings.memory_bulk_max_items:
+        raise HTTPException(status_code=413, detail=f"At most {settings.memory_bulk_max_items} items per request")
+    long_term_store = await memory_store()
+    ids = await long_term_store.add_texts(
+        [item.content for item in payload.items],
+        [item.metadata for item in payload.items],
     )
+    return MemoryBulkResponse(ids=ids)
+
+
+async def iter_ndjson_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+@app.post("/memory/import", response_model=MemoryImportResponse)
+async def import_memory(request: Request) -> MemoryImportResponse:
+    long_term_store = await memory_store()
+    imported = 0
+    batch: List[MemoryItem] = []
+    line_number = 0
+    async for line in iter_ndjson_lines(request):
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(MemoryItem(**json.loads(line)))
+        except (ValueError, TypeError, ValidationError) as exc:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid record on line {line_number}; {imported} items imported before it: {exc}",
+            ) from exc
+        if len(batch) >= settings.ingest_batch_size:
+            await long_term_store.add_texts([item.content for item in batch], [item.metadata for item in batch])
+            imported += len(batch)
+            batch = []
+    if batch:
+        await long_term_store.add_texts([item.content for item in batch], [item.metadata for item in batch])
+        imported += len(batch)
+    return MemoryImportResponse(imported=imported)
@@ -0,0 +1,340 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Table, delete, func, select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql import Select
+
+from api.config import settings
+from api.database import engine, get_session
+from api.metrics import metrics
+from api.models import (
+    PARTITION_TOOL_CALLS,
+    ShortTermMemory,
+    Task,
+    TaskQueueEntry,
+    TaskStatus,
+    TaskStep,
+    ToolCall,
+    UsageLedgerEntry,
+)
+
+logger = logging.getLogger(f"{settings.app_name}.maintenance")
+
+FINISHED_STATUSES = (TaskStatus.completed, TaskStatus.failed)
+TASK_CHILDREN = (ToolCall, ShortTermMemory, UsageLedgerEntry, TaskStep, TaskQueueEntry)
+ADVISORY_LOCK_KEY = 7_310_025
+PARTITION_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+async def compact_task_memory(task_id: int) -> int:
+    latest = (
+        select(func.max(ShortTermMemory.id))
+        .where(ShortTermMemory.task_id == task_id)
+        .group_by(ShortTermMemory.key)
+    )
+    async with get_session() as session:
+        result = await session.execute(
+            delete(ShortTermMemory)
+            .where(ShortTermMemory.task_id == task_id, ShortTermMemory.id.not_in(latest))
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    removed = result.rowcount or 0
+    if removed:
+        metrics.inc("maintenance_rows_total", removed, table="short_term_memory", action="compacted")
+    return removed
+
+
+def partition_period_start(day: date) -> date:
+    if settings.tool_call_partition_interval == "day":
+        return day
+    return day.replace(day=1)
+
+
+def next_partition_period(start: date) -> date:
+    if settings.tool_call_partition_interval == "day":
+        return start + timedelta(days=1)
+    return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def partition_name(start: date) -> str:
+    if settings.tool_call_partition_interval == "day":
+        return f"tool_calls_p{start:%Y_%m_%d}"
+    return f"tool_calls_p{start:%Y_%m}"
+
+
+class MaintenanceRunner:
+    def __init__(
+        self,
+        interval: float,
+        batch_size: int,
+        batch_pause: float,
+        lock_timeout: float,
+        archive_path: Optional[str] = None,
+    ) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.lock_timeout = lock_timeout
+        self.archive_path = archive_path
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def postgres(self) -> bool:
+        return engine.dialect.name == "postgresql"
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("maintenance_failed")
+            await asyncio.sleep(self.interval)
+
+    async def prepare(self) -> None:
+        if not PARTITION_TOOL_CALLS:
+            return
+        async with engine.connect() as conn:
+            await self.ensure_partitions(conn)
+
+    async def run_once(self) -> Dict[str, int]:
+        now = datetime.utcnow()
+        summary: Dict[str, int] = {}
+        with metrics.time("maintenance_run_duration_seconds"):
+            async with engine.connect() as conn:
+                if not await self._acquire(conn):
+                    logger.info("maintenance_skipped reason=locked")
+                    return summary
+                try:
+                    if PARTITION_TOOL_CALLS:
+                        summary["partitions_created"] = await self.ensure_partitions(conn)
+                    if settings.retention_days is not None:
+                        cutoff = now - timedelta(days=settings.retention_days)
+                        if PARTITION_TOOL_CALLS:
+                            summary["partitions_dropped"] = await self.drop_expired_partitions(conn, cutoff)
+                        else:
+                            summary["tool_calls"], _ = await self._purge(
+                                conn, ToolCall.__table__, self._expired_children(ToolCall, cutoff)
+                            )
+                        summary["short_term_memory"], _ = await self._purge(
+                            conn, ShortTermMemory.__table__, self._expired_children(ShortTermMemory, cutoff)
+                        )
+                    if settings.task_retention_days is not None:
+                        summary["tasks"] = await self.purge_tasks(
+                            conn, now - timedelta(days=settings.task_retention_days)
+                        )
+                finally:
+                    await self._release(conn)
+        logger.info(
+            "maintenance_completed %s", " ".join(f"{name}={count}" for name, count in summary.items()) or "idle"
+        )
+        return summary
+
+    async def _acquire(self, conn: AsyncConnection) -> bool:
+        if not self.postgres:
+            return True
+        locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        await conn.commit()
+        return bool(locked)
+
+    async def _release(self, conn: AsyncConnection) -> None:
+        if not self.postgres:
+            return
+        await conn.rollback()
+        await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        await conn.commit()
+
+    async def _limit_lock_wait(self, conn: AsyncConnection) -> None:
+        if self.postgres:
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{int(self.lock_timeout * 1000)}ms'"))
+
+    @staticmethod
+    def _expired_tasks(cutoff: datetime):
+        return Task.status.in_(FINISHED_STATUSES), Task.updated_at < cutoff
+
+    def _expired_children(self, model, cutoff: datetime) -> Select:
+        return (
+            select(model.id)
+            .join(Task, Task.id == model.task_id)
+            .where(*self._expired_tasks(cutoff))
+            .order_by(model.id)
+        )
+
+    async def _purge(self, conn: AsyncConnection, table: Table, ids: Select) -> Tuple[int, bool]:
+        purged = 0
+        while True:
+            try:
+                await self._limit_lock_wait(conn)
+                batch = (await conn.execute(ids.limit(self.batch_size))).scalars().all()
+                if batch:
+                    await self._archive(conn, table, batch)
+                    await conn.execute(delete(table).where(table.c.id.in_(batch)))
+                await conn.commit()
+            except DBAPIError as exc:
+                await conn.rollback()
+                logger.warning("maintenance_batch_failed table=%s error=%s", table.name, exc.orig)
+                return purged, False
+            purged += len(batch)
+            if batch:
+                metrics.inc("maintenance_rows_total", len(batch), table=table.name, action="deleted")
+            if len(batch) < self.batch_size:
+                return purged, True
+            await asyncio.sleep(self.batch_pause)
+
+    async def purge_tasks(self, conn: AsyncConnection, cutoff: datetime) -> int:
+        for model in TASK_CHILDREN:
+            _, complete = await self._purge(conn, model.__table__, self._expired_children(model, cutoff))
+            if not complete:
+                logger.warning("task_purge_skipped reason=incomplete_child_purge table=%s", model.__tablename__)
+                return 0
+        purged, _ = await self._purge(
+            conn, Task.__table__, select(Task.id).where(*self._expired_tasks(cutoff)).order_by(Task.id)
+        )
+        return purged
+
+    async def _archive(self, conn: AsyncConnection, table: Table, ids: List[int]) -> None:
+        if self.archive_path is None:
+            return
+        result = await conn.execute(select(table).where(table.c.id.in_(ids)).order_by(table.c.id))
+        await self._write_archive(table.name, [dict(row) for row in result.mappings().all()])
+
+    async def _write_archive(self, table_name: str, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        path = os.path.join(self.archive_path, f"{table_name}-{datetime.utcnow():%Y-%m-%d}.jsonl")
+        lines = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+        def append() -> None:
+            os.makedirs(self.archive_path, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as handle:
+                handle.write(lines)
+
+        await asyncio.to_thread(append)
+        metrics.inc("maintenance_rows_total", len(rows), table=table_name, action="archived")
+
+    async def _partitions(self, conn: AsyncConnection) -> Optional[Dict[str, Optional[datetime]]]:
+        partitioned = await conn.scalar(
+            text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('tool_calls'))")
+        )
+        if not partitioned:
+            await conn.commit()
+            logger.warning("tool_calls_not_partitioned action=skipped")
+            return None
+        result = await conn.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'tool_calls'::regclass"
+            )
+        )
+        partitions: Dict[str, Optional[datetime]] = {}
+        for name, bound in result.all():
+            match = PARTITION_UPPER_BOUND.search(bound or "")
+            partitions[name] = datetime.fromisoformat(match.group(1)) if match else None
+        await conn.commit()
+        return partitions
+
+    async def ensure_partitions(self, conn: AsyncConnection) -> int:
+        partitions = await self._partitions(conn)
+        if partitions is None:
+            return 0
+        created = 0
+        start = partition_period_start(datetime.utcnow().date())
+        await self._limit_lock_wait(conn)
+        for _ in range(settings.tool_call_partitions_ahead + 1):
+            end = next_partition_period(start)
+            name = partition_name(start)
+            if name not in partitions:
+                await conn.execute(
+                    text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF tool_calls "
+                        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                    )
+                )
+                created += 1
+            start = end
+        if "tool_calls_default" not in partitions:
+            await conn.execute(text("CREATE TABLE IF NOT EXISTS tool_calls_default PARTITION OF tool_calls DEFAULT"))
+        await conn.commit()
+        if created:
+            metrics.inc("maintenance_partitions_total", created, action="created")
+        return created
+
+    async def drop_expired_partitions(self, conn: AsyncConnection, cutoff: datetime) -> int:
+        partitions = await self._partitions(conn)
+        if partitions is None:
+            return 0
+        dropped = 0
+        for name, upper in sorted(partitions.items()):
+            if upper is None or upper > cutoff:
+                continue
+            if self.archive_path is not None:
+                await self._archive_partition(conn, name)
+            try:
+                await self._limit_lock_wait(conn)
+                await conn.execute(text(f"DROP TABLE {name}"))
+                await conn.commit()
+            except DBAPIError as exc:
+                await conn.rollback()
+                logger.warning("partition_drop_failed partition=%s error=%s", name, exc.orig)
+                continue
+            dropped += 1
+            metrics.inc("maintenance_partitions_total", action="dropped")
+            logger.info("partition_dropped partition=%s", name)
+        return dropped
+
+    async def _archive_partition(self, conn: AsyncConnection, name: str) -> None:
+        after = 0
+        while True:
+            result = await conn.execute(
+                text(f"SELECT * FROM {name} WHERE id > :after ORDER BY id LIMIT :limit"),
+                {"after": after, "limit": self.batch_size},
+            )
+            rows = [dict(row) for row in result.mappings().all()]
+            await conn.commit()
+            if not rows:
+                return
+            await self._write_archive(ToolCall.__tablename__, rows)
+            after = rows[-1]["id"]
+
+
+maintenance = MaintenanceRunner(
+    interval=settings.maintenance_interval,
+    batch_size=settings.maintenance_batch_size,
+    batch_pause=settings.maintenance_batch_pause,
+    lock_timeout=settings.maintenance_lock_timeout,
+    archive_path=settings.retention_archive_path,
+)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    async def run() -> None:
+        try:
+            await maintenance.run_once()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
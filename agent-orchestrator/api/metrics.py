@@ -0,0 +1,130 @@
+import contextlib
+import logging
+import time
+from typing import Callable, Dict, Iterator, Tuple
+
+from api.config import settings
+
+logger = logging.getLogger(f"{settings.app_name}.metrics")
+
+HISTOGRAMS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "http_request_duration_seconds": ("HTTP request latency by route", ("method", "route", "status")),
+    "planner_duration_seconds": ("Time spent planning a task", ()),
+    "queue_wait_seconds": ("Time between enqueueing a task and a worker claiming it", ()),
+    "step_run_duration_seconds": ("Agent run time per step", ("agent_type",)),
+    "db_session_duration_seconds": ("Lifetime of a database session", ()),
+    "db_pool_wait_seconds": ("Time spent waiting for a pooled connection", ()),
+    "embedding_duration_seconds": ("Time to embed one batch of texts", ()),
+    "faiss_search_duration_seconds": ("Vector index search latency", ()),
+    "tool_call_duration_seconds": ("Tool call latency", ("tool", "cached")),
+    "llm_request_duration_seconds": ("LLM request latency, per batch or stream", ("provider", "mode")),
+    "llm_time_to_first_token_seconds": ("Time until the first streamed token", ("provider",)),
+    "maintenance_run_duration_seconds": ("Duration of a maintenance pass", ()),
+}
+GAUGES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "tasks_in_flight": ("Tasks currently executing in this worker", ()),
+    "db_pool_checkout_wait_seconds": ("Time the most recent session waited for a pooled connection", ()),
+    "db_pool_checked_out": ("Connections currently checked out of the pool", ()),
+    "faiss_index_size": ("Vectors in the long-term memory index", ()),
+}
+COUNTERS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "rate_limit_rejections_total": ("Requests rejected by the rate limiter", ("scope",)),
+    "deduplicated_submissions_total": ("Task submissions answered with an existing task", ("source",)),
+    "admission_rejections_total": ("Requests shed because the connection pool is saturated", ("route",)),
+    "step_failures_total": ("Failed steps", ("agent_type",)),
+    "llm_tokens_total": ("Tokens sent to and received from LLM providers", ("provider", "kind")),
+    "llm_retries_total": ("Retried LLM requests", ("provider",)),
+    "maintenance_rows_total": ("Rows compacted, archived or deleted by maintenance", ("table", "action")),
+    "maintenance_partitions_total": ("tool_calls partitions created or dropped", ("action",)),
+    "budget_rejections_total": ("Steps and tool calls refused because a budget was exhausted", ("scope",)),
+    "tool_cache_hits_total": ("Tool results served from the cache", ("tool", "tier")),
+    "tool_cache_misses_total": ("Cacheable tool calls not found in the cache", ("tool",)),
+    "embedding_cache_hits_total": ("Texts whose embedding was served from the cache", ("tier",)),
+    "embedding_cache_misses_total": ("Texts that had to be embedded", ()),
+}
+
+
+class Metrics:
+    enabled = False
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        return None
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        return None
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        return None
+
+    def track(self, name: str, callback: Callable[[], float]) -> None:
+        return None
+
+    @contextlib.contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        yield
+
+    def render(self) -> Tuple[bytes, str]:
+        return b"", "text/plain"
+
+    def serve(self, port: int) -> None:
+        return None
+
+
+class PrometheusMetrics(Metrics):
+    enabled = True
+
+    def __init__(self, namespace: str) -> None:
+        import prometheus_client
+
+        self._client = prometheus_client
+        self.registry = prometheus_client.CollectorRegistry()
+        self._metrics: Dict[str, object] = {}
+        for kinds, factory in (
+            (HISTOGRAMS, prometheus_client.Histogram),
+            (GAUGES, prometheus_client.Gauge),
+            (COUNTERS, prometheus_client.Counter),
+        ):
+            for name, (description, labelnames) in kinds.items():
+                self._metrics[name] = factory(
+                    name, description, labelnames, namespace=namespace, registry=self.registry
+                )
+
+    def _child(self, name: str, labels: Dict[str, str]):
+        metric = self._metrics[name]
+        return metric.labels(**labels) if labels else metric
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self._child(name, labels).observe(value)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        self._child(name, labels).inc(amount)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self._child(name, labels).set(value)
+
+    def track(self, name: str, callback: Callable[[], float]) -> None:
+        self._metrics[name].set_function(callback)
+
+    @contextlib.contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._child(name, labels).observe(time.perf_counter() - started)
+
+    def render(self) -> Tuple[bytes, str]:
+        return self._client.generate_latest(self.registry), self._client.CONTENT_TYPE_LATEST
+
+    def serve(self, port: int) -> None:
+        self._client.start_http_server(port, registry=self.registry)
+        logger.info("metrics_server_started port=%s", port)
+
+
+def create_metrics() -> Metrics:
+    if not settings.metrics_enabled:
+        return Metrics()
+    return PrometheusMetrics(settings.metrics_namespace)
+
+
+metrics = create_metrics()
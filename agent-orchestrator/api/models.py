@@ -3,18 +3,30 @@ from datetime import datetime
 
 from sqlalchemy import (
     JSON,
+    Boolean,
     Column,
+    Date,
     DateTime,
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    Sequence,
     String,
     Text,
+    func,
+    literal_column,
 )
 from sqlalchemy.orm import relationship
 
-from api.database import Base
+from api.config import settings
+from api.database import Base, engine
+
+
+PARTITION_TOOL_CALLS = settings.tool_call_partitioning and engine.dialect.name == "postgresql"
+
+embedding_id_sequence = Sequence("long_term_memory_embedding_id_seq")
 
 
 class TaskStatus(str, enum.Enum):
@@ -28,7 +40,7 @@ class Task(Base):
     __tablename__ = "tasks"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(String, nullable=False, index=True)
+    user_id = Column(String, nullable=False)
     description = Column(Text, nullable=False)
     status = Column(Enum(TaskStatus), default=TaskStatus.pending, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -40,51 +52,120 @@ class Task(Base):
     tool_calls = relationship("ToolCall", back_populates="task", cascade="all, delete-orphan")
     memories = relationship("ShortTermMemory", back_populates="task", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_tasks_user_id_created_at", user_id, created_at, id),
+        Index("ix_tasks_status_updated_at", status, updated_at),
+    )
+
 
 class TaskStep(Base):
     __tablename__ = "task_steps"
 
     id = Column(Integer, primary_key=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
     step_index = Column(Integer, nullable=False)
     instruction = Column(Text, nullable=False)
     status = Column(Enum(TaskStatus), default=TaskStatus.pending, nullable=False)
     agent_type = Column(String, nullable=False)
     cost = Column(Float, default=0.0)
+    depends_on = Column(JSON, default=list, nullable=False)
 
     task = relationship("Task", back_populates="steps")
 
+    __table_args__ = (Index("ix_task_steps_task_id_step_index", task_id, step_index),)
+
+
+class TaskQueueEntry(Base):
+    __tablename__ = "task_queue"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False, unique=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True, index=True)
+    enqueued_at = Column(DateTime, default=datetime.utcnow)
+
 
 class ToolCall(Base):
     __tablename__ = "tool_calls"
 
-    id = Column(Integer, primary_key=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
     agent_type = Column(String, nullable=False)
     tool_name = Column(String, nullable=False)
     arguments = Column(JSON, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    cached = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, primary_key=PARTITION_TOOL_CALLS)
 
     task = relationship("Task", back_populates="tool_calls")
 
+    __table_args__ = (
+        Index("ix_tool_calls_task_id_id", task_id, id),
+        {"postgresql_partition_by": "RANGE (created_at)"} if PARTITION_TOOL_CALLS else {},
+    )
+
+
+class UsageLedgerEntry(Base):
+    __tablename__ = "usage_ledger"
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
+    step_id = Column(Integer, nullable=True)
+    user_id = Column(String, nullable=True)
+    kind = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    calls = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    compute_seconds = Column(Float, default=0.0, nullable=False)
+    cost = Column(Float, default=0.0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_usage_ledger_task_id_id", task_id, id),)
+
+
+class UsageRollup(Base):
+    __tablename__ = "usage_rollups"
+
+    user_id = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    tasks = Column(Integer, default=0, nullable=False)
+    tool_calls = Column(Integer, default=0, nullable=False)
+    prompt_tokens = Column(Integer, default=0, nullable=False)
+    completion_tokens = Column(Integer, default=0, nullable=False)
+    compute_seconds = Column(Float, default=0.0, nullable=False)
+    cost = Column(Float, default=0.0, nullable=False)
+
 
 class ShortTermMemory(Base):
     __tablename__ = "short_term_memory"
 
     id = Column(Integer, primary_key=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id"), nullable=False)
     key = Column(String, nullable=False)
     value = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     task = relationship("Task", back_populates="memories")
 
+    __table_args__ = (Index("ix_short_term_memory_task_id_id", task_id, id),)
+
 
 class LongTermMemory(Base):
     __tablename__ = "long_term_memory"
 
     id = Column(Integer, primary_key=True)
-    embedding_id = Column(Integer, unique=True, nullable=False)
+    embedding_id = Column(Integer, embedding_id_sequence, unique=True, nullable=False)
     content = Column(Text, nullable=False)
     meta = Column("metadata", JSON, default=dict)
+    task_id = Column(Integer, nullable=True, index=True)
+    user_id = Column(String, nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index(
+            "ix_long_term_memory_content_fts",
+            func.to_tsvector(literal_column("'english'"), content),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
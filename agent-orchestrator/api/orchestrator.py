@@ -1,32 +1,45 @@
 import asyncio
-from typing import List
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from agents.agent import (
     mark_step_status,
     mark_task_status,
     resolve_agent,
-    update_cost,
 )
-from api.database import get_session
+from agents.unit_of_work import StepUnitOfWork
+from api.config import settings
+from api.database import count_statements, get_session
+from api.events import event_bus
+from api.ledger import BudgetExceeded, budgets, meter, rollup_increment, task_budget, usage_day
+from api.maintenance import compact_task_memory
+from api.metrics import metrics
 from api.models import Task, TaskStatus, TaskStep
-from planner.planner import assign_agent, decompose_task
+from memory.short_term import short_term_store
+from planner.planner import plan_task_async
+
+logger = logging.getLogger(f"{settings.app_name}.orchestrator")
 
 
 async def create_task(user_id: str, description: str, metadata: dict) -> Task:
+    with metrics.time("planner_duration_seconds"):
+        planned_steps = await plan_task_async(description)
     async with get_session() as session:
         task = Task(user_id=user_id, description=description, meta=metadata)
         session.add(task)
         await session.flush()
-        steps = decompose_task(description)
-        for index, instruction in enumerate(steps):
+        await session.execute(rollup_increment(user_id, usage_day(), tasks=1))
+        for index, planned in enumerate(planned_steps):
             session.add(
                 TaskStep(
                     task_id=task.id,
                     step_index=index,
-                    instruction=instruction,
-                    agent_type=assign_agent(instruction),
+                    instruction=planned.instruction,
+                    agent_type=planned.agent_type,
+                    depends_on=planned.depends_on,
                 )
             )
         await session.commit()
@@ -40,22 +53,137 @@ async def list_steps(task_id: int) -> List[TaskStep]:
         return result.scalars().all()
 
 
-async def run_task(task_id: int) -> None:
-    await mark_task_status(task_id, TaskStatus.running)
-    steps = await list_steps(task_id)
-    for step in steps:
+async def get_task_status(task_id: int) -> TaskStatus | None:
+    async with get_session() as session:
+        result = await session.execute(select(Task.status).where(Task.id == task_id))
+        return result.scalar_one_or_none()
+
+
+async def load_task_owner(task_id: int) -> Optional[Dict[str, Any]]:
+    async with get_session() as session:
+        result = await session.execute(select(Task.status, Task.user_id, Task.meta).where(Task.id == task_id))
+        row = result.mappings().one_or_none()
+        return dict(row) if row is not None else None
+
+
+async def run_step(step: TaskStep, user_id: Optional[str] = None, budget: Optional[float] = None) -> bool:
+    unit_of_work = StepUnitOfWork(
+        task_id=step.task_id,
+        step_id=step.id,
+        short_term=short_term_store,
+        user_id=user_id,
+        task_budget=budget,
+    )
+    succeeded = True
+    with count_statements() as counter:
         try:
+            await unit_of_work.check_budget()
             await mark_step_status(step.id, TaskStatus.running)
-            agent = await resolve_agent(step)
-            await agent.run(step.instruction)
-            await update_cost(step.task_id, step.id, 0.01)
-            await mark_step_status(step.id, TaskStatus.completed)
+            await event_bus.publish(step.task_id, "step.status", {"step_id": step.id, "status": TaskStatus.running.value})
+            agent = await resolve_agent(step, unit_of_work)
+            started = time.perf_counter()
+            try:
+                with metrics.time("step_run_duration_seconds", agent_type=step.agent_type):
+                    await agent.run(step.instruction)
+            finally:
+                unit_of_work.record_usage(
+                    "agent",
+                    step.agent_type,
+                    meter(compute_seconds=time.perf_counter() - started, base_cost=settings.cost_per_step),
+                )
+            unit_of_work.set_status(TaskStatus.completed)
+        except BudgetExceeded as exc:
+            unit_of_work.set_status(TaskStatus.failed)
+            metrics.inc("budget_rejections_total", scope=exc.scope)
+            logger.warning(
+                "budget_exceeded task_id=%s step_id=%s scope=%s limit=%.4f spent=%.4f",
+                step.task_id,
+                step.id,
+                exc.scope,
+                exc.limit,
+                exc.spent,
+            )
+            await event_bus.publish(
+                step.task_id,
+                "budget.exceeded",
+                {"step_id": step.id, "scope": exc.scope, "limit": exc.limit, "spent": exc.spent},
+            )
+            succeeded = False
+        except Exception as exc:
+            unit_of_work.set_status(TaskStatus.failed)
+            metrics.inc("step_failures_total", agent_type=step.agent_type)
+            logger.warning("step_failed task_id=%s step_id=%s error=%s", step.task_id, step.id, exc)
+            succeeded = False
+        try:
+            await unit_of_work.flush()
         except Exception:
-            await mark_step_status(step.id, TaskStatus.failed)
-            await mark_task_status(task_id, TaskStatus.failed)
-            return
-    await mark_task_status(task_id, TaskStatus.completed)
+            logger.exception("step_flush_failed task_id=%s step_id=%s", step.task_id, step.id)
+            metrics.inc("step_failures_total", agent_type=step.agent_type)
+            succeeded = False
+            await fail_steps(step.task_id, [step])
+    logger.debug("step_finished step_id=%s succeeded=%s statements=%s", step.id, succeeded, counter.statements)
+    return succeeded
+
 
+async def set_task_status(task_id: int, status: TaskStatus) -> None:
+    await mark_task_status(task_id, status)
+    await event_bus.publish(task_id, "task.status", {"status": status.value})
 
-def schedule_task(task_id: int) -> None:
-    asyncio.create_task(run_task(task_id))
+
+async def fail_steps(task_id: int, steps: List[TaskStep]) -> None:
+    async with get_session() as session:
+        await session.execute(
+            update(TaskStep).where(TaskStep.id.in_([step.id for step in steps])).values(status=TaskStatus.failed)
+        )
+        await session.commit()
+    for step in steps:
+        await event_bus.publish(task_id, "step.status", {"step_id": step.id, "status": TaskStatus.failed.value})
+
+
+async def run_task(task_id: int) -> None:
+    owner = await load_task_owner(task_id)
+    if owner is None or owner["status"] in (TaskStatus.completed, TaskStatus.failed):
+        return
+    budget = task_budget(owner["meta"])
+    await set_task_status(task_id, TaskStatus.running)
+    steps = await list_steps(task_id)
+    known = {step.step_index for step in steps}
+    completed: Set[int] = {step.step_index for step in steps if step.status == TaskStatus.completed}
+    waiting = [step for step in steps if step.status != TaskStatus.completed]
+    in_flight: Dict[asyncio.Task, TaskStep] = {}
+    failed = False
+    try:
+        while waiting or in_flight:
+            if not failed:
+                ready = [step for step in waiting if known.intersection(step.depends_on or []) <= completed]
+                for step in ready[: max(settings.step_fan_out - len(in_flight), 0)]:
+                    waiting.remove(step)
+                    in_flight[asyncio.create_task(run_step(step, owner["user_id"], budget))] = step
+            if not in_flight:
+                break
+            finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for job in finished:
+                step = in_flight.pop(job)
+                try:
+                    succeeded = job.result()
+                except Exception:
+                    logger.exception("step_crashed task_id=%s step_id=%s", task_id, step.id)
+                    succeeded = False
+                if succeeded:
+                    completed.add(step.step_index)
+                else:
+                    failed = True
+    finally:
+        for job in in_flight:
+            job.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    if waiting:
+        await fail_steps(task_id, waiting)
+    await short_term_store.close_task(task_id)
+    budgets.forget_task(task_id)
+    if settings.memory_compaction:
+        await compact_task_memory(task_id)
+    if failed or waiting:
+        await set_task_status(task_id, TaskStatus.failed)
+        return
+    await set_task_status(task_id, TaskStatus.completed)
@@ -0,0 +1,283 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import redis.asyncio as redis
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from api.config import settings
+from api.database import get_session
+from api.models import TaskQueueEntry
+
+
+@dataclass
+class Lease:
+    task_id: int
+    attempts: int
+    enqueued_at: float
+
+
+class TaskQueue(ABC):
+    def __init__(self, visibility_timeout: float) -> None:
+        self.visibility_timeout = visibility_timeout
+
+    @abstractmethod
+    async def enqueue(self, task_id: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def claim(self, worker_id: str, limit: int) -> List[Lease]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def renew(self, worker_id: str, task_id: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def ack(self, task_id: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release(self, task_id: int) -> None:
+        raise NotImplementedError
+
+    async def wait_for_work(self, timeout: float) -> None:
+        await asyncio.sleep(timeout)
+
+    async def close(self) -> None:
+        return None
+
+
+class InMemoryTaskQueue(TaskQueue):
+    def __init__(self, visibility_timeout: float) -> None:
+        super().__init__(visibility_timeout)
+        self._ready: "OrderedDict[int, float]" = OrderedDict()
+        self._leases: Dict[int, tuple[str, float]] = {}
+        self._attempts: Dict[int, int] = {}
+        self._enqueued_at: Dict[int, float] = {}
+        self._available = asyncio.Event()
+
+    async def enqueue(self, task_id: int) -> None:
+        if task_id in self._ready or task_id in self._leases:
+            return
+        self._ready[task_id] = time.time()
+        self._enqueued_at[task_id] = time.time()
+        self._available.set()
+
+    def _reclaim_expired(self) -> None:
+        now = time.monotonic()
+        for task_id, (_, expires_at) in list(self._leases.items()):
+            if expires_at <= now:
+                del self._leases[task_id]
+                self._ready[task_id] = time.time()
+
+    async def claim(self, worker_id: str, limit: int) -> List[Lease]:
+        self._reclaim_expired()
+        leases = []
+        while self._ready and len(leases) < limit:
+            task_id, _ = self._ready.popitem(last=False)
+            self._attempts[task_id] = self._attempts.get(task_id, 0) + 1
+            self._leases[task_id] = (worker_id, time.monotonic() + self.visibility_timeout)
+            leases.append(Lease(task_id, self._attempts[task_id], self._enqueued_at[task_id]))
+        if not self._ready:
+            self._available.clear()
+        return leases
+
+    async def renew(self, worker_id: str, task_id: int) -> bool:
+        lease = self._leases.get(task_id)
+        if lease is None or lease[0] != worker_id:
+            return False
+        self._leases[task_id] = (worker_id, time.monotonic() + self.visibility_timeout)
+        return True
+
+    async def ack(self, task_id: int) -> None:
+        self._leases.pop(task_id, None)
+        self._ready.pop(task_id, None)
+        self._attempts.pop(task_id, None)
+        self._enqueued_at.pop(task_id, None)
+
+    async def release(self, task_id: int) -> None:
+        if self._leases.pop(task_id, None) is not None:
+            self._ready[task_id] = time.time()
+            self._available.set()
+
+    async def wait_for_work(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._available.wait(), timeout)
+        except asyncio.TimeoutError:
+            return
+
+
+class PostgresTaskQueue(TaskQueue):
+    async def enqueue(self, task_id: int) -> None:
+        async with get_session() as session:
+            session.add(TaskQueueEntry(task_id=task_id))
+            try:
+                await session.commit()
+            except IntegrityError:
+                await session.rollback()
+
+    async def claim(self, worker_id: str, limit: int) -> List[Lease]:
+        now = datetime.utcnow()
+        async with get_session() as session:
+            result = await session.execute(
+                select(TaskQueueEntry)
+                .where(or_(TaskQueueEntry.lease_expires_at.is_(None), TaskQueueEntry.lease_expires_at < now))
+                .order_by(TaskQueueEntry.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            entries = result.scalars().all()
+            for entry in entries:
+                entry.lease_owner = worker_id
+                entry.lease_expires_at = now + timedelta(seconds=self.visibility_timeout)
+                entry.attempts += 1
+            await session.commit()
+        return [
+            Lease(entry.task_id, entry.attempts, entry.enqueued_at.replace(tzinfo=timezone.utc).timestamp() if entry.enqueued_at else time.time())
+            for entry in entries
+        ]
+
+    async def renew(self, worker_id: str, task_id: int) -> bool:
+        async with get_session() as session:
+            result = await session.execute(
+                update(TaskQueueEntry)
+                .where(TaskQueueEntry.task_id == task_id, TaskQueueEntry.lease_owner == worker_id)
+                .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self.visibility_timeout))
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def ack(self, task_id: int) -> None:
+        async with get_session() as session:
+            await session.execute(delete(TaskQueueEntry).where(TaskQueueEntry.task_id == task_id))
+            await session.commit()
+
+    async def release(self, task_id: int) -> None:
+        async with get_session() as session:
+            await session.execute(
+                update(TaskQueueEntry)
+                .where(TaskQueueEntry.task_id == task_id)
+                .values(lease_owner=None, lease_expires_at=None)
+            )
+            await session.commit()
+
+
+_CLAIM_SCRIPT = """
+local ready, leases, attempts, owners = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local now, expires_at, limit, worker = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), ARGV[4]
+local expired = redis.call('ZRANGEBYSCORE', leases, '-inf', now)
+for _, task_id in ipairs(expired) do
+  redis.call('ZREM', leases, task_id)
+  redis.call('HDEL', owners, task_id)
+  redis.call('RPUSH', ready, task_id)
+end
+local claimed = {}
+for _ = 1, limit do
+  local task_id = redis.call('LPOP', ready)
+  if not task_id then break end
+  redis.call('ZADD', leases, expires_at, task_id)
+  redis.call('HSET', owners, task_id, worker)
+  local count = redis.call('HINCRBY', attempts, task_id, 1)
+  table.insert(claimed, task_id)
+  table.insert(claimed, count)
+end
+return claimed
+"""
+
+_ENQUEUE_SCRIPT = """
+local ready, leases, enqueued = KEYS[1], KEYS[2], KEYS[3]
+local task_id, now = ARGV[1], ARGV[2]
+if redis.call('HSETNX', enqueued, task_id, now) == 0 then return 0 end
+redis.call('RPUSH', ready, task_id)
+return 1
+"""
+
+_RENEW_SCRIPT = """
+local leases, owners = KEYS[1], KEYS[2]
+local task_id, worker, expires_at = ARGV[1], ARGV[2], tonumber(ARGV[3])
+if redis.call('HGET', owners, task_id) ~= worker then return 0 end
+redis.call('ZADD', leases, 'XX', expires_at, task_id)
+return 1
+"""
+
+_RELEASE_SCRIPT = """
+local ready, leases, owners = KEYS[1], KEYS[2], KEYS[3]
+local task_id = ARGV[1]
+if redis.call('ZREM', leases, task_id) == 1 then
+  redis.call('HDEL', owners, task_id)
+  redis.call('LPUSH', ready, task_id)
+end
+return 1
+"""
+
+
+class RedisTaskQueue(TaskQueue):
+    def __init__(self, visibility_timeout: float, prefix: str = "queue:tasks") -> None:
+        super().__init__(visibility_timeout)
+        self.redis = redis.from_url(settings.redis_url, decode_responses=True)
+        self._ready = f"{prefix}:ready"
+        self._leases = f"{prefix}:leases"
+        self._attempts = f"{prefix}:attempts"
+        self._owners = f"{prefix}:owners"
+        self._enqueued = f"{prefix}:enqueued"
+        self._claim = self.redis.register_script(_CLAIM_SCRIPT)
+        self._enqueue = self.redis.register_script(_ENQUEUE_SCRIPT)
+        self._renew = self.redis.register_script(_RENEW_SCRIPT)
+        self._release = self.redis.register_script(_RELEASE_SCRIPT)
+
+    async def enqueue(self, task_id: int) -> None:
+        await self._enqueue(keys=[self._ready, self._leases, self._enqueued], args=[task_id, time.time()])
+
+    async def claim(self, worker_id: str, limit: int) -> List[Lease]:
+        now = time.time()
+        flat = await self._claim(
+            keys=[self._ready, self._leases, self._attempts, self._owners],
+            args=[now, now + self.visibility_timeout, limit, worker_id],
+        )
+        if not flat:
+            return []
+        task_ids = [int(task_id) for task_id in flat[0::2]]
+        enqueued = await self.redis.hmget(self._enqueued, task_ids)
+        return [
+            Lease(task_id, int(count), float(enqueued_at) if enqueued_at else now)
+            for task_id, count, enqueued_at in zip(task_ids, flat[1::2], enqueued)
+        ]
+
+    async def renew(self, worker_id: str, task_id: int) -> bool:
+        renewed = await self._renew(
+            keys=[self._leases, self._owners],
+            args=[task_id, worker_id, time.time() + self.visibility_timeout],
+        )
+        return bool(renewed)
+
+    async def ack(self, task_id: int) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._leases, task_id)
+            pipe.lrem(self._ready, 0, task_id)
+            pipe.hdel(self._owners, task_id)
+            pipe.hdel(self._attempts, task_id)
+            pipe.hdel(self._enqueued, task_id)
+            await pipe.execute()
+
+    async def release(self, task_id: int) -> None:
+        await self._release(keys=[self._ready, self._leases, self._owners], args=[task_id])
+
+    async def close(self) -> None:
+        await self.redis.close()
+
+
+def create_task_queue(backend: Optional[str] = None) -> TaskQueue:
+    backend = backend or settings.queue_backend
+    if backend == "postgres":
+        return PostgresTaskQueue(settings.queue_visibility_timeout)
+    if backend == "redis":
+        return RedisTaskQueue(settings.queue_visibility_timeout)
+    if backend == "memory":
+        return InMemoryTaskQueue(settings.queue_visibility_timeout)
+    raise ValueError(f"Unknown queue backend '{backend}'")
@@ -1,17 +1,109 @@
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
 import redis.asyncio as redis
 
 from api.config import settings
 
+logger = logging.getLogger(f"{settings.app_name}.rate_limit")
+
+_GCRA_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local interval = period / limit
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local available = math.floor((now + period - tat) / interval + 1e-9)
+if available < 1 then
+  return {0, math.ceil((tat + interval - period - now) * 1000)}
+end
+local granted = math.min(requested, available)
+local new_tat = tat + granted * interval
+redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+return {granted, 0}
+"""
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    retry_after: float = 0.0
+
+
+@dataclass
+class _LocalBucket:
+    tokens: int
+    expires_at: float
+
 
 class RateLimiter:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        local_fraction: Optional[float] = None,
+        timeout: Optional[float] = None,
+        failure_mode: Optional[str] = None,
+        max_keys: int = 10000,
+    ) -> None:
         self.redis = redis.from_url(settings.redis_url, decode_responses=True)
+        self.local_fraction = settings.rate_limit_local_fraction if local_fraction is None else local_fraction
+        self.timeout = settings.rate_limit_timeout if timeout is None else timeout
+        self.failure_mode = failure_mode or settings.rate_limit_failure_mode
+        if self.failure_mode not in ("open", "closed"):
+            raise ValueError(f"Unknown rate limit failure mode '{self.failure_mode}'")
+        self._gcra = self.redis.register_script(_GCRA_SCRIPT)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, _LocalBucket]" = OrderedDict()
+
+    def _take_local(self, key: str) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return False
+        if bucket.expires_at <= time.monotonic():
+            del self._buckets[key]
+            return False
+        bucket.tokens -= 1
+        if bucket.tokens <= 0:
+            del self._buckets[key]
+        return True
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> RateLimitDecision:
+        if self._take_local(key):
+            return RateLimitDecision(allowed=True)
+        requested = max(1, int(limit * self.local_fraction))
+        try:
+            granted, retry_after_ms = await asyncio.wait_for(
+                self._gcra(keys=[f"ratelimit:{key}"], args=[limit, window_seconds, requested]),
+                timeout=self.timeout,
+            )
+        except (asyncio.TimeoutError, redis.RedisError) as exc:
+            logger.warning("rate_limit_backend_unavailable key=%s mode=%s error=%s", key, self.failure_mode, exc)
+            if self.failure_mode == "open":
+                return RateLimitDecision(allowed=True)
+            return RateLimitDecision(allowed=False, retry_after=float(window_seconds))
+        granted = int(granted)
+        if not granted:
+            return RateLimitDecision(allowed=False, retry_after=int(retry_after_ms) / 1000)
+        if granted > 1:
+            now = time.monotonic()
+            self._buckets[key] = _LocalBucket(tokens=granted - 1, expires_at=now + granted * window_seconds / limit)
+            self._buckets.move_to_end(key)
+            self._evict(now)
+        return RateLimitDecision(allowed=True)
 
-    async def hit(self, key: str, limit: int, window_seconds: int) -> bool:
-        current = await self.redis.incr(key)
-        if current == 1:
-            await self.redis.expire(key, window_seconds)
-        return current <= limit
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if bucket.expires_at > now and len(self._buckets) <= self.max_keys:
+                return
+            del self._buckets[key]
 
     async def close(self) -> None:
         await self.redis.close()
@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -30,6 +30,7 @@ class TaskStepResponse(BaseModel):
     status: TaskStatus
     agent_type: str
     cost: float
+    depends_on: List[int] = Field(default_factory=list)
 
 
 class TaskDetailResponse(TaskResponse):
@@ -39,14 +40,106 @@ class TaskDetailResponse(TaskResponse):
 class MemorySearchRequest(BaseModel):
     query: str
     limit: int = 5
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    filters: Dict[str, Any] = Field(default_factory=dict)
+    hybrid: bool = False
 
 
 class MemorySearchResult(BaseModel):
     id: int
     content: str
     metadata: dict
-    distance: float
+    distance: Optional[float]
+    score: float
 
 
 class MemorySearchResponse(BaseModel):
     results: List[MemorySearchResult]
+    timings: Dict[str, float] = Field(default_factory=dict)
+    truncated: bool = False
+
+
+class MemoryItem(BaseModel):
+    content: str
+    metadata: dict = Field(default_factory=dict)
+
+
+class MemoryBulkRequest(BaseModel):
+    items: List[MemoryItem]
+
+
+class MemoryBulkResponse(BaseModel):
+    ids: List[int]
+
+
+class MemoryImportResponse(BaseModel):
+    imported: int
+
+
+class TaskSummary(BaseModel):
+    id: int
+    description: str
+    status: TaskStatus
+    created_at: datetime
+    updated_at: datetime
+    cost: float
+
+
+class TaskPage(BaseModel):
+    items: List[TaskSummary]
+    next_cursor: Optional[str] = None
+
+
+class TaskStepPage(BaseModel):
+    items: List[TaskStepResponse]
+    next_cursor: Optional[str] = None
+
+
+class ToolCallResponse(BaseModel):
+    id: int
+    agent_type: str
+    tool_name: str
+    arguments: dict
+    cached: bool
+    created_at: datetime
+
+
+class ToolCallPage(BaseModel):
+    items: List[ToolCallResponse]
+    next_cursor: Optional[str] = None
+
+
+class MemoryEntryResponse(BaseModel):
+    id: int
+    key: str
+    value: str
+    created_at: datetime
+
+
+class MemoryEntryPage(BaseModel):
+    items: List[MemoryEntryResponse]
+    next_cursor: Optional[str] = None
+
+
+class UsageTotals(BaseModel):
+    tasks: int
+    tool_calls: int
+    prompt_tokens: int
+    completion_tokens: int
+    compute_seconds: float
+    cost: float
+
+
+class UsageDay(UsageTotals):
+    day: date
+
+
+class UsageResponse(BaseModel):
+    user_id: str
+    period_start: date
+    period_cost: float
+    budget: Optional[float] = None
+    remaining: Optional[float] = None
+    totals: UsageTotals
+    daily: List[UsageDay]
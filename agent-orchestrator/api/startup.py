@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from api.config import settings
+
+logger = logging.getLogger(f"{settings.app_name}.startup")
+
+Loader = Callable[[], Awaitable[None]]
+
+EMBEDDING_SEQUENCE_LOCK_KEY = 7_310_009
+SCHEMA_LOCK_KEY = 7_310_002
+ADDED_COLUMNS: List[Tuple[str, str, str]] = [
+    ("task_steps", "depends_on", "JSON NOT NULL DEFAULT '[]'"),
+    ("tool_calls", "cached", "BOOLEAN NOT NULL DEFAULT FALSE"),
+    ("long_term_memory", "task_id", "INTEGER"),
+    ("long_term_memory", "user_id", "VARCHAR"),
+]
+
+
+@dataclass
+class ComponentState:
+    status: str = "pending"
+    seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class Readiness:
+    def __init__(self) -> None:
+        self.components: Dict[str, ComponentState] = {}
+        self._finished = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._finished and all(state.status == "ready" for state in self.components.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "starting" if not self._finished else "failed",
+            "components": {name: asdict(state) for name, state in self.components.items()},
+        }
+
+    async def _load(self, name: str, loader: Loader) -> None:
+        state = self.components[name]
+        state.status = "loading"
+        started = time.perf_counter()
+        try:
+            await loader()
+        except Exception as exc:
+            state.status = "failed"
+            state.error = str(exc)
+            logger.exception("warm_up_failed component=%s", name)
+        else:
+            state.status = "ready"
+        finally:
+            state.seconds = round(time.perf_counter() - started, 3)
+        logger.info("warm_up_component component=%s status=%s seconds=%.3f", name, state.status, state.seconds)
+
+    async def warm_up(self, loaders: Dict[str, Loader]) -> bool:
+        self.components = {name: ComponentState() for name in loaders}
+        self._finished = False
+        started = time.perf_counter()
+        await asyncio.gather(*(self._load(name, loader) for name, loader in loaders.items()))
+        self._finished = True
+        logger.info("warm_up_completed ready=%s seconds=%.3f", self.ready, time.perf_counter() - started)
+        return self.ready
+
+    def start(self, loaders: Dict[str, Loader]) -> None:
+        self._task = asyncio.create_task(self.warm_up(loaders))
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+def _create_missing(sync_conn: Connection) -> None:
+    from api.database import Base
+
+    inspector = inspect(sync_conn)
+    for table, column, definition in ADDED_COLUMNS:
+        if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+            sync_conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            logger.info("schema_column_added table=%s column=%s", table, column)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def upgrade_schema(conn: AsyncConnection) -> None:
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+    await conn.run_sync(_create_missing)
+
+
+async def align_embedding_sequence(conn: AsyncConnection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+    from api.models import embedding_id_sequence
+
+    sequence = embedding_id_sequence.name
+    await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": EMBEDDING_SEQUENCE_LOCK_KEY})
+    await conn.execute(
+        text(
+            f"SELECT setval('{sequence}', stored.max_id) "
+            "FROM (SELECT COALESCE(MAX(embedding_id), 0) AS max_id FROM long_term_memory) AS stored, "
+            f"{sequence} AS current "
+            "WHERE stored.max_id > current.last_value "
+            "OR (NOT current.is_called AND stored.max_id >= current.last_value)"
+        )
+    )
+
+
+async def _load_embedding_model() -> None:
+    from memory.embeddings import embedding_service
+
+    await embedding_service.warm_up()
+
+
+async def _load_vector_index() -> None:
+    from memory.long_term import load_long_term_store
+
+    await load_long_term_store()
+
+
+def ml_loaders() -> Dict[str, Loader]:
+    if not settings.ml_enabled or not settings.warm_up:
+        return {}
+    return {"embedding_model": _load_embedding_model, "vector_index": _load_vector_index}
+
+
+async def close_ml_components() -> None:
+    if "memory.long_term" in sys.modules:
+        from memory.long_term import get_long_term_store
+
+        if get_long_term_store.cache_info().currsize:
+            await get_long_term_store().close()
+    if "memory.embeddings" in sys.modules:
+        from memory.embeddings import embedding_service
+
+        await embedding_service.close()
+
+
+readiness = Readiness()
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+import os
+import signal
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import select
+
+from agents.tools import registry
+from api.config import settings
+from api.database import Base, engine, get_session
+from api.events import event_bus
+from api.maintenance import maintenance
+from api.metrics import metrics
+from api.models import Task, TaskStatus
+from api.orchestrator import run_task, set_task_status
+from api.queue import Lease, TaskQueue, create_task_queue
+from api.startup import align_embedding_sequence, close_ml_components, ml_loaders, readiness, upgrade_schema
+from llm.providers import providers
+
+logger = logging.getLogger(f"{settings.app_name}.worker")
+
+
+async def recover_orphaned_tasks(queue: TaskQueue) -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.queue_visibility_timeout)
+    async with get_session() as session:
+        result = await session.execute(
+            select(Task.id).where(
+                Task.status.in_([TaskStatus.pending, TaskStatus.running]),
+                Task.updated_at < cutoff,
+            )
+        )
+        task_ids = result.scalars().all()
+    for task_id in task_ids:
+        await queue.enqueue(task_id)
+    return len(task_ids)
+
+
+class Worker:
+    def __init__(self, queue: TaskQueue, concurrency: int, worker_id: Optional[str] = None) -> None:
+        self.queue = queue
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        metrics.track("tasks_in_flight", lambda: len(self._in_flight))
+
+    def start(self) -> None:
+        self._loop_task = asyncio.create_task(self.run_forever())
+
+    async def stop(self, drain_timeout: float = 30.0) -> None:
+        self._stopping.set()
+        if self._loop_task is not None:
+            await self._loop_task
+        if self._in_flight:
+            done, pending = await asyncio.wait(list(self._in_flight.values()), timeout=drain_timeout)
+            for job in pending:
+                job.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run_forever(self) -> None:
+        recovered = await recover_orphaned_tasks(self.queue)
+        if recovered:
+            logger.info("orphaned_tasks_requeued count=%s", recovered)
+        while not self._stopping.is_set():
+            free = self.concurrency - len(self._in_flight)
+            leases = await self.queue.claim(self.worker_id, free) if free > 0 else []
+            for lease in leases:
+                metrics.observe("queue_wait_seconds", max(time.time() - lease.enqueued_at, 0.0))
+                job = asyncio.create_task(self._execute(lease))
+                self._in_flight[lease.task_id] = job
+                job.add_done_callback(lambda _, task_id=lease.task_id: self._in_flight.pop(task_id, None))
+            if not leases:
+                await self.queue.wait_for_work(settings.queue_poll_interval)
+
+    async def _renew_lease(self, task_id: int) -> None:
+        while True:
+            await asyncio.sleep(self.queue.visibility_timeout / 3)
+            if not await self.queue.renew(self.worker_id, task_id):
+                logger.warning("lease_lost task_id=%s", task_id)
+                return
+
+    async def _execute(self, lease: Lease) -> None:
+        if lease.attempts > settings.queue_max_attempts:
+            logger.error("task_attempts_exhausted task_id=%s attempts=%s", lease.task_id, lease.attempts)
+            await set_task_status(lease.task_id, TaskStatus.failed)
+            await self.queue.ack(lease.task_id)
+            return
+        renewer = asyncio.create_task(self._renew_lease(lease.task_id))
+        try:
+            await run_task(lease.task_id)
+        except asyncio.CancelledError:
+            await self.queue.release(lease.task_id)
+            raise
+        except Exception:
+            logger.exception("task_execution_error task_id=%s", lease.task_id)
+            await self.queue.release(lease.task_id)
+            return
+        finally:
+            renewer.cancel()
+        await self.queue.ack(lease.task_id)
+
+
+async def serve() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+        await align_embedding_sequence(conn)
+    providers.configure()
+    await maintenance.prepare()
+    queue = create_task_queue()
+    worker = Worker(queue, settings.worker_concurrency)
+    if settings.metrics_port is not None:
+        metrics.serve(settings.metrics_port)
+    loop = asyncio.get_running_loop()
+    shutdown = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, shutdown.set)
+    await readiness.warm_up(ml_loaders())
+    worker.start()
+    if settings.maintenance_enabled:
+        maintenance.start()
+    logger.info("worker_started worker_id=%s concurrency=%s", worker.worker_id, worker.concurrency)
+    await shutdown.wait()
+    await maintenance.stop()
+    await worker.stop()
+    await queue.close()
+    await event_bus.close()
+    await registry.close()
+    await providers.close()
+    await close_ml_components()
+    await engine.dispose()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
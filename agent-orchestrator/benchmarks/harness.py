@@ -0,0 +1,114 @@
+import os
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+
+def configure_environment(workdir: str, overrides: Optional[Dict[str, str]] = None) -> None:
+    os.makedirs(workdir, exist_ok=True)
+    defaults = {
+        "POSTGRES_DSN": f"sqlite+aiosqlite:///{os.path.join(workdir, 'benchmark.sqlite')}",
+        "REDIS_URL": "redis://benchmark/0",
+        "FAISS_INDEX_PATH": os.path.join(workdir, "faiss", "index"),
+        "EMBEDDING_BACKEND": "hash",
+        "EMBEDDING_CACHE_DIR": "",
+        "QUEUE_BACKEND": "redis",
+        "EVENT_BACKEND": "memory",
+        "EMBEDDED_WORKER": "true",
+        "VECTOR_SERVICE_SOCKET": "",
+        "METRICS_ENABLED": "false",
+        "LLM_PROVIDER": "mock",
+        "DEDUP_WINDOW": "0",
+        "RATE_LIMIT_PER_USER": "1000000000",
+        "RATE_LIMIT_PER_TASK": "1000000000",
+    }
+    defaults.update(overrides or {})
+    for key, value in defaults.items():
+        if value == "":
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+
+def install_fake_redis() -> None:
+    import fakeredis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+
+    def from_url(url: str, **kwargs: Any) -> "fakeredis.FakeAsyncRedis":
+        return fakeredis.FakeAsyncRedis(server=server, **kwargs)
+
+    redis.asyncio.from_url = from_url
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    operations: int
+    duration_seconds: float
+    ops_per_second: float
+    latency_ms: Dict[str, float]
+    parameters: Dict[str, Any] = field(default_factory=dict)
+
+
+class LatencyRecorder:
+    def __init__(self) -> None:
+        self.samples: List[float] = []
+        self.operations = 0
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def measure(self, operations: int = 1) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append(time.perf_counter() - started)
+            self.operations += operations
+
+    def result(self, name: str, **parameters: Any) -> BenchmarkResult:
+        duration = time.perf_counter() - self._started
+        samples = np.array(self.samples or [0.0]) * 1000
+        return BenchmarkResult(
+            name=name,
+            operations=self.operations,
+            duration_seconds=round(duration, 6),
+            ops_per_second=round(self.operations / duration, 3) if duration > 0 else 0.0,
+            latency_ms={
+                "mean": round(float(samples.mean()), 4),
+                "p50": round(float(np.percentile(samples, 50)), 4),
+                "p95": round(float(np.percentile(samples, 95)), 4),
+                "p99": round(float(np.percentile(samples, 99)), 4),
+                "max": round(float(samples.max()), 4),
+            },
+            parameters=parameters,
+        )
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(results: List[BenchmarkResult]) -> Dict[str, Any]:
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": [asdict(result) for result in results],
+    }
@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+from typing import List
+
+from benchmarks.harness import BenchmarkResult, configure_environment, install_fake_redis, report
+
+SCENARIOS = ("planner", "rate_limiter", "ingest", "search", "tasks")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run offline benchmarks and print JSON results.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--workdir", default=None, help="Directory for the SQLite database and FAISS files")
+    parser.add_argument("--output", default=None, help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--queue-backend", default="redis", choices=("redis", "memory", "postgres"))
+    parser.add_argument("--planner-iterations", type=int, default=10000)
+    parser.add_argument("--rate-limit-hits", type=int, default=5000)
+    parser.add_argument("--rate-limit-keys", type=int, default=100)
+    parser.add_argument("--ingest-items", type=int, default=5000)
+    parser.add_argument("--ingest-batch-size", type=int, default=256)
+    parser.add_argument("--corpus-sizes", default="1000,10000")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--task-timeout", type=float, default=60.0)
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace, workdir: str) -> List[BenchmarkResult]:
+    from api import main
+    from benchmarks import scenarios
+
+    selected = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    results: List[BenchmarkResult] = []
+    await main.on_startup()
+    try:
+        if "planner" in selected:
+            results.append(await scenarios.bench_planner(args.planner_iterations))
+        if "rate_limiter" in selected:
+            for local_fraction in (0.0, 0.1):
+                results.append(
+                    await scenarios.bench_rate_limiter(args.rate_limit_hits, args.rate_limit_keys, local_fraction)
+                )
+        if "ingest" in selected:
+            results.append(await scenarios.bench_ingest(workdir, args.ingest_items, args.ingest_batch_size))
+        if "search" in selected:
+            for corpus_size in (int(size) for size in args.corpus_sizes.split(",") if size.strip()):
+                for hybrid in (False, True):
+                    results.append(await scenarios.bench_search(workdir, corpus_size, args.queries, hybrid))
+        if "tasks" in selected:
+            results.append(await scenarios.bench_tasks(args.tasks, args.concurrency, args.task_timeout))
+    finally:
+        await main.on_shutdown()
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="orchestrator-bench-") as temporary:
+        workdir = args.workdir or temporary
+        configure_environment(workdir, {"QUEUE_BACKEND": args.queue_backend})
+        install_fake_redis()
+        results = asyncio.run(run(args, workdir))
+    payload = json.dumps(report(results), indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(payload + "\n")
+    else:
+        sys.stdout.write(payload + "\n")
+
+
+if __name__ == "__main__":
+    main()
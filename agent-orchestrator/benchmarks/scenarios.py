@@ -0,0 +1,116 @@
+import asyncio
+import os
+import random
+from typing import List
+
+import httpx
+
+from api import main
+from api.events import event_bus
+from api.rate_limit import RateLimiter
+from benchmarks.harness import BenchmarkResult, LatencyRecorder
+from memory.long_term import LongTermMemoryStore
+from memory.vector_index import LocalVectorIndex
+from planner.planner import plan_task
+
+VOCABULARY = (
+    "alpha beta gamma delta apples pears invoices revenue latency cluster deploy service "
+    "report summary budget forecast customer ticket backlog release migration schema index "
+    "cache queue worker memory vector search embedding planner agent tool cost metric"
+).split()
+TASK_TEMPLATES = (
+    "Research {0} and {1}. Then summarize the results.",
+    "Build the {0} service. Deploy it. Calculate totals for {1}.",
+    "Analyze {0}. Implement {1} based on step 1. Remember the {2} findings.",
+    "Handle {0} for {1}. Finally report on {2}.",
+)
+
+
+def synthetic_texts(count: int, seed: int, words: int = 12) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(words)) for _ in range(count)]
+
+
+def synthetic_descriptions(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(TASK_TEMPLATES).format(*rng.sample(VOCABULARY, 3)) for _ in range(count)]
+
+
+async def bench_planner(iterations: int) -> BenchmarkResult:
+    descriptions = synthetic_descriptions(iterations, seed=1)
+    recorder = LatencyRecorder()
+    for description in descriptions:
+        with recorder.measure():
+            plan_task(description)
+    return recorder.result("planner", iterations=iterations)
+
+
+async def bench_rate_limiter(hits: int, keys: int, local_fraction: float) -> BenchmarkResult:
+    limiter = RateLimiter(local_fraction=local_fraction)
+    recorder = LatencyRecorder()
+    for index in range(hits):
+        with recorder.measure():
+            await limiter.hit(f"benchmark:{index % keys}", 1_000_000_000, window_seconds=60)
+    await limiter.close()
+    return recorder.result("rate_limiter", hits=hits, keys=keys, local_fraction=local_fraction)
+
+
+def _store(workdir: str, name: str) -> LongTermMemoryStore:
+    return LongTermMemoryStore(vectors=LocalVectorIndex(index_path=os.path.join(workdir, name, "index")))
+
+
+async def bench_ingest(workdir: str, items: int, batch_size: int) -> BenchmarkResult:
+    store = _store(workdir, "ingest")
+    texts = synthetic_texts(items, seed=2)
+    recorder = LatencyRecorder()
+    for start in range(0, items, batch_size):
+        batch = texts[start : start + batch_size]
+        with recorder.measure(len(batch)):
+            await store.add_texts(batch, [{"source": "benchmark"} for _ in batch])
+    await store.close()
+    return recorder.result("memory_ingest", items=items, batch_size=batch_size)
+
+
+async def bench_search(workdir: str, corpus_size: int, queries: int, hybrid: bool) -> BenchmarkResult:
+    store = _store(workdir, f"search-{corpus_size}")
+    texts = synthetic_texts(corpus_size, seed=3)
+    for start in range(0, corpus_size, 1000):
+        batch = texts[start : start + 1000]
+        await store.add_texts(batch, [{"task_id": index % 100} for index in range(len(batch))])
+    recorder = LatencyRecorder()
+    for query in synthetic_texts(queries, seed=4, words=4):
+        with recorder.measure():
+            await store.search(query, k=5, hybrid=hybrid)
+    await store.close()
+    name = "memory_search_hybrid" if hybrid else "memory_search"
+    return recorder.result(name, corpus_size=corpus_size, queries=queries)
+
+
+async def _wait_for_completion(task_id: int, timeout: float) -> None:
+    async with event_bus.subscribe(task_id, "0-0") as subscription:
+        while True:
+            event = await subscription.next(timeout)
+            if event is None:
+                raise TimeoutError(f"Task {task_id} did not finish within {timeout}s")
+            if event.is_terminal:
+                return
+
+
+async def bench_tasks(tasks: int, concurrency: int, timeout: float) -> BenchmarkResult:
+    descriptions = synthetic_descriptions(tasks, seed=5)
+    semaphore = asyncio.Semaphore(concurrency)
+    recorder = LatencyRecorder()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+
+        async def submit(index: int) -> None:
+            async with semaphore:
+                with recorder.measure():
+                    response = await client.post(
+                        "/tasks", json={"user_id": f"user-{index % 10}", "description": descriptions[index]}
+                    )
+                    response.raise_for_status()
+                    await _wait_for_completion(response.json()["id"], timeout)
+
+        await asyncio.gather(*(submit(index) for index in range(tasks)))
+    return recorder.result("task_end_to_end", tasks=tasks, concurrency=concurrency)
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+_VOCABULARY = (
+    "plan review result step source data model service build deploy test summary risk metric "
+    "cache queue worker memory index agent tool report finding change option estimate"
+).split()
+
+
+class CompletionRequest(BaseModel):
+    model: str = "mock-1"
+    prompt: Union[str, List[str]]
+    max_tokens: int = Field(16, ge=1)
+    temperature: float = 0.0
+    stream: bool = False
+    stream_options: Optional[Dict[str, Any]] = None
+
+
+def count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def generate(prompt: str, max_tokens: int) -> List[str]:
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    length = min(max_tokens, 8 + digest[0] % 24)
+    return [_VOCABULARY[digest[index % len(digest)] % len(_VOCABULARY)] for index in range(1, length + 1)]
+
+
+def create_app(latency_ms: float = 0.0, token_delay_ms: float = 0.0, fail_every: int = 0) -> FastAPI:
+    app = FastAPI(title="Mock LLM", version="1.0.0")
+    app.state.requests = 0
+
+    @app.post("/v1/completions")
+    async def completions(payload: CompletionRequest):
+        app.state.requests += 1
+        if fail_every and app.state.requests % fail_every == 0:
+            raise HTTPException(status_code=503, detail="Injected failure", headers={"Retry-After": "0"})
+        prompts = [payload.prompt] if isinstance(payload.prompt, str) else payload.prompt
+        if not prompts:
+            raise HTTPException(status_code=400, detail="prompt must not be empty")
+        if payload.stream and len(prompts) != 1:
+            raise HTTPException(status_code=400, detail="Streaming supports a single prompt")
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        created = int(time.time())
+        outputs = [generate(prompt, payload.max_tokens) for prompt in prompts]
+        usage = {
+            "prompt_tokens": sum(count_tokens(prompt) for prompt in prompts),
+            "completion_tokens": sum(len(words) for words in outputs),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if not payload.stream:
+            return {
+                "id": f"cmpl-{created}",
+                "object": "text_completion",
+                "created": created,
+                "model": payload.model,
+                "choices": [
+                    {"index": index, "text": " ".join(words), "finish_reason": "length"}
+                    for index, words in enumerate(outputs)
+                ],
+                "usage": usage,
+            }
+
+        async def body() -> AsyncIterator[str]:
+            for position, word in enumerate(outputs[0]):
+                if token_delay_ms:
+                    await asyncio.sleep(token_delay_ms / 1000)
+                chunk = {
+                    "object": "text_completion",
+                    "model": payload.model,
+                    "choices": [{"index": 0, "text": word if position == 0 else f" {word}", "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final: Dict[str, Any] = {
+                "object": "text_completion",
+                "model": payload.model,
+                "choices": [{"index": 0, "text": "", "finish_reason": "length"}],
+            }
+            if (payload.stream_options or {}).get("include_usage"):
+                final["usage"] = usage
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    return app
+
+
+app = create_app()
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a deterministic OpenAI-compatible completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth request with 503")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.token_delay_ms, args.fail_every), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
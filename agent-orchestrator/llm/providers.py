@@ -0,0 +1,369 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+
+from api.config import settings
+from api.metrics import metrics
+
+logger = logging.getLogger(f"{settings.app_name}.llm")
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class LLMRetryableError(LLMError):
+    def __init__(self, message: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class CompletionRequest:
+    prompt: str
+    max_tokens: int
+    temperature: float = 0.0
+
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    model: str
+    provider: str
+
+
+@dataclass
+class _PendingCompletion:
+    request: CompletionRequest
+    future: asyncio.Future
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+class LLMProvider:
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        model: str,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 16,
+        max_connections: int = 32,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        batch_size: int = 16,
+        batch_wait_ms: float = 5.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.name = name
+        self.base_url = base_url
+        self.model = model
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.transport = transport
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending: Dict[Tuple[int, float], List[_PendingCompletion]] = {}
+        self._timers: Dict[Tuple[int, float], asyncio.TimerHandle] = {}
+        self._batches: Set[asyncio.Task] = set()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def _with_retries(self, operation):
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await operation()
+            except (httpx.TransportError, LLMRetryableError) as exc:
+                if attempt >= self.max_retries:
+                    raise LLMError(f"Provider '{self.name}' failed after {attempt + 1} attempts: {exc}") from exc
+                delay = self._backoff(attempt, getattr(exc, "retry_after", None))
+                metrics.inc("llm_retries_total", provider=self.name)
+                logger.warning(
+                    "llm_retry provider=%s attempt=%s delay=%.3f error=%s", self.name, attempt + 1, delay, exc
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def _payload(self, prompt: Any, request: CompletionRequest, stream: bool) -> Dict[str, Any]:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+        }
+        if stream:
+            payload.update(stream=True, stream_options={"include_usage": True})
+        return payload
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        if response.status_code in RETRYABLE_STATUS:
+            raise LLMRetryableError(f"HTTP {response.status_code}", _retry_after(response))
+        if response.status_code >= 400:
+            raise LLMError(f"HTTP {response.status_code}: {response.text[:500]}")
+
+    def _record(self, mode: str, started: float, prompt_tokens: int, completion_tokens: int) -> None:
+        metrics.observe("llm_request_duration_seconds", time.perf_counter() - started, provider=self.name, mode=mode)
+        metrics.inc("llm_tokens_total", prompt_tokens, provider=self.name, kind="prompt")
+        metrics.inc("llm_tokens_total", completion_tokens, provider=self.name, kind="completion")
+
+    async def _complete_batch(self, requests: List[CompletionRequest]) -> List[Completion]:
+        started = time.perf_counter()
+
+        async def send() -> Dict[str, Any]:
+            response = await self.client.post(
+                "/v1/completions", json=self._payload([request.prompt for request in requests], requests[0], False)
+            )
+            self._raise_for_status(response)
+            return response.json()
+
+        body = await self._with_retries(send)
+        texts = [""] * len(requests)
+        for choice in body.get("choices", []):
+            index = choice.get("index")
+            if not isinstance(index, int) or not 0 <= index < len(requests):
+                raise LLMError(f"Provider '{self.name}' returned choice index {index!r} for {len(requests)} prompts")
+            texts[index] = choice.get("text", "")
+        usage = body.get("usage") or {}
+        prompt_tokens = int(usage.get("prompt_tokens", 0))
+        completion_tokens = int(usage.get("completion_tokens", 0))
+        self._record("batch", started, prompt_tokens, completion_tokens)
+        prompt_weights = [max(len(request.prompt), 1) for request in requests]
+        completion_weights = [max(len(text), 1) for text in texts]
+        return [
+            Completion(
+                text=text,
+                prompt_tokens=round(prompt_tokens * prompt_weight / sum(prompt_weights)),
+                completion_tokens=round(completion_tokens * completion_weight / sum(completion_weights)),
+                model=body.get("model", self.model),
+                provider=self.name,
+            )
+            for text, prompt_weight, completion_weight in zip(texts, prompt_weights, completion_weights)
+        ]
+
+    async def complete(self, request: CompletionRequest) -> Completion:
+        if self.batch_size <= 1:
+            return (await self._complete_batch([request]))[0]
+        loop = asyncio.get_running_loop()
+        key = (request.max_tokens, request.temperature)
+        pending = _PendingCompletion(request=request, future=loop.create_future())
+        group = self._pending.setdefault(key, [])
+        group.append(pending)
+        if len(group) >= self.batch_size:
+            self._dispatch(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.batch_wait, self._dispatch, key)
+        return await pending.future
+
+    def _dispatch(self, key: Tuple[int, float]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[_PendingCompletion]) -> None:
+        try:
+            completions = await self._complete_batch([pending.request for pending in batch])
+        except Exception as exc:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+        for pending, completion in zip(batch, completions):
+            if not pending.future.done():
+                pending.future.set_result(completion)
+
+    async def stream(self, request: CompletionRequest, on_text: Callable[[str], Awaitable[None]]) -> Completion:
+        started = time.perf_counter()
+        usage: Dict[str, Any] = {}
+        parts: List[str] = []
+        model = self.model
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with self.client.stream(
+                        "POST", "/v1/completions", json=self._payload(request.prompt, request, True)
+                    ) as response:
+                        if response.status_code >= 400:
+                            await response.aread()
+                            self._raise_for_status(response)
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            chunk = json.loads(data)
+                            usage = chunk.get("usage") or usage
+                            model = chunk.get("model", model)
+                            for choice in chunk.get("choices", []):
+                                text = choice.get("text", "")
+                                if not text:
+                                    continue
+                                if not parts:
+                                    metrics.observe(
+                                        "llm_time_to_first_token_seconds",
+                                        time.perf_counter() - started,
+                                        provider=self.name,
+                                    )
+                                parts.append(text)
+                                await on_text(text)
+                break
+            except (httpx.TransportError, LLMRetryableError) as exc:
+                if parts or attempt >= self.max_retries:
+                    raise LLMError(f"Provider '{self.name}' stream failed: {exc}") from exc
+                delay = self._backoff(attempt, getattr(exc, "retry_after", None))
+                metrics.inc("llm_retries_total", provider=self.name)
+                logger.warning(
+                    "llm_retry provider=%s attempt=%s delay=%.3f error=%s", self.name, attempt + 1, delay, exc
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+        completion = Completion(
+            text="".join(parts),
+            prompt_tokens=int(usage.get("prompt_tokens", 0)),
+            completion_tokens=int(usage.get("completion_tokens", len(parts))),
+            model=model,
+            provider=self.name,
+        )
+        self._record("stream", started, completion.prompt_tokens, completion.completion_tokens)
+        return completion
+
+    async def close(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+        for batch in self._pending.values():
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(LLMError(f"Provider '{self.name}' is closed"))
+        self._timers, self._pending = {}, {}
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def create_provider(name: str = "default", overrides: Optional[Dict[str, str]] = None) -> Optional[LLMProvider]:
+    options = {
+        "provider": settings.llm_provider,
+        "base_url": settings.llm_base_url,
+        "model": settings.llm_model,
+        "api_key": settings.llm_api_key,
+    }
+    unknown = set(overrides or {}) - set(options)
+    if unknown:
+        raise ValueError(f"Unknown options for LLM provider '{name}': {', '.join(sorted(unknown))}")
+    options.update(overrides or {})
+    if options["provider"] == "none":
+        return None
+    if options["provider"] not in ("mock", "openai"):
+        raise ValueError(f"Unknown LLM provider '{options['provider']}'")
+    base_url = options["base_url"]
+    transport = None
+    if base_url is None:
+        if options["provider"] != "mock":
+            raise ValueError(f"A base URL is required for the openai provider '{name}'")
+        from llm.mock_server import create_app
+
+        base_url = "http://mock-llm"
+        transport = httpx.ASGITransport(app=create_app())
+    return LLMProvider(
+        name=name,
+        base_url=base_url,
+        model=options["model"],
+        api_key=options["api_key"],
+        max_concurrency=settings.llm_max_concurrency,
+        max_connections=settings.llm_max_connections,
+        timeout=settings.llm_timeout,
+        max_retries=settings.llm_max_retries,
+        backoff_base=settings.llm_backoff_base,
+        backoff_max=settings.llm_backoff_max,
+        batch_size=settings.llm_batch_size,
+        batch_wait_ms=settings.llm_batch_wait_ms,
+        transport=transport,
+    )
+
+
+class ProviderRegistry:
+    def __init__(self) -> None:
+        self._providers: Dict[str, Optional[LLMProvider]] = {}
+
+    def register(self, provider: LLMProvider) -> None:
+        self._providers[provider.name] = provider
+
+    def configure(self) -> None:
+        if "default" in settings.llm_providers:
+            raise ValueError("LLM_PROVIDERS cannot redefine 'default'; use the LLM_* settings")
+        missing = set(settings.llm_agent_providers.values()) - set(settings.llm_providers) - {"default"}
+        if missing:
+            raise ValueError(f"LLM_AGENT_PROVIDERS refers to unknown providers: {', '.join(sorted(missing))}")
+        for name, overrides in settings.llm_providers.items():
+            if name not in self._providers:
+                self._providers[name] = create_provider(name, overrides)
+
+    def get(self, name: str = "default") -> Optional[LLMProvider]:
+        if name not in self._providers:
+            if name != "default":
+                raise ValueError(f"LLM provider '{name}' is not registered")
+            self._providers[name] = create_provider(name)
+        return self._providers[name]
+
+    def for_agent(self, agent_type: str) -> Optional[LLMProvider]:
+        return self.get(settings.llm_agent_providers.get(agent_type, "default"))
+
+    async def close(self) -> None:
+        for provider in self._providers.values():
+            if provider is not None:
+                await provider.close()
+        self._providers = {}
+
+
+providers = ProviderRegistry()
@@ -0,0 +1,145 @@
+import fcntl
+import hashlib
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from api.metrics import metrics
+
+_WHITESPACE = re.compile(r"\s+")
+_DIGEST_SIZE = 32
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model_name: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).digest()
+
+
+@dataclass
+class EmbeddingCacheStats:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    disk_evictions: int = 0
+
+
+class DiskEmbeddingTier:
+    def __init__(self, directory: str, model_name: str, dim: int, capacity: int) -> None:
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16])
+        self.dim = dim
+        self.capacity = capacity
+        self._lock_path = f"{prefix}.lock"
+        self._cursor = self._open(f"{prefix}.cursor", np.int64, (1,))
+        self._keys = self._open(f"{prefix}.keys", np.uint8, (capacity, _DIGEST_SIZE))
+        self._vectors = self._open(f"{prefix}.f32", np.float32, (capacity, dim))
+        self._slots: Dict[bytes, int] = {}
+        for slot in np.flatnonzero(self._keys.any(axis=1)):
+            self._slots[self._keys[slot].tobytes()] = int(slot)
+
+    @staticmethod
+    def _open(path: str, dtype: type, shape: tuple) -> np.memmap:
+        mode = "r+" if os.path.exists(path) else "w+"
+        if mode == "r+" and os.path.getsize(path) != int(np.prod(shape)) * np.dtype(dtype).itemsize:
+            mode = "w+"
+        return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        slot = self._slots.get(key)
+        if slot is None:
+            return None
+        vector = np.array(self._vectors[slot])
+        if self._keys[slot].tobytes() != key:
+            del self._slots[key]
+            return None
+        return vector
+
+    def put(self, key: bytes, vector: np.ndarray) -> bool:
+        if key in self._slots:
+            return False
+        with open(self._lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            slot = int(self._cursor[0] % self.capacity)
+            self._cursor[0] += 1
+            evicted = self._keys[slot].tobytes()
+            self._keys[slot] = 0
+            self._vectors[slot] = vector
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+        overwritten = self._slots.pop(evicted, None) is not None
+        self._slots[key] = slot
+        return overwritten
+
+    def flush(self) -> None:
+        for array in (self._vectors, self._keys, self._cursor):
+            array.flush()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, max_entries: int, disk_tier: Optional[DiskEmbeddingTier] = None) -> None:
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_tier = disk_tier
+        self.stats = EmbeddingCacheStats()
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        hits, disk_hits, misses = self.stats.hits, self.stats.disk_hits, self.stats.misses
+        for text in dict.fromkeys(texts):
+            key = cache_key(self.model_name, text)
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                found[text] = vector
+                continue
+            vector = self.disk_tier.get(key) if self.disk_tier is not None else None
+            if vector is not None:
+                vector.setflags(write=False)
+                self._remember(key, vector)
+                self.stats.disk_hits += 1
+                found[text] = vector
+                continue
+            self.stats.misses += 1
+        if self.stats.hits > hits:
+            metrics.inc("embedding_cache_hits_total", self.stats.hits - hits, tier="memory")
+        if self.stats.disk_hits > disk_hits:
+            metrics.inc("embedding_cache_hits_total", self.stats.disk_hits - disk_hits, tier="disk")
+        if self.stats.misses > misses:
+            metrics.inc("embedding_cache_misses_total", self.stats.misses - misses)
+        return found
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        for text, vector in zip(texts, vectors):
+            key = cache_key(self.model_name, text)
+            stored = np.array(vector, dtype="float32")
+            stored.setflags(write=False)
+            self._remember(key, stored)
+            if self.disk_tier is not None and self.disk_tier.put(key, stored):
+                self.stats.disk_evictions += 1
+
+    def flush(self) -> None:
+        if self.disk_tier is not None:
+            self.disk_tier.flush()
@@ -1,21 +1,167 @@
+import asyncio
+import hashlib
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from functools import lru_cache
-from typing import List
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
 from api.config import settings
+from api.metrics import metrics
+from memory.embedding_cache import DiskEmbeddingTier, EmbeddingCache
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+_TOKEN = re.compile(r"\w+")
 
 
 @lru_cache(maxsize=1)
-def get_embedding_model() -> SentenceTransformer:
-    return SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+def get_embedding_model() -> "SentenceTransformer":
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(settings.embedding_model)
+
+
+def hash_embed_texts(texts: List[str]) -> np.ndarray:
+    dim = embedding_dimension()
+    vectors = np.zeros((len(texts), dim), dtype="float32")
+    for row, text in enumerate(texts):
+        for token in _TOKEN.findall(text.lower()):
+            value = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vectors[row, value % dim] += 1.0 if value >> 63 else -1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
 
 
-def embed_texts(texts: List[str]) -> List[list[float]]:
+def embed_texts(texts: List[str]) -> np.ndarray:
+    if settings.embedding_backend == "hash":
+        return hash_embed_texts(texts)
     model = get_embedding_model()
-    vectors = model.encode(texts, normalize_embeddings=True)
-    return vectors.tolist()
+    vectors = model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    return np.ascontiguousarray(vectors, dtype="float32")
+
+
+def embedding_model_name() -> str:
+    if settings.embedding_backend == "hash":
+        return f"hash-{embedding_dimension()}"
+    return settings.embedding_model
 
 
 def embedding_dimension() -> int:
     return settings.embedding_dim
+
+
+@dataclass
+class _EmbeddingRequest:
+    texts: List[str]
+    future: asyncio.Future
+
+
+class EmbeddingService:
+    def __init__(
+        self,
+        max_batch_size: int,
+        max_wait_ms: float,
+        workers: int,
+        cache: Optional[EmbeddingCache] = None,
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embedding")
+        self._pending: List[_EmbeddingRequest] = []
+        self._pending_texts = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, embedding_dimension()), dtype="float32")
+        if self.cache is None:
+            return await self._enqueue(texts)
+        found = self.cache.get_many(texts)
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            vectors = await self._enqueue(missing)
+            self.cache.put_many(missing, vectors)
+            found.update(zip(missing, vectors))
+        return np.stack([found[text] for text in texts])
+
+    async def warm_up(self) -> None:
+        if settings.embedding_backend != "hash":
+            await asyncio.get_running_loop().run_in_executor(self._executor, get_embedding_model)
+
+    async def _enqueue(self, texts: List[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        request = _EmbeddingRequest(texts=list(texts), future=loop.create_future())
+        self._pending.append(request)
+        self._pending_texts += len(texts)
+        if self._pending_texts >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+        return await request.future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_texts = self._pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[_EmbeddingRequest]) -> None:
+        positions: Dict[str, int] = {}
+        for request in batch:
+            for text in request.texts:
+                positions.setdefault(text, len(positions))
+        started = time.perf_counter()
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(self._executor, embed_texts, list(positions))
+            metrics.observe("embedding_duration_seconds", time.perf_counter() - started)
+        except Exception as exc:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+            return
+        for request in batch:
+            if not request.future.done():
+                request.future.set_result(vectors[[positions[text] for text in request.texts]])
+
+    async def close(self) -> None:
+        self._dispatch()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self.cache is not None:
+            self.cache.flush()
+        self._executor.shutdown(wait=False)
+
+
+def create_embedding_cache() -> Optional[EmbeddingCache]:
+    if settings.embedding_cache_size <= 0:
+        return None
+    disk_tier = None
+    if settings.embedding_cache_dir:
+        disk_tier = DiskEmbeddingTier(
+            settings.embedding_cache_dir,
+            embedding_model_name(),
+            embedding_dimension(),
+            settings.embedding_disk_cache_size,
+        )
+    return EmbeddingCache(embedding_model_name(), settings.embedding_cache_size, disk_tier)
+
+
+embedding_service = EmbeddingService(
+    max_batch_size=settings.embedding_max_batch_size,
+    max_wait_ms=settings.embedding_max_wait_ms,
+    workers=settings.embedding_workers,
+    cache=create_embedding_cache(),
+)
@@ -0,0 +1,199 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+from api.config import settings
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+METRICS = {"l2": faiss.METRIC_L2, "ip": faiss.METRIC_INNER_PRODUCT}
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    index_type: str = "flat"
+    metric: str = "l2"
+    nlist: int = 1024
+    pq_m: int = 16
+    pq_bits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    nprobe: int = 16
+    ef_search: int = 64
+    train_min_vectors: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type '{self.index_type}'")
+        if self.metric not in METRICS:
+            raise ValueError(f"Unknown FAISS metric '{self.metric}'")
+
+    @classmethod
+    def from_settings(cls) -> "IndexSpec":
+        return cls(
+            index_type=settings.faiss_index_type,
+            metric=settings.faiss_metric,
+            nlist=settings.faiss_nlist,
+            pq_m=settings.faiss_pq_m,
+            pq_bits=settings.faiss_pq_bits,
+            hnsw_m=settings.faiss_hnsw_m,
+            ef_construction=settings.faiss_ef_construction,
+            nprobe=settings.faiss_nprobe,
+            ef_search=settings.faiss_ef_search,
+            train_min_vectors=settings.faiss_train_min_vectors,
+        )
+
+    @property
+    def metric_type(self) -> int:
+        return METRICS[self.metric]
+
+    @property
+    def needs_training(self) -> bool:
+        return self.index_type in ("ivf_flat", "ivf_pq")
+
+    @property
+    def min_training_vectors(self) -> int:
+        if not self.needs_training:
+            return 0
+        if self.train_min_vectors is not None:
+            return self.train_min_vectors
+        return self.nlist * 39
+
+
+def _flat(dim: int, metric_type: int) -> faiss.Index:
+    return faiss.IndexIDMap2(faiss.IndexFlat(dim, metric_type))
+
+
+def build_index(spec: IndexSpec, dim: int) -> faiss.Index:
+    if spec.index_type == "flat":
+        return _flat(dim, spec.metric_type)
+    if spec.index_type == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, spec.hnsw_m, spec.metric_type)
+        base.hnsw.efConstruction = spec.ef_construction
+        base.hnsw.efSearch = spec.ef_search
+        return faiss.IndexIDMap2(base)
+    quantizer = faiss.IndexFlat(dim, spec.metric_type)
+    if spec.index_type == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, dim, spec.nlist, spec.metric_type)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, spec.nlist, spec.pq_m, spec.pq_bits, spec.metric_type)
+    index.nprobe = spec.nprobe
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def build_staging_index(spec: IndexSpec, dim: int) -> faiss.Index:
+    return _flat(dim, spec.metric_type)
+
+
+def _unwrap(index: faiss.Index) -> faiss.Index:
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def describe_index(index: faiss.Index) -> Tuple[str, str]:
+    base = _unwrap(index)
+    metric = "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw", metric
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq", metric
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat", metric
+    return "flat", metric
+
+
+def matches_spec(index: faiss.Index, spec: IndexSpec) -> bool:
+    return describe_index(index) == (spec.index_type, spec.metric)
+
+
+def export_vectors(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    index = faiss.downcast_index(index)
+    if index.ntotal == 0:
+        return np.empty(0, dtype="int64"), np.empty((0, index.d), dtype="float32")
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        ids = faiss.vector_to_array(index.id_map).astype("int64")
+        vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+        return ids, np.ascontiguousarray(vectors, dtype="float32")
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        ids = np.concatenate(
+            [
+                faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+                for list_no in range(index.nlist)
+                if invlists.list_size(list_no)
+            ]
+        ).astype("int64")
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        return ids, np.ascontiguousarray(index.reconstruct_batch(ids), dtype="float32")
+    raise ValueError(f"Cannot export vectors from {type(index).__name__}")
+
+
+def train_and_fill(spec: IndexSpec, dim: int, ids: np.ndarray, vectors: np.ndarray) -> faiss.Index:
+    index = build_index(spec, dim)
+    if spec.needs_training:
+        sample = vectors
+        limit = spec.nlist * 256
+        if len(vectors) > limit:
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), limit, replace=False)]
+        index.train(sample)
+    if len(ids):
+        index.add_with_ids(vectors, ids)
+    return index
+
+
+def search_parameters(
+    index: faiss.Index,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    selector: Optional[faiss.IDSelector] = None,
+) -> Optional[faiss.SearchParameters]:
+    base = _unwrap(index)
+    options = {} if selector is None else {"sel": selector}
+    if isinstance(base, faiss.IndexIVF) and (nprobe is not None or options):
+        return faiss.SearchParametersIVF(nprobe=nprobe or base.nprobe, **options)
+    if isinstance(base, faiss.IndexHNSW) and (ef_search is not None or options):
+        return faiss.SearchParametersHNSW(efSearch=ef_search or base.hnsw.efSearch, **options)
+    if options:
+        return faiss.SearchParameters(**options)
+    return None
+
+
+def supports_reconstruct_by_id(index: faiss.Index) -> bool:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap2):
+        return True
+    if isinstance(index, faiss.IndexIVF):
+        return index.direct_map.type == faiss.DirectMap.Hashtable
+    return False
+
+
+def exact_search(index: faiss.Index, vectors: np.ndarray, k: int, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    found_ids = []
+    rows = []
+    for embedding_id in ids:
+        try:
+            rows.append(index.reconstruct(int(embedding_id)))
+        except RuntimeError:
+            continue
+        found_ids.append(int(embedding_id))
+    distances = np.full((len(vectors), k), np.inf, dtype="float32")
+    labels = np.full((len(vectors), k), -1, dtype="int64")
+    if not rows:
+        return distances, labels
+    candidates = np.vstack(rows).astype("float32")
+    candidate_ids = np.array(found_ids, dtype="int64")
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        scores = -(vectors @ candidates.T)
+    else:
+        scores = ((vectors[:, None, :] - candidates[None, :, :]) ** 2).sum(axis=2)
+    top = min(k, len(candidate_ids))
+    order = np.argsort(scores, axis=1)[:, :top]
+    labels[:, :top] = candidate_ids[order]
+    distances[:, :top] = np.take_along_axis(scores, order, axis=1)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        distances[:, :top] = -distances[:, :top]
+    return distances, labels
@@ -0,0 +1,171 @@
+import asyncio
+import glob
+import logging
+import os
+import re
+import struct
+import time
+import zlib
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from api.config import settings
+
+logger = logging.getLogger(f"{settings.app_name}.index_store")
+
+_SEGMENT_MAGIC = b"FWAL"
+_SEGMENT_HEADER = struct.Struct("<4sI")
+_RECORD_HEADER = struct.Struct("<II")
+
+
+def _fsync_directory(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class IndexPersistence:
+    def __init__(
+        self,
+        index_path: str,
+        dim: int,
+        checkpoint_every: int,
+        checkpoint_interval: float,
+    ) -> None:
+        self.index_path = index_path
+        self.directory = os.path.dirname(index_path) or "."
+        self.dim = dim
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self._segment_number = 0
+        self._segment: Optional[BinaryIO] = None
+        self._pending_records = 0
+        self._last_checkpoint = time.monotonic()
+
+    def _checkpoint_path(self, number: int) -> str:
+        return f"{self.index_path}.{number}"
+
+    def _segment_path(self, number: int) -> str:
+        return f"{self.index_path}.wal.{number}"
+
+    def _numbered(self, pattern: str, suffix: str) -> List[Tuple[int, str]]:
+        matcher = re.compile(re.escape(self.index_path) + suffix + r"(\d+)$")
+        found = []
+        for path in glob.glob(glob.escape(self.index_path) + pattern):
+            match = matcher.match(path)
+            if match:
+                found.append((int(match.group(1)), path))
+        return sorted(found)
+
+    def _checkpoints(self) -> List[Tuple[int, str]]:
+        return self._numbered(".*", r"\.")
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        return self._numbered(".wal.*", r"\.wal\.")
+
+    def _replay(self, path: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        with open(path, "rb") as segment:
+            header = segment.read(_SEGMENT_HEADER.size)
+            if len(header) < _SEGMENT_HEADER.size:
+                return
+            magic, dim = _SEGMENT_HEADER.unpack(header)
+            if magic != _SEGMENT_MAGIC or dim != self.dim:
+                raise ValueError(f"WAL segment {path} does not match index dimension {self.dim}")
+            while True:
+                record_header = segment.read(_RECORD_HEADER.size)
+                if len(record_header) < _RECORD_HEADER.size:
+                    return
+                count, checksum = _RECORD_HEADER.unpack(record_header)
+                payload = segment.read(count * (8 + 4 * dim))
+                if len(payload) < count * (8 + 4 * dim) or zlib.crc32(payload) != checksum:
+                    logger.warning("wal_torn_record path=%s", path)
+                    return
+                ids = np.frombuffer(payload, dtype="int64", count=count)
+                vectors = np.frombuffer(payload, dtype="float32", offset=count * 8).reshape(count, dim)
+                yield ids, vectors
+
+    def load(self, create: Callable[[], faiss.Index]) -> faiss.Index:
+        os.makedirs(self.directory, exist_ok=True)
+        checkpoints = self._checkpoints()
+        covered, path = checkpoints[-1] if checkpoints else (0, self.index_path)
+        segments = [(number, segment) for number, segment in self._segments() if number >= covered]
+        if checkpoints or os.path.exists(path):
+            index = faiss.read_index(path)
+        else:
+            index = create()
+        replayed = 0
+        for _, path in segments:
+            for ids, vectors in self._replay(path):
+                index.add_with_ids(vectors, ids)
+                replayed += len(ids)
+        self._pending_records = replayed
+        last = max([covered - 1] + [number for number, _ in segments])
+        self._open_segment(last + 1)
+        logger.info("faiss_index_loaded ntotal=%s replayed=%s", index.ntotal, replayed)
+        return index
+
+    def _open_segment(self, number: int) -> None:
+        self._segment_number = number
+        self._segment = open(self._segment_path(number), "ab")
+        if self._segment.tell() == 0:
+            self._segment.write(_SEGMENT_HEADER.pack(_SEGMENT_MAGIC, self.dim))
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            _fsync_directory(self.directory)
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        payload = np.ascontiguousarray(ids, dtype="int64").tobytes() + np.ascontiguousarray(vectors, dtype="float32").tobytes()
+        self._segment.write(_RECORD_HEADER.pack(len(ids), zlib.crc32(payload)) + payload)
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        self._pending_records += len(ids)
+
+    def checkpoint_due(self) -> bool:
+        if not self._pending_records:
+            return False
+        if self._pending_records >= self.checkpoint_every:
+            return True
+        return time.monotonic() - self._last_checkpoint >= self.checkpoint_interval
+
+    @property
+    def pending_records(self) -> int:
+        return self._pending_records
+
+    def seal(self, index: faiss.Index) -> Tuple[int, np.ndarray]:
+        snapshot = faiss.serialize_index(index)
+        self._segment.close()
+        self._open_segment(self._segment_number + 1)
+        self._pending_records = 0
+        self._last_checkpoint = time.monotonic()
+        return self._segment_number, snapshot
+
+    def _write_checkpoint(self, number: int, snapshot: np.ndarray) -> None:
+        target = self._checkpoint_path(number)
+        temporary = f"{target}.tmp"
+        with open(temporary, "wb") as handle:
+            handle.write(snapshot.tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, target)
+        _fsync_directory(self.directory)
+        for old_number, path in self._checkpoints():
+            if old_number < number:
+                os.remove(path)
+        for old_number, path in self._segments():
+            if old_number < number:
+                os.remove(path)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    async def write_checkpoint(self, number: int, snapshot: np.ndarray) -> None:
+        await asyncio.to_thread(self._write_checkpoint, number, snapshot)
+        logger.info("faiss_checkpoint_written number=%s", number)
+
+    def close(self) -> None:
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
@@ -1,58 +1,272 @@
 from __future__ import annotations
 
-import os
-from typing import List, Tuple
+import asyncio
+import contextlib
+import re
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Set, Tuple
 
-import faiss
 import numpy as np
-from sqlalchemy import select
+from sqlalchemy import func, insert, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.config import settings
-from api.database import get_session
-from api.models import LongTermMemory
-from memory.embeddings import embed_texts, embedding_dimension
+from api.database import engine, get_session
+from api.metrics import metrics
+from api.models import LongTermMemory, embedding_id_sequence
+from memory.embeddings import embedding_service
+
+if TYPE_CHECKING:
+    from memory.vector_index import LocalVectorIndex
+    from memory.vector_service import RemoteVectorIndex
+
+_id_lock = asyncio.Lock()
+_store_lock = asyncio.Lock()
+
+
+@dataclass
+class MemoryHit:
+    record: LongTermMemory
+    distance: Optional[float]
+    score: float
+
+
+@dataclass
+class MemorySearchOutcome:
+    hits: List[MemoryHit]
+    timings: Dict[str, float] = field(default_factory=dict)
+    truncated: bool = False
+
+
+def create_vector_index() -> LocalVectorIndex | RemoteVectorIndex:
+    if settings.vector_service_socket:
+        from memory.vector_service import RemoteVectorIndex
+
+        return RemoteVectorIndex(
+            settings.vector_service_socket,
+            settings.vector_service_pool_size,
+            settings.vector_service_refresh_interval,
+        )
+    from memory.vector_index import LocalVectorIndex
+
+    return LocalVectorIndex()
 
 
 class LongTermMemoryStore:
-    def __init__(self) -> None:
-        self.index_path = settings.faiss_index_path
-        self.index = self._load_or_create_index()
+    def __init__(self, vectors: Optional[LocalVectorIndex | RemoteVectorIndex] = None) -> None:
+        self.vectors = vectors or create_vector_index()
+        metrics.track("faiss_index_size", lambda: self.vectors.ntotal)
+
+    async def start(self) -> None:
+        await self.vectors.start()
 
-    def _load_or_create_index(self) -> faiss.Index:
-        if os.path.exists(self.index_path):
-            return faiss.read_index(self.index_path)
-        base_index = faiss.IndexFlatL2(embedding_dimension())
-        return faiss.IndexIDMap(base_index)
+    async def _allocate_ids(self, session: AsyncSession, count: int) -> np.ndarray:
+        if engine.dialect.supports_sequences:
+            result = await session.execute(
+                select(embedding_id_sequence.next_value()).select_from(func.generate_series(1, count))
+            )
+            return np.array(result.scalars().all(), dtype="int64")
+        result = await session.execute(select(func.coalesce(func.max(LongTermMemory.embedding_id), 0)))
+        start = result.scalar_one() + 1
+        return np.arange(start, start + count, dtype="int64")
 
-    def _persist(self) -> None:
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        faiss.write_index(self.index, self.index_path)
+    async def add_texts(self, contents: Sequence[str], metadatas: Optional[Sequence[dict]] = None) -> List[int]:
+        metadatas = metadatas if metadatas is not None else [{} for _ in contents]
+        if len(metadatas) != len(contents):
+            raise ValueError("contents and metadatas must have the same length")
+        allocated: List[int] = []
+        batch_size = settings.ingest_batch_size
+        for start in range(0, len(contents), batch_size):
+            batch = list(contents[start : start + batch_size])
+            batch_metadata = metadatas[start : start + batch_size]
+            vectors = await embedding_service.embed(batch)
+            id_lock = contextlib.nullcontext() if engine.dialect.supports_sequences else _id_lock
+            async with id_lock, get_session() as session:
+                ids = await self._allocate_ids(session, len(batch))
+                await session.execute(
+                    insert(LongTermMemory),
+                    [
+                        {
+                            "embedding_id": int(embedding_id),
+                            "content": content,
+                            "meta": metadata,
+                            "task_id": metadata.get("task_id"),
+                            "user_id": metadata.get("user_id"),
+                        }
+                        for embedding_id, content, metadata in zip(ids, batch, batch_metadata)
+                    ],
+                )
+                await self.vectors.add(ids, vectors)
+                await session.commit()
+            allocated.extend(int(embedding_id) for embedding_id in ids)
+        return allocated
 
     async def add_text(self, content: str, metadata: dict) -> int:
-        vector = embed_texts([content])[0]
+        ids = await self.add_texts([content], [metadata])
+        return ids[0]
+
+    async def close(self) -> None:
+        await self.vectors.close()
+
+    @staticmethod
+    def _filter_conditions(filters: Dict[str, Any]) -> List[Any]:
+        conditions = []
+        for key, value in filters.items():
+            if key in ("task_id", "user_id"):
+                conditions.append(getattr(LongTermMemory, key) == value)
+            elif isinstance(value, bool):
+                conditions.append(LongTermMemory.meta[key].as_boolean() == value)
+            elif isinstance(value, int):
+                conditions.append(LongTermMemory.meta[key].as_integer() == value)
+            elif isinstance(value, float):
+                conditions.append(LongTermMemory.meta[key].as_float() == value)
+            else:
+                conditions.append(LongTermMemory.meta[key].as_string() == str(value))
+        return conditions
+
+    async def _matching_ids(self, conditions: List[Any]) -> Optional[np.ndarray]:
         async with get_session() as session:
-            result = await session.execute(select(LongTermMemory).order_by(LongTermMemory.embedding_id.desc()).limit(1))
-            last = result.scalar_one_or_none()
-            next_id = 1 if last is None else last.embedding_id + 1
-            memory = LongTermMemory(embedding_id=next_id, content=content, meta=metadata)
-            session.add(memory)
-            await session.commit()
-        vector_array = np.array([vector], dtype=\"float32\")
-        id_array = np.array([next_id], dtype=\"int64\")
-        self.index.add_with_ids(vector_array, id_array)
-        self._persist()
-        return next_id
-
-    async def search(self, query: str, k: int = 5) -> List[Tuple[LongTermMemory, float]]:
-        vector = embed_texts([query])[0]
-        if self.index.ntotal == 0:
-            return []
-        vector_array = np.array([vector], dtype=\"float32\")
-        distances, ids = self.index.search(vector_array, k)
-        id_list = [int(idx) for idx in ids[0] if idx != -1]
-        if not id_list:
+            result = await session.execute(
+                select(LongTermMemory.embedding_id).where(*conditions).limit(settings.memory_filter_max_ids + 1)
+            )
+            ids = result.scalars().all()
+        if len(ids) > settings.memory_filter_max_ids:
+            return None
+        return np.array(ids, dtype="int64")
+
+    async def _passing_ids(self, ids: List[int], conditions: List[Any]) -> Set[int]:
+        async with get_session() as session:
+            result = await session.execute(
+                select(LongTermMemory.embedding_id).where(LongTermMemory.embedding_id.in_(ids), *conditions)
+            )
+            return set(result.scalars().all())
+
+    async def _vector_leg(
+        self,
+        query: str,
+        k: int,
+        conditions: List[Any],
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        timings: Dict[str, float],
+    ) -> Tuple[List[Tuple[int, float]], bool]:
+        started = time.perf_counter()
+        vector_array = await embedding_service.embed([query])
+        timings["embed_ms"] = (time.perf_counter() - started) * 1000
+        restrict = None
+        if conditions:
+            started = time.perf_counter()
+            restrict = await self._matching_ids(conditions)
+            timings["filter_ms"] = (time.perf_counter() - started) * 1000
+            if restrict is not None and not len(restrict):
+                return [], False
+        fetch = k * settings.memory_hybrid_candidates if conditions and restrict is None else k
+        timings["vector_ms"] = 0.0
+        while True:
+            started = time.perf_counter()
+            distances, ids = await self.vectors.search(vector_array, fetch, nprobe=nprobe, ef_search=ef_search, ids=restrict)
+            elapsed = time.perf_counter() - started
+            timings["vector_ms"] += elapsed * 1000
+            metrics.observe("faiss_search_duration_seconds", elapsed)
+            hits = [(int(idx), float(distance)) for idx, distance in zip(ids[0], distances[0]) if idx != -1]
+            if not conditions or restrict is not None:
+                return hits, False
+            started = time.perf_counter()
+            passing = await self._passing_ids([idx for idx, _ in hits], conditions) if hits else set()
+            timings["filter_ms"] += (time.perf_counter() - started) * 1000
+            kept = [hit for hit in hits if hit[0] in passing]
+            if len(kept) >= k or len(hits) < fetch:
+                return kept, False
+            if fetch >= settings.memory_filter_max_fetch:
+                return kept, True
+            fetch = min(fetch * 2, settings.memory_filter_max_fetch)
+
+    async def _keyword_leg(self, query: str, k: int, conditions: List[Any], timings: Dict[str, float]) -> List[int]:
+        started = time.perf_counter()
+        terms = [term for term in re.findall(r"\w+", query.lower()) if term]
+        if not terms:
             return []
         async with get_session() as session:
-            result = await session.execute(select(LongTermMemory).where(LongTermMemory.embedding_id.in_(id_list)))
-            records = {record.embedding_id: record for record in result.scalars().all()}
-        return [(records[idx], float(distances[0][pos])) for pos, idx in enumerate(id_list) if idx in records]
+            if engine.dialect.name == "postgresql":
+                document = func.to_tsvector(literal_column("'english'"), LongTermMemory.content)
+                ts_query = func.plainto_tsquery(literal_column("'english'"), query)
+                result = await session.execute(
+                    select(LongTermMemory.embedding_id)
+                    .where(document.op("@@")(ts_query), *conditions)
+                    .order_by(func.ts_rank_cd(document, ts_query).desc())
+                    .limit(k)
+                )
+                ranked = list(result.scalars().all())
+            else:
+                result = await session.execute(
+                    select(LongTermMemory.embedding_id, LongTermMemory.content)
+                    .where(or_(*[LongTermMemory.content.ilike(f"%{term}%") for term in terms]), *conditions)
+                    .limit(k * settings.memory_hybrid_candidates)
+                )
+                scored = [
+                    (sum(content.lower().count(term) for term in terms), embedding_id)
+                    for embedding_id, content in result.all()
+                ]
+                ranked = [embedding_id for _, embedding_id in sorted(scored, key=lambda item: -item[0])[:k]]
+        timings["keyword_ms"] = (time.perf_counter() - started) * 1000
+        return ranked
+
+    async def search(
+        self,
+        query: str,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        hybrid: bool = False,
+    ) -> MemorySearchOutcome:
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        conditions = self._filter_conditions(filters or {})
+        candidates = k * settings.memory_hybrid_candidates if hybrid else k
+        if hybrid:
+            (vector_hits, truncated), keyword_ids = await asyncio.gather(
+                self._vector_leg(query, candidates, conditions, nprobe, ef_search, timings),
+                self._keyword_leg(query, candidates, conditions, timings),
+            )
+        else:
+            vector_hits, truncated = await self._vector_leg(query, candidates, conditions, nprobe, ef_search, timings)
+            keyword_ids = []
+        distances = dict(vector_hits)
+        scores: Dict[int, float] = {}
+        for ranked in ([embedding_id for embedding_id, _ in vector_hits], keyword_ids):
+            for rank, embedding_id in enumerate(ranked):
+                scores[embedding_id] = scores.get(embedding_id, 0.0) + 1.0 / (settings.memory_rrf_k + rank + 1)
+        fetch_started = time.perf_counter()
+        records: Dict[int, LongTermMemory] = {}
+        if scores:
+            async with get_session() as session:
+                result = await session.execute(
+                    select(LongTermMemory).where(LongTermMemory.embedding_id.in_(list(scores)), *conditions)
+                )
+                records = {record.embedding_id: record for record in result.scalars().all()}
+        timings["fetch_ms"] = (time.perf_counter() - fetch_started) * 1000
+        ordered = sorted((embedding_id for embedding_id in scores if embedding_id in records), key=lambda item: -scores[item])
+        hits = [
+            MemoryHit(record=records[embedding_id], distance=distances.get(embedding_id), score=scores[embedding_id])
+            for embedding_id in ordered[:k]
+        ]
+        timings["total_ms"] = (time.perf_counter() - started) * 1000
+        return MemorySearchOutcome(hits=hits, timings=timings, truncated=truncated)
+
+
+@lru_cache(maxsize=1)
+def get_long_term_store() -> LongTermMemoryStore:
+    return LongTermMemoryStore()
+
+
+async def load_long_term_store() -> LongTermMemoryStore:
+    if get_long_term_store.cache_info().currsize:
+        return get_long_term_store()
+    async with _store_lock:
+        if not get_long_term_store.cache_info().currsize:
+            store = await asyncio.to_thread(get_long_term_store)
+            await store.start()
+        return get_long_term_store()
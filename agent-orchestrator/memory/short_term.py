@@ -1,26 +1,167 @@
-from sqlalchemy import select
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
 
+from sqlalchemy import insert, select
+
+from api.config import settings
 from api.database import get_session
 from api.models import ShortTermMemory
 
+logger = logging.getLogger(f"{settings.app_name}.short_term")
+
+
+@dataclass
+class _WorkingSet:
+    values: Dict[str, str] = field(default_factory=dict)
+    pending: Dict[Optional[int], Dict[str, str]] = field(default_factory=dict)
+    loaded: bool = False
+
+    def pending_rows(self, task_id: int) -> List[Dict[str, Any]]:
+        return [
+            {"task_id": task_id, "key": key, "value": value}
+            for writes in self.pending.values()
+            for key, value in writes.items()
+        ]
+
 
 class ShortTermMemoryStore:
-    async def write(self, task_id: int, key: str, value: str) -> None:
-        async with get_session() as session:
-            session.add(ShortTermMemory(task_id=task_id, key=key, value=value))
-            await session.commit()
+    def __init__(self, max_tasks: int, flush_interval: float) -> None:
+        self.max_tasks = max_tasks
+        self.flush_interval = flush_interval
+        self._working_sets: "OrderedDict[int, _WorkingSet]" = OrderedDict()
+        self._flush_timer: Optional[asyncio.Task] = None
 
-    async def read(self, task_id: int, key: str) -> str | None:
+    def _working_set(self, task_id: int) -> _WorkingSet:
+        working_set = self._working_sets.get(task_id)
+        if working_set is None:
+            working_set = _WorkingSet()
+            self._working_sets[task_id] = working_set
+        else:
+            self._working_sets.move_to_end(task_id)
+        return working_set
+
+    async def _evict_overflow(self) -> None:
+        while len(self._working_sets) > self.max_tasks:
+            task_id, working_set = self._working_sets.popitem(last=False)
+            rows = working_set.pending_rows(task_id)
+            if not rows:
+                continue
+            try:
+                await self._insert(rows)
+            except Exception:
+                logger.exception("short_term_eviction_failed task_id=%s", task_id)
+                self._reinstate(task_id, working_set)
+                return
+
+    def _reinstate(self, task_id: int, evicted: _WorkingSet) -> None:
+        current = self._working_sets.get(task_id)
+        if current is None:
+            self._working_sets[task_id] = evicted
+            self._working_sets.move_to_end(task_id, last=False)
+            return
+        for step_id, writes in evicted.pending.items():
+            for key, value in writes.items():
+                current.values.setdefault(key, value)
+                current.pending.setdefault(step_id, {}).setdefault(key, value)
+
+    async def _load(self, task_id: int) -> _WorkingSet:
+        working_set = self._working_set(task_id)
+        if working_set.loaded:
+            return working_set
         async with get_session() as session:
             result = await session.execute(
-                select(ShortTermMemory).where(
-                    ShortTermMemory.task_id == task_id, ShortTermMemory.key == key
-                )
+                select(ShortTermMemory.key, ShortTermMemory.value)
+                .where(ShortTermMemory.task_id == task_id)
+                .order_by(ShortTermMemory.id)
             )
-            record = result.scalar_one_or_none()
-            return record.value if record else None
+            stored = {key: value for key, value in result.all()}
+        working_set = self._working_set(task_id)
+        working_set.values = {**stored, **working_set.values}
+        working_set.loaded = True
+        await self._evict_overflow()
+        return working_set
+
+    async def write(self, task_id: int, key: str, value: str, step_id: Optional[int] = None) -> None:
+        working_set = self._working_set(task_id)
+        working_set.values[key] = value
+        working_set.pending.setdefault(step_id, {})[key] = value
+        self._schedule_flush()
+        await self._evict_overflow()
+
+    async def read(self, task_id: int, key: str) -> str | None:
+        working_set = self._working_sets.get(task_id)
+        if working_set is not None and key in working_set.values:
+            self._working_sets.move_to_end(task_id)
+            return working_set.values[key]
+        working_set = await self._load(task_id)
+        return working_set.values.get(key)
 
-    async def list(self, task_id: int) -> list[ShortTermMemory]:
+    async def list(self, task_id: int) -> List[ShortTermMemory]:
+        await self.flush(task_id)
         async with get_session() as session:
             result = await session.execute(select(ShortTermMemory).where(ShortTermMemory.task_id == task_id))
             return result.scalars().all()
+
+    def drain(self, task_id: int, step_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        working_set = self._working_sets.get(task_id)
+        if working_set is None:
+            return []
+        writes = working_set.pending.pop(step_id, {})
+        return self._rows(task_id, writes)
+
+    def restore(self, task_id: int, rows: List[Dict[str, Any]], step_id: Optional[int] = None) -> None:
+        if not rows:
+            return
+        working_set = self._working_set(task_id)
+        writes = working_set.pending.setdefault(step_id, {})
+        for row in rows:
+            writes.setdefault(row["key"], row["value"])
+
+    async def flush(self, task_id: Optional[int] = None) -> None:
+        task_ids = [task_id] if task_id is not None else list(self._working_sets)
+        drained = {
+            (current, step_id): self.drain(current, step_id)
+            for current in task_ids
+            if current in self._working_sets
+            for step_id in list(self._working_sets[current].pending)
+        }
+        rows = [row for step_rows in drained.values() for row in step_rows]
+        if not rows:
+            return
+        try:
+            await self._insert(rows)
+        except Exception:
+            for (current, step_id), step_rows in drained.items():
+                self.restore(current, step_rows, step_id)
+            raise
+
+    async def close_task(self, task_id: int) -> None:
+        await self.flush(task_id)
+        self._working_sets.pop(task_id, None)
+
+    @staticmethod
+    def _rows(task_id: int, values: Dict[str, str]) -> List[Dict[str, Any]]:
+        return [{"task_id": task_id, "key": key, "value": value} for key, value in values.items()]
+
+    @staticmethod
+    async def _insert(rows: List[Dict[str, Any]]) -> None:
+        async with get_session() as session:
+            await session.execute(insert(ShortTermMemory), rows)
+            await session.commit()
+
+    def _schedule_flush(self) -> None:
+        if self._flush_timer is None or self._flush_timer.done():
+            self._flush_timer = asyncio.create_task(self._flush_after_interval())
+
+    async def _flush_after_interval(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("short_term_flush_failed")
+
+
+short_term_store = ShortTermMemoryStore(settings.short_term_cache_tasks, settings.short_term_flush_interval)
@@ -0,0 +1,158 @@
+import asyncio
+import contextlib
+import logging
+from typing import AsyncIterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from api.config import settings
+from memory.embeddings import embedding_dimension
+from memory.index_factory import (
+    IndexSpec,
+    build_index,
+    build_staging_index,
+    exact_search,
+    export_vectors,
+    matches_spec,
+    search_parameters,
+    supports_reconstruct_by_id,
+    train_and_fill,
+)
+from memory.index_store import IndexPersistence
+
+logger = logging.getLogger(f"{settings.app_name}.vector_index")
+
+
+class ReadWriteLock:
+    def __init__(self) -> None:
+        self._readers = 0
+        self._writer = False
+        self._condition = asyncio.Condition()
+
+    @contextlib.asynccontextmanager
+    async def read(self) -> AsyncIterator[None]:
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._readers -= 1
+                self._condition.notify_all()
+
+    @contextlib.asynccontextmanager
+    async def write(self) -> AsyncIterator[None]:
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._writer)
+            self._writer = True
+            await self._condition.wait_for(lambda: self._readers == 0)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class LocalVectorIndex:
+    def __init__(self, spec: Optional[IndexSpec] = None, index_path: Optional[str] = None) -> None:
+        self.spec = spec or IndexSpec.from_settings()
+        self.persistence = IndexPersistence(
+            index_path or settings.faiss_index_path,
+            embedding_dimension(),
+            checkpoint_every=settings.faiss_checkpoint_every,
+            checkpoint_interval=settings.faiss_checkpoint_interval,
+        )
+        self.index = self.persistence.load(self._create_index)
+        self._lock = ReadWriteLock()
+        self._checkpoint_lock = asyncio.Lock()
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._checkpoint_task: Optional[asyncio.Task] = None
+        self._added_during_rebuild: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def _create_index(self) -> faiss.Index:
+        if self.spec.needs_training:
+            return build_staging_index(self.spec, embedding_dimension())
+        return build_index(self.spec, embedding_dimension())
+
+    async def start(self) -> None:
+        self.schedule_rebuild()
+
+    async def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        async with self._lock.write():
+            await asyncio.to_thread(self.persistence.append, ids, vectors)
+            await asyncio.to_thread(self.index.add_with_ids, vectors, ids)
+            if self._rebuild_task is not None:
+                self._added_during_rebuild.append((vectors, ids))
+        if self.persistence.checkpoint_due():
+            self.schedule_checkpoint()
+        self.schedule_rebuild()
+
+    async def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        ids: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        async with self._lock.read():
+            if ids is None:
+                params = search_parameters(self.index, nprobe=nprobe, ef_search=ef_search)
+                return await asyncio.to_thread(self.index.search, vectors, k, params=params)
+            if len(ids) <= settings.memory_exact_search_max_ids and supports_reconstruct_by_id(self.index):
+                return await asyncio.to_thread(exact_search, self.index, vectors, k, ids)
+            selector = faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype="int64"))
+            params = search_parameters(self.index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+            return await asyncio.to_thread(self.index.search, vectors, k, params=params)
+
+    async def checkpoint(self) -> None:
+        async with self._checkpoint_lock:
+            async with self._lock.read():
+                number, snapshot = await asyncio.to_thread(self.persistence.seal, self.index)
+            await self.persistence.write_checkpoint(number, snapshot)
+
+    def schedule_checkpoint(self) -> None:
+        if self._checkpoint_task is None or self._checkpoint_task.done():
+            self._checkpoint_task = asyncio.create_task(self.checkpoint())
+
+    def needs_rebuild(self) -> bool:
+        if matches_spec(self.index, self.spec):
+            return False
+        return self.index.ntotal >= self.spec.min_training_vectors
+
+    def schedule_rebuild(self) -> None:
+        if self._rebuild_task is None and self.needs_rebuild():
+            self._rebuild_task = asyncio.create_task(self._rebuild())
+
+    async def _rebuild(self) -> None:
+        try:
+            async with self._lock.write():
+                ids, vectors = await asyncio.to_thread(export_vectors, self.index)
+                self._added_during_rebuild = []
+            index = await asyncio.to_thread(train_and_fill, self.spec, embedding_dimension(), ids, vectors)
+            async with self._lock.write():
+                for added_vectors, added_ids in self._added_during_rebuild:
+                    index.add_with_ids(added_vectors, added_ids)
+                self.index = index
+            await self.checkpoint()
+            logger.info("faiss_index_rebuilt type=%s metric=%s ntotal=%s", self.spec.index_type, self.spec.metric, index.ntotal)
+        except Exception:
+            logger.exception("faiss_index_rebuild_failed")
+        finally:
+            self._added_during_rebuild = []
+            self._rebuild_task = None
+
+    async def close(self) -> None:
+        for task in (self._rebuild_task, self._checkpoint_task):
+            if task is not None:
+                await asyncio.gather(task, return_exceptions=True)
+        if self.persistence.pending_records:
+            await self.checkpoint()
+        self.persistence.close()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import signal
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from api.config import settings
+from memory.embeddings import embedding_dimension
+from memory.vector_index import LocalVectorIndex
+
+logger = logging.getLogger(f"{settings.app_name}.vector_service")
+
+_FRAME_HEADER = struct.Struct("<II")
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[Dict[str, Any], bytes]:
+    header_size, payload_size = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size) if payload_size else b""
+    return header, payload
+
+
+def write_frame(writer: asyncio.StreamWriter, header: Dict[str, Any], payload: bytes = b"") -> None:
+    encoded = json.dumps(header).encode("utf-8")
+    writer.write(_FRAME_HEADER.pack(len(encoded), len(payload)) + encoded + payload)
+
+
+class VectorServiceError(RuntimeError):
+    pass
+
+
+class VectorIndexServer:
+    def __init__(self, index: LocalVectorIndex, socket_path: str) -> None:
+        self.index = index
+        self.socket_path = socket_path
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        await self.index.start()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.index.close()
+
+    async def _dispatch(self, header: Dict[str, Any], payload: bytes) -> Tuple[Dict[str, Any], bytes]:
+        dim = embedding_dimension()
+        op = header.get("op")
+        if op == "add":
+            count = header["count"]
+            ids = np.frombuffer(payload, dtype="int64", count=count)
+            vectors = np.frombuffer(payload, dtype="float32", offset=count * 8).reshape(count, dim)
+            await self.index.add(ids, vectors)
+            return {"ok": True, "ntotal": self.index.ntotal}, b""
+        if op == "search":
+            id_count = header.get("id_count")
+            vector_bytes = len(payload) - (id_count or 0) * 8
+            vectors = np.frombuffer(payload, dtype="float32", count=vector_bytes // 4).reshape(-1, dim)
+            restrict = None
+            if id_count is not None:
+                restrict = np.frombuffer(payload, dtype="int64", offset=vector_bytes, count=id_count)
+            distances, ids = await self.index.search(
+                vectors,
+                header["k"],
+                nprobe=header.get("nprobe"),
+                ef_search=header.get("ef_search"),
+                ids=restrict,
+            )
+            response = {"ok": True, "ntotal": self.index.ntotal, "shape": list(ids.shape)}
+            return response, np.ascontiguousarray(distances, dtype="float32").tobytes() + np.ascontiguousarray(ids, dtype="int64").tobytes()
+        if op == "stats":
+            return {"ok": True, "ntotal": self.index.ntotal}, b""
+        return {"ok": False, "error": f"Unknown operation '{op}'"}, b""
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    header, payload = await read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    return
+                try:
+                    response, body = await self._dispatch(header, payload)
+                except Exception as exc:
+                    logger.exception("vector_service_request_failed op=%s", header.get("op"))
+                    response, body = {"ok": False, "error": str(exc)}, b""
+                write_frame(writer, response, body)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class RemoteVectorIndex:
+    def __init__(self, socket_path: str, pool_size: int, refresh_interval: float) -> None:
+        self.socket_path = socket_path
+        self.pool_size = pool_size
+        self.refresh_interval = refresh_interval
+        self._ntotal = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._idle: "asyncio.Queue[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]" = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(pool_size)
+
+    @property
+    def ntotal(self) -> int:
+        return self._ntotal
+
+    async def _request(self, header: Dict[str, Any], payload: bytes = b"") -> Tuple[Dict[str, Any], bytes]:
+        async with self._semaphore:
+            if self._idle.empty():
+                connection = await asyncio.open_unix_connection(self.socket_path)
+            else:
+                connection = self._idle.get_nowait()
+            reader, writer = connection
+            try:
+                write_frame(writer, header, payload)
+                await writer.drain()
+                response, body = await read_frame(reader)
+            except BaseException:
+                writer.close()
+                raise
+            self._idle.put_nowait(connection)
+        if not response.get("ok"):
+            raise VectorServiceError(response.get("error", "vector service request failed"))
+        self._ntotal = response.get("ntotal", self._ntotal)
+        return response, body
+
+    async def refresh(self) -> int:
+        await self._request({"op": "stats"})
+        return self._ntotal
+
+    async def start(self) -> None:
+        await self.refresh()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_forever())
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except (OSError, asyncio.IncompleteReadError, VectorServiceError) as exc:
+                logger.warning("vector_service_refresh_failed error=%s", exc)
+
+    async def add(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        payload = np.ascontiguousarray(ids, dtype="int64").tobytes() + np.ascontiguousarray(vectors, dtype="float32").tobytes()
+        await self._request({"op": "add", "count": len(ids)}, payload)
+
+    async def search(
+        self,
+        vectors: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        ids: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        header = {"op": "search", "k": k, "nprobe": nprobe, "ef_search": ef_search}
+        payload = np.ascontiguousarray(vectors, dtype="float32").tobytes()
+        if ids is not None:
+            header["id_count"] = len(ids)
+            payload += np.ascontiguousarray(ids, dtype="int64").tobytes()
+        response, body = await self._request(header, payload)
+        rows, columns = response["shape"]
+        distances = np.frombuffer(body, dtype="float32", count=rows * columns).reshape(rows, columns)
+        ids = np.frombuffer(body, dtype="int64", offset=rows * columns * 4).reshape(rows, columns)
+        return distances, ids
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+        while not self._idle.empty():
+            _, writer = self._idle.get_nowait()
+            writer.close()
+
+
+async def serve() -> None:
+    server = VectorIndexServer(LocalVectorIndex(), settings.vector_service_socket)
+    loop = asyncio.get_running_loop()
+    shutdown = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, shutdown.set)
+    await server.start()
+    logger.info("vector_service_started socket=%s ntotal=%s", server.socket_path, server.index.ntotal)
+    await shutdown.wait()
+    await server.stop()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not settings.vector_service_socket:
+        raise SystemExit("VECTOR_SERVICE_SOCKET must be set to run the vector service")
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
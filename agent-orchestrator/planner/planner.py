@@ -1,17 +1,119 @@
 import re
-from typing import List
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import List, Optional, Tuple
+
+from api.config import settings
+from planner.router import DEFAULT_PROTOTYPES, DEFAULT_ROUTES, EmbeddingRouter, KeywordRouter
+
+SENTENCE_BOUNDARY = re.compile(r"[\n\.]+")
+INLINE_WHITESPACE = re.compile(r"[^\S\n]+")
+STEP_REFERENCE = re.compile(r"\bsteps?\s+(\d+(?:\s*(?:,|and|&)\s*\d+)*)", re.IGNORECASE)
+PRIOR_OUTPUT_REFERENCE = re.compile(
+    r"\b(then|afterwards|after that|next|finally|it|its|this|that|these|those|them|"
+    r"result|results|output|outputs|above|previous|previously|earlier)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class PlannedStep:
+    instruction: str
+    agent_type: str
+    depends_on: List[int] = field(default_factory=list)
+
+
+class PlanCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[PlannedStep, ...]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[List[PlannedStep]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return [replace(step, depends_on=list(step.depends_on)) for step in entry]
+
+    def put(self, key: str, steps: List[PlannedStep]) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = tuple(replace(step, depends_on=list(step.depends_on)) for step in steps)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+keyword_router = KeywordRouter(settings.planner_routes or DEFAULT_ROUTES)
+embedding_router = EmbeddingRouter(
+    settings.planner_prototypes or DEFAULT_PROTOTYPES,
+    settings.planner_embedding_threshold,
+    fallback=keyword_router,
+)
+plan_cache = PlanCache(settings.planner_cache_size)
+
+
+def normalize_description(description: str) -> str:
+    return "\n".join(INLINE_WHITESPACE.sub(" ", line).strip() for line in description.splitlines()).strip()
 
 
 def decompose_task(description: str) -> List[str]:
-    sentences = re.split(r"[\n\.]+", description)
+    sentences = SENTENCE_BOUNDARY.split(description)
     steps = [sentence.strip() for sentence in sentences if sentence.strip()]
     return steps or [description.strip()]
 
 
 def assign_agent(step: str) -> str:
-    lowered = step.lower()
-    if any(keyword in lowered for keyword in ["research", "analyze", "summarize"]):
-        return "research"
-    if any(keyword in lowered for keyword in ["deploy", "implement", "build", "code"]):
-        return "builder"
-    return "general"
+    return keyword_router.route(step)
+
+
+def infer_dependencies(index: int, instruction: str) -> List[int]:
+    explicit = set()
+    for match in STEP_REFERENCE.finditer(instruction):
+        for number in re.findall(r"\d+", match.group(1)):
+            referenced = int(number) - 1
+            if 0 <= referenced < index:
+                explicit.add(referenced)
+    if explicit:
+        return sorted(explicit)
+    if index > 0 and PRIOR_OUTPUT_REFERENCE.search(instruction):
+        return [index - 1]
+    return []
+
+
+def _build_plan(instructions: List[str], agent_types: List[str]) -> List[PlannedStep]:
+    return [
+        PlannedStep(
+            instruction=instruction,
+            agent_type=agent_type,
+            depends_on=infer_dependencies(index, instruction),
+        )
+        for index, (instruction, agent_type) in enumerate(zip(instructions, agent_types))
+    ]
+
+
+def plan_task(description: str) -> List[PlannedStep]:
+    normalized = normalize_description(description)
+    cached = plan_cache.get(f"keyword:{normalized}")
+    if cached is not None:
+        return cached
+    instructions = decompose_task(normalized)
+    steps = _build_plan(instructions, keyword_router.route_many(instructions))
+    plan_cache.put(f"keyword:{normalized}", steps)
+    return steps
+
+
+async def plan_task_async(description: str) -> List[PlannedStep]:
+    if settings.planner_router != "embedding" or not settings.ml_enabled:
+        return plan_task(description)
+    normalized = normalize_description(description)
+    cached = plan_cache.get(f"embedding:{normalized}")
+    if cached is not None:
+        return cached
+    instructions = decompose_task(normalized)
+    steps = _build_plan(instructions, await embedding_router.route_many(instructions))
+    plan_cache.put(f"embedding:{normalized}", steps)
+    return steps
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+DEFAULT_ROUTES: Dict[str, Dict[str, float]] = {
+    "research": {"research": 5.0, "analyze": 5.0, "summarize": 5.0},
+    "builder": {"deploy": 1.0, "implement": 1.0, "build": 1.0, "code": 1.0},
+}
+DEFAULT_PROTOTYPES: Dict[str, List[str]] = {
+    "research": [
+        "research the topic and collect sources",
+        "analyze the data and explain the trends",
+        "summarize the findings in a short report",
+    ],
+    "builder": [
+        "implement the feature in code",
+        "build the service and deploy it to production",
+        "write and fix the code for the integration",
+    ],
+}
+
+
+class KeywordRouter:
+    def __init__(self, routes: Dict[str, Dict[str, float]], default: str = "general") -> None:
+        self.default = default
+        self.agents = list(routes)
+        self._weights: Dict[str, List[Tuple[int, float]]] = {}
+        for position, keywords in enumerate(routes.values()):
+            for keyword, weight in keywords.items():
+                self._weights.setdefault(keyword.lower(), []).append((position, weight))
+        alternatives = sorted(self._weights, key=len, reverse=True)
+        self._pattern: Optional[re.Pattern] = (
+            re.compile("|".join(re.escape(keyword) for keyword in alternatives)) if alternatives else None
+        )
+
+    def scores(self, step: str) -> List[float]:
+        scores = [0.0] * len(self.agents)
+        if self._pattern is None:
+            return scores
+        for keyword in {match.group(0) for match in self._pattern.finditer(step.lower())}:
+            for position, weight in self._weights[keyword]:
+                scores[position] += weight
+        return scores
+
+    def route(self, step: str) -> str:
+        scores = self.scores(step)
+        best = max(scores, default=0.0)
+        if best <= 0:
+            return self.default
+        return self.agents[scores.index(best)]
+
+    def route_many(self, steps: List[str]) -> List[str]:
+        return [self.route(step) for step in steps]
+
+
+class EmbeddingRouter:
+    def __init__(self, prototypes: Dict[str, List[str]], threshold: float, fallback: KeywordRouter) -> None:
+        self.prototypes = prototypes
+        self.threshold = threshold
+        self.fallback = fallback
+        self.agents = [agent for agent, texts in prototypes.items() if texts]
+        self._centroids: Optional[np.ndarray] = None
+
+    async def _load_centroids(self) -> np.ndarray:
+        import numpy as np
+
+        from memory.embeddings import embedding_service
+
+        if self._centroids is None:
+            texts = [text for agent in self.agents for text in self.prototypes[agent]]
+            vectors = await embedding_service.embed(texts)
+            centroids, start = [], 0
+            for agent in self.agents:
+                end = start + len(self.prototypes[agent])
+                centroid = vectors[start:end].mean(axis=0)
+                centroids.append(centroid / (np.linalg.norm(centroid) or 1.0))
+                start = end
+            self._centroids = np.stack(centroids).astype("float32")
+        return self._centroids
+
+    async def route_many(self, steps: List[str]) -> List[str]:
+        from memory.embeddings import embedding_service
+
+        if not steps or not self.agents:
+            return self.fallback.route_many(steps)
+        centroids = await self._load_centroids()
+        similarities = (await embedding_service.embed(steps)) @ centroids.T
+        routed = []
+        for step, row in zip(steps, similarities):
+            best = int(row.argmax())
+            routed.append(self.agents[best] if row[best] >= self.threshold else self.fallback.route(step))
+        return routed
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="orchestrator-tests-")
+
+os.environ.setdefault("POSTGRES_DSN", f"sqlite+aiosqlite:///{os.path.join(_workdir, 'test.sqlite')}")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("FAISS_INDEX_PATH", os.path.join(_workdir, "faiss", "index"))
+os.environ.setdefault("EMBEDDING_BACKEND", "hash")
+os.environ.setdefault("EVENT_BACKEND", "memory")
+os.environ.setdefault("QUEUE_BACKEND", "memory")
+os.environ.setdefault("DEDUP_BACKEND", "memory")
+os.environ.setdefault("LLM_PROVIDER", "none")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
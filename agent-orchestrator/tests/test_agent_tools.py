@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.agent import AgentContext, GeneralAgent, LongTermMemoryDisabled
+from agents.tools import Tool, registry
+from agents.unit_of_work import StepUnitOfWork
+from api.config import settings
+from memory.short_term import ShortTermMemoryStore
+
+
+async def slow_tool(arguments):
+    await asyncio.sleep(0.2)
+    return f"slept:{arguments['name']}"
+
+
+async def broken_tool(arguments):
+    raise ValueError("broken")
+
+
+@pytest.fixture
+def slow_tools():
+    names = ("slow_first", "slow_second", "broken")
+    registry.register(Tool(name="slow_first", handler=slow_tool, mode="async"))
+    registry.register(Tool(name="slow_second", handler=slow_tool, mode="async"))
+    registry.register(Tool(name="broken", handler=broken_tool, mode="async"))
+    yield
+    for name in names:
+        registry._tools.pop(name, None)
+
+
+def make_agent():
+    unit_of_work = StepUnitOfWork(task_id=1, step_id=1, short_term=ShortTermMemoryStore(8, 3600))
+    return GeneralAgent(AgentContext(task_id=1, step_id=1, agent_type="general", unit_of_work=unit_of_work))
+
+
+def test_call_tools_runs_calls_concurrently(slow_tools):
+    agent = make_agent()
+    started = time.perf_counter()
+    outputs = asyncio.run(agent.call_tools([("slow_first", {"name": "a"}), ("slow_second", {"name": "b"})]))
+    elapsed = time.perf_counter() - started
+    assert outputs == ["slept:a", "slept:b"]
+    assert elapsed < 0.35
+    assert [call["tool_name"] for call in agent.context.unit_of_work.tool_calls] == ["slow_first", "slow_second"]
+
+
+def test_call_tools_records_every_call_before_raising(slow_tools):
+    agent = make_agent()
+    with pytest.raises(ValueError):
+        asyncio.run(agent.call_tools([("broken", {}), ("slow_first", {"name": "a"})]))
+    assert [call["tool_name"] for call in agent.context.unit_of_work.tool_calls] == ["slow_first"]
+
+
+def test_remember_fails_the_step_when_ml_is_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "ml_enabled", False)
+    agent = make_agent()
+    with pytest.raises(LongTermMemoryDisabled):
+        asyncio.run(agent.remember("remember the launch date"))
@@ -0,0 +1,88 @@
+import asyncio
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select, update
+
+from api.database import Base, engine, get_session
+from api.ledger import BudgetTracker
+from api.main import app
+from api.models import Task, TaskStatus, TaskStep, UsageLedgerEntry
+from api.orchestrator import create_task, list_steps, run_step, run_task
+
+
+def run(coroutine):
+    async def scenario():
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+def test_step_is_rejected_at_the_task_limit():
+    async def scenario():
+        task = await create_task(f"budget-{uuid.uuid4()}", "Write the summary", {"budget": 0.5})
+        async with get_session() as session:
+            await session.execute(update(Task).where(Task.id == task.id).values(cost=0.5))
+            await session.commit()
+        step = (await list_steps(task.id))[0]
+        succeeded = await run_step(step, task.user_id, 0.5)
+        async with get_session() as session:
+            status = (await session.execute(select(TaskStep.status).where(TaskStep.id == step.id))).scalar_one()
+        return succeeded, status
+
+    succeeded, status = run(scenario())
+    assert succeeded is False
+    assert status == TaskStatus.failed
+
+
+def test_task_counters_are_bounded():
+    tracker = BudgetTracker(ttl=60, max_tasks=2)
+
+    async def scenario():
+        for task_id in range(5):
+            await tracker.task_spent(task_id)
+
+    async def no_spend(task_id):
+        return 0.0
+
+    tracker._load_task_spent = no_spend
+    asyncio.run(scenario())
+    assert list(tracker._tasks) == [3, 4]
+
+
+def test_usage_endpoint_matches_the_ledger():
+    user_id = f"usage-{uuid.uuid4()}"
+
+    async def scenario():
+        task = await create_task(user_id, "Research the options. Then calculate the totals", {})
+        await run_task(task.id)
+        async with get_session() as session:
+            tool_calls = (
+                await session.execute(
+                    select(func.sum(UsageLedgerEntry.calls)).where(
+                        UsageLedgerEntry.user_id == user_id, UsageLedgerEntry.kind == "tool"
+                    )
+                )
+            ).scalar_one()
+            total = (
+                await session.execute(
+                    select(func.sum(UsageLedgerEntry.cost)).where(UsageLedgerEntry.user_id == user_id)
+                )
+            ).scalar_one()
+            steps = await list_steps(task.id)
+        return total, tool_calls, steps
+
+    total, tool_calls, steps = run(scenario())
+    assert len(steps) > 1
+    assert tool_calls
+    response = TestClient(app).get(f"/users/{user_id}/usage")
+    assert response.status_code == 200
+    usage = response.json()
+    assert abs(usage["totals"]["cost"] - total) < 1e-9
+    assert abs(usage["period_cost"] - total) < 1e-9
+    assert usage["totals"]["tool_calls"] == tool_calls
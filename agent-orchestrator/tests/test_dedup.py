@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.database import Base, engine
+from api.dedup import IdempotencyConflict, SubmissionDeduplicator, SubmissionInProgress
+from api.main import app
+
+
+def make_deduplicator():
+    return SubmissionDeduplicator(redis_url=None, max_entries=16, timeout=0.05, pending_ttl=30, wait_timeout=1)
+
+
+def test_concurrent_identical_submissions_are_coalesced():
+    deduplicator = make_deduplicator()
+    created = []
+
+    async def create():
+        await asyncio.sleep(0.05)
+        created.append(len(created) + 1)
+        return created[-1]
+
+    async def scenario():
+        return await asyncio.gather(*(deduplicator.submit("content:a", "a", 60, create) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert created == [1]
+    assert sorted(results) == [(1, False), (1, True), (1, True)]
+
+
+def test_cancelled_leader_lets_followers_retry():
+    deduplicator = make_deduplicator()
+
+    async def create():
+        await asyncio.sleep(1)
+        return 1
+
+    async def scenario():
+        leader = asyncio.create_task(deduplicator.submit("content:a", "a", 60, create))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(deduplicator.submit("content:a", "a", 60, create))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(SubmissionInProgress):
+            await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_reused_key_with_different_request_conflicts():
+    deduplicator = make_deduplicator()
+
+    async def create():
+        return 7
+
+    async def scenario():
+        first = await deduplicator.submit("key:k", "a", 60, create)
+        replay = await deduplicator.submit("key:k", "a", 60, create)
+        with pytest.raises(IdempotencyConflict):
+            await deduplicator.submit("key:k", "b", 60, create)
+        return first, replay
+
+    assert asyncio.run(scenario()) == ((7, False), (7, True))
+
+
+def test_idempotency_key_replays_and_rejects_changed_requests():
+    async def prepare():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(prepare())
+    client = TestClient(app)
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    body = {"user_id": "dedup-user", "description": "Draft the release notes", "metadata": {}}
+    first = client.post("/tasks", json=body, headers=headers)
+    replay = client.post("/tasks", json=body, headers=headers)
+    changed = client.post("/tasks", json={**body, "description": "Something else"}, headers=headers)
+    assert first.status_code == replay.status_code == 200
+    assert replay.json()["id"] == first.json()["id"]
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert changed.status_code == 422
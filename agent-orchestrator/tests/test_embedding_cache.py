@@ -0,0 +1,27 @@
+import numpy as np
+
+from api.metrics import metrics
+from memory.embedding_cache import DiskEmbeddingTier, EmbeddingCache, cache_key
+
+
+def test_disk_tier_ignores_slots_overwritten_by_another_process(tmp_path):
+    reader = DiskEmbeddingTier(str(tmp_path), "model", 4, capacity=1)
+    writer = DiskEmbeddingTier(str(tmp_path), "model", 4, capacity=1)
+    first, second = cache_key("model", "first"), cache_key("model", "second")
+    reader.put(first, np.ones(4, dtype="float32"))
+    assert np.array_equal(reader.get(first), np.ones(4))
+    writer.put(second, np.full(4, 2.0, dtype="float32"))
+    assert reader.get(first) is None
+    assert np.array_equal(writer.get(second), np.full(4, 2.0))
+
+
+def test_cache_lookups_are_exported_as_metrics(monkeypatch):
+    counted = []
+    monkeypatch.setattr(metrics, "inc", lambda name, amount=1.0, **labels: counted.append((name, amount, labels)))
+    cache = EmbeddingCache("model", max_entries=8)
+    cache.put_many(["known"], np.ones((1, 4), dtype="float32"))
+    cache.get_many(["known", "unknown", "other"])
+    assert counted == [
+        ("embedding_cache_hits_total", 1, {"tier": "memory"}),
+        ("embedding_cache_misses_total", 2, {}),
+    ]
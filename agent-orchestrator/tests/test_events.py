@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from api.database import Base, engine
+from api.events import is_valid_event_id
+from api.main import app
+from api.orchestrator import create_task
+
+
+@pytest.mark.parametrize("event_id", ["0", "1700000000000", "1700000000000-3"])
+def test_accepts_stream_ids(event_id):
+    assert is_valid_event_id(event_id)
+
+
+@pytest.mark.parametrize("event_id", ["", "abc", "1-", "-1", "1-2-3", "1) + (2", "1\n"])
+def test_rejects_malformed_ids(event_id):
+    assert not is_valid_event_id(event_id)
+
+
+async def create_sample_task():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    task = await create_task("events-user", "Summarize the notes", {})
+    await engine.dispose()
+    return task
+
+
+def test_malformed_last_event_id_is_rejected():
+    task = asyncio.run(create_sample_task())
+    client = TestClient(app)
+    response = client.get(f"/tasks/{task.id}/events", headers={"Last-Event-ID": "not-an-id"})
+    assert response.status_code == 400
+    with client.websocket_connect(f"/tasks/{task.id}/events?last_event_id=1)") as websocket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == 4400
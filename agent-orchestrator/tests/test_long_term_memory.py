@@ -0,0 +1,140 @@
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy import func, select
+
+from api.config import settings
+from api.database import Base, engine, get_session
+from api.models import LongTermMemory
+from api.startup import align_embedding_sequence, upgrade_schema
+from memory.long_term import LongTermMemoryStore
+from memory.vector_index import LocalVectorIndex
+
+
+async def prepare_database() -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await upgrade_schema(conn)
+        await align_embedding_sequence(conn)
+
+
+def run(coroutine):
+    async def scenario():
+        try:
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+async def stored_ids(prefix: str):
+    async with get_session() as session:
+        result = await session.execute(
+            select(LongTermMemory.embedding_id).where(LongTermMemory.content.like(f"{prefix}%"))
+        )
+        return sorted(result.scalars().all())
+
+
+def test_concurrent_stores_allocate_distinct_embedding_ids(tmp_path):
+    async def scenario():
+        await prepare_database()
+        stores = [
+            LongTermMemoryStore(vectors=LocalVectorIndex(index_path=str(tmp_path / name / "index")))
+            for name in ("first", "second")
+        ]
+        try:
+            allocated = await asyncio.gather(
+                *(
+                    store.add_texts([f"concurrent {position} {item}" for item in range(40)])
+                    for position, store in enumerate(stores)
+                )
+            )
+        finally:
+            for store in stores:
+                await store.close()
+        return allocated, [store.vectors.ntotal for store in stores]
+
+    allocated, sizes = run(scenario())
+    every_id = [embedding_id for ids in allocated for embedding_id in ids]
+    assert len(every_id) == len(set(every_id)) == 80
+    assert sizes == [40, 40]
+    assert run(stored_ids("concurrent")) == sorted(every_id)
+
+
+class FailingIndex:
+    ntotal = 0
+
+    async def add(self, ids, vectors):
+        raise RuntimeError("index unavailable")
+
+    async def close(self):
+        return None
+
+
+def test_failed_index_add_leaves_no_rows():
+    async def scenario():
+        await prepare_database()
+        store = LongTermMemoryStore(vectors=FailingIndex())
+        with pytest.raises(RuntimeError):
+            await store.add_texts(["orphan candidate"])
+        async with get_session() as session:
+            result = await session.execute(
+                select(func.count()).select_from(LongTermMemory).where(LongTermMemory.content == "orphan candidate")
+            )
+            return result.scalar_one()
+
+    assert run(scenario()) == 0
+
+
+@pytest.mark.parametrize("max_fetch, expected, truncated", [(10000, 3, False), (12, 0, True)])
+def test_post_filtered_search_pages_until_enough_hits(tmp_path, monkeypatch, max_fetch, expected, truncated):
+    monkeypatch.setattr(settings, "memory_filter_max_ids", 0)
+    monkeypatch.setattr(settings, "memory_filter_max_fetch", max_fetch)
+
+    async def scenario():
+        await prepare_database()
+        store = LongTermMemoryStore(vectors=LocalVectorIndex(index_path=str(tmp_path / "index")))
+        try:
+            await store.add_texts(
+                [f"paging needle {item}" for item in range(40)] + [f"paging other {item}" for item in range(3)],
+                [{"user_id": f"crowd-{max_fetch}"}] * 40 + [{"user_id": f"wanted-{max_fetch}"}] * 3,
+            )
+            return await store.search("paging needle", k=3, filters={"user_id": f"wanted-{max_fetch}"})
+        finally:
+            await store.close()
+
+    outcome = run(scenario())
+    assert len(outcome.hits) == expected
+    assert outcome.truncated is truncated
+
+
+def test_concurrent_checkpoints_are_serialized(tmp_path):
+    async def scenario():
+        index = LocalVectorIndex(index_path=str(tmp_path / "index"))
+        ids = np.arange(1, 5, dtype="int64")
+        await index.add(ids, np.random.rand(4, index.persistence.dim).astype("float32"))
+        active = []
+        overlaps = []
+        seal = index.persistence.seal
+
+        def tracking_seal(faiss_index):
+            overlaps.append(bool(active))
+            active.append(True)
+            return seal(faiss_index)
+
+        write_checkpoint = index.persistence.write_checkpoint
+
+        async def tracking_write(number, snapshot):
+            await asyncio.sleep(0.01)
+            await write_checkpoint(number, snapshot)
+            active.pop()
+
+        index.persistence.seal = tracking_seal
+        index.persistence.write_checkpoint = tracking_write
+        await asyncio.gather(index.checkpoint(), index.checkpoint(), index.checkpoint())
+        await index.close()
+        return overlaps
+
+    assert run(scenario()) == [False, False, False]
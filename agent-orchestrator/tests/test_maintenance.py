@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+
+from api.database import Base, engine, get_session
+from api.maintenance import MaintenanceRunner, compact_task_memory
+from api.models import ShortTermMemory, Task, TaskStatus, TaskStep
+
+EXPIRED = datetime(2000, 1, 1)
+CUTOFF = datetime(2001, 1, 1)
+
+
+def run(coroutine):
+    async def scenario():
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+def make_runner() -> MaintenanceRunner:
+    return MaintenanceRunner(interval=60, batch_size=2, batch_pause=0, lock_timeout=1)
+
+
+async def create_finished_task(memories: int = 0, steps: int = 0) -> int:
+    async with get_session() as session:
+        task = Task(
+            user_id="maintenance",
+            description="expired",
+            status=TaskStatus.completed,
+            created_at=EXPIRED,
+            updated_at=EXPIRED,
+        )
+        session.add(task)
+        await session.flush()
+        for index in range(memories):
+            session.add(ShortTermMemory(task_id=task.id, key=f"key-{index}", value="value"))
+        for index in range(steps):
+            session.add(TaskStep(task_id=task.id, step_index=index, instruction="step", agent_type="general"))
+        await session.commit()
+        return task.id
+
+
+def test_compaction_keeps_the_latest_value_of_each_key():
+    async def scenario():
+        task_id = await create_finished_task()
+        async with get_session() as session:
+            for key, value in (("status", "queued"), ("output", "draft"), ("status", "running"), ("status", "done")):
+                session.add(ShortTermMemory(task_id=task_id, key=key, value=value))
+            await session.commit()
+        removed = await compact_task_memory(task_id)
+        async with get_session() as session:
+            result = await session.execute(
+                select(ShortTermMemory.key, ShortTermMemory.value)
+                .where(ShortTermMemory.task_id == task_id)
+                .order_by(ShortTermMemory.id)
+            )
+            return removed, result.all()
+
+    removed, rows = run(scenario())
+    assert removed == 2
+    assert rows == [("output", "draft"), ("status", "done")]
+
+
+def test_purge_deletes_in_batches():
+    runner = make_runner()
+    batches = []
+
+    async def record(conn, table, ids):
+        batches.append(len(ids))
+
+    runner._archive = record
+
+    async def scenario():
+        task_id = await create_finished_task(memories=5)
+        ids = select(ShortTermMemory.id).where(ShortTermMemory.task_id == task_id).order_by(ShortTermMemory.id)
+        async with engine.connect() as conn:
+            outcome = await runner._purge(conn, ShortTermMemory.__table__, ids)
+        async with get_session() as session:
+            remaining = (await session.execute(ids)).scalars().all()
+        return outcome, remaining
+
+    outcome, remaining = run(scenario())
+    assert outcome == (5, True)
+    assert batches == [2, 2, 1]
+    assert remaining == []
+
+
+def test_tasks_are_kept_when_a_child_purge_fails():
+    runner = make_runner()
+
+    async def fail_on_steps(conn, table, ids):
+        if table.name == TaskStep.__tablename__:
+            raise DBAPIError("DELETE FROM task_steps", {}, Exception("lock timeout"))
+
+    runner._archive = fail_on_steps
+
+    async def scenario():
+        task_id = await create_finished_task(memories=1, steps=3)
+        async with engine.connect() as conn:
+            purged = await runner.purge_tasks(conn, CUTOFF)
+        async with get_session() as session:
+            task = await session.get(Task, task_id)
+            steps = (await session.execute(select(TaskStep.id).where(TaskStep.task_id == task_id))).scalars().all()
+            memories = (
+                (await session.execute(select(ShortTermMemory.id).where(ShortTermMemory.task_id == task_id)))
+                .scalars()
+                .all()
+            )
+        return purged, task, steps, memories
+
+    purged, task, steps, memories = run(scenario())
+    assert purged == 0
+    assert task is not None
+    assert len(steps) == 3
+    assert memories == []
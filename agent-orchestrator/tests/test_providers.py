@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api.config import settings
+from llm.providers import CompletionRequest, LLMError, LLMProvider, ProviderRegistry
+
+
+def test_named_providers_are_built_at_startup(monkeypatch):
+    monkeypatch.setattr(settings, "llm_providers", {"fast": {"provider": "mock", "model": "mock-fast"}})
+    monkeypatch.setattr(settings, "llm_agent_providers", {"research": "fast", "builder": "default"})
+    registry = ProviderRegistry()
+    registry.configure()
+    try:
+        assert registry.for_agent("research").model == "mock-fast"
+        assert registry.for_agent("builder") is None
+    finally:
+        asyncio.run(registry.close())
+
+
+@pytest.mark.parametrize(
+    "named, mapping",
+    [
+        ({}, {"research": "fast"}),
+        ({"fast": {"provider": "mock", "temperature": "1"}}, {}),
+        ({"default": {"provider": "mock"}}, {}),
+    ],
+)
+def test_invalid_provider_configuration_fails(monkeypatch, named, mapping):
+    monkeypatch.setattr(settings, "llm_providers", named)
+    monkeypatch.setattr(settings, "llm_agent_providers", mapping)
+    with pytest.raises(ValueError):
+        ProviderRegistry().configure()
+
+
+def test_out_of_range_choice_index_raises_llm_error():
+    def handler(request):
+        return httpx.Response(200, json={"choices": [{"index": 5, "text": "stray"}], "usage": {}})
+
+    provider = LLMProvider("stray", "http://llm", "model", batch_size=1, transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        try:
+            await provider.complete(CompletionRequest(prompt="hello", max_tokens=8))
+        finally:
+            await provider.close()
+
+    with pytest.raises(LLMError):
+        asyncio.run(scenario())
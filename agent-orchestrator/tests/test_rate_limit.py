@@ -0,0 +1,26 @@
+import asyncio
+
+from api.rate_limit import RateLimiter
+
+
+def test_local_buckets_are_bounded_and_expire(monkeypatch):
+    limiter = RateLimiter(local_fraction=0.5, max_keys=3)
+
+    async def granted(keys, args):
+        return [args[2], 0]
+
+    monkeypatch.setattr(limiter, "_gcra", granted)
+
+    async def scenario():
+        for user in range(10):
+            assert (await limiter.hit(f"user:{user}", 10, 60)).allowed
+        kept = list(limiter._buckets)
+        limiter._buckets["user:7"].expires_at = 0
+        limiter._buckets["user:8"].expires_at = 0
+        await limiter.hit("user:10", 10, 60)
+        await limiter.redis.close()
+        return kept
+
+    kept = asyncio.run(scenario())
+    assert kept == ["user:7", "user:8", "user:9"]
+    assert list(limiter._buckets) == ["user:9", "user:10"]
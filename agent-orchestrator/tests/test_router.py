@@ -0,0 +1,34 @@
+import pytest
+
+from planner.router import DEFAULT_ROUTES, KeywordRouter
+
+
+def baseline_assign_agent(step: str) -> str:
+    lowered = step.lower()
+    if any(keyword in lowered for keyword in ["research", "analyze", "summarize"]):
+        return "research"
+    if any(keyword in lowered for keyword in ["deploy", "implement", "build", "code"]):
+        return "builder"
+    return "general"
+
+
+@pytest.mark.parametrize(
+    "step",
+    [
+        "Research and summarize the vendor options",
+        "Build, deploy and implement the code, then research the results",
+        "Implement the build pipeline and deploy the code to analyze later",
+        "Deploy the service and build the dashboard",
+        "Code review: implement fixes, build, deploy, build again",
+        "Summarize why the rebuild failed",
+        "Write a thank-you note",
+        "RESEARCH the BUILD system",
+    ],
+)
+def test_default_routes_match_baseline_priority(step):
+    assert KeywordRouter(DEFAULT_ROUTES).route(step) == baseline_assign_agent(step)
+
+
+def test_repeated_keyword_counts_once():
+    router = KeywordRouter({"research": {"analyze": 1.0}, "builder": {"build": 1.5}})
+    assert router.route("analyze analyze analyze the build") == "builder"
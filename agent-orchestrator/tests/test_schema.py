@@ -0,0 +1,57 @@
+import asyncio
+
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.database import Base
+from api.startup import upgrade_schema
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE tasks (id INTEGER PRIMARY KEY, user_id VARCHAR NOT NULL, description TEXT NOT NULL, "
+    "status VARCHAR(9) NOT NULL, created_at DATETIME, updated_at DATETIME, cost FLOAT, metadata JSON)",
+    "CREATE TABLE task_steps (id INTEGER PRIMARY KEY, task_id INTEGER NOT NULL REFERENCES tasks (id), "
+    "step_index INTEGER NOT NULL, instruction TEXT NOT NULL, status VARCHAR(9) NOT NULL, "
+    "agent_type VARCHAR NOT NULL, cost FLOAT)",
+    "CREATE TABLE tool_calls (id INTEGER PRIMARY KEY, task_id INTEGER NOT NULL REFERENCES tasks (id), "
+    "agent_type VARCHAR NOT NULL, tool_name VARCHAR NOT NULL, arguments JSON NOT NULL, created_at DATETIME)",
+    "CREATE TABLE long_term_memory (id INTEGER PRIMARY KEY, embedding_id INTEGER NOT NULL UNIQUE, "
+    "content TEXT NOT NULL, metadata JSON, created_at DATETIME)",
+    "INSERT INTO tasks (id, user_id, description, status, cost) VALUES (1, 'legacy', 'old task', 'completed', 0)",
+    "INSERT INTO task_steps (id, task_id, step_index, instruction, status, agent_type, cost) "
+    "VALUES (1, 1, 0, 'old step', 'completed', 'general', 0)",
+]
+
+
+def test_upgrade_adds_new_columns_and_indexes_to_existing_tables(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+
+    async def scenario():
+        try:
+            async with engine.begin() as conn:
+                for statement in LEGACY_SCHEMA:
+                    await conn.execute(text(statement))
+            for _ in range(2):
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                    await upgrade_schema(conn)
+            async with engine.connect() as conn:
+                columns = await conn.run_sync(
+                    lambda sync_conn: {
+                        table: {column["name"] for column in inspect(sync_conn).get_columns(table)}
+                        for table in ("task_steps", "tool_calls", "long_term_memory")
+                    }
+                )
+                indexes = await conn.run_sync(
+                    lambda sync_conn: {index["name"] for index in inspect(sync_conn).get_indexes("task_steps")}
+                )
+                depends_on = (await conn.execute(text("SELECT depends_on FROM task_steps WHERE id = 1"))).scalar_one()
+            return columns, indexes, depends_on
+        finally:
+            await engine.dispose()
+
+    columns, indexes, depends_on = asyncio.run(scenario())
+    assert "depends_on" in columns["task_steps"]
+    assert "cached" in columns["tool_calls"]
+    assert {"task_id", "user_id"} <= columns["long_term_memory"]
+    assert "ix_task_steps_task_id_step_index" in indexes
+    assert depends_on == "[]"
@@ -0,0 +1,43 @@
+import asyncio
+
+from memory.short_term import ShortTermMemoryStore
+
+
+def test_failed_eviction_keeps_pending_writes_without_failing_the_writer(monkeypatch):
+    store = ShortTermMemoryStore(max_tasks=1, flush_interval=3600)
+    inserted = []
+
+    async def failing_insert(rows):
+        raise RuntimeError("database unavailable")
+
+    async def recording_insert(rows):
+        inserted.extend(rows)
+
+    async def scenario():
+        await store.write(1, "plan", "draft", step_id=10)
+        monkeypatch.setattr(store, "_insert", failing_insert)
+        await store.write(2, "note", "second", step_id=20)
+        assert await store.read(1, "plan") == "draft"
+        monkeypatch.setattr(store, "_insert", recording_insert)
+        await store.flush()
+        store._flush_timer.cancel()
+
+    asyncio.run(scenario())
+    stored = {(row["task_id"], row["key"], row["value"]) for row in inserted}
+    assert stored == {(1, "plan", "draft"), (2, "note", "second")}
+
+
+def test_drain_returns_only_the_steps_own_writes():
+    store = ShortTermMemoryStore(max_tasks=8, flush_interval=3600)
+
+    async def scenario():
+        await store.write(1, "first", "a", step_id=10)
+        await store.write(1, "second", "b", step_id=11)
+        store._flush_timer.cancel()
+
+    asyncio.run(scenario())
+    assert store.drain(1, 10) == [{"task_id": 1, "key": "first", "value": "a"}]
+    assert store.drain(1, 10) == []
+    store.restore(1, [{"task_id": 1, "key": "first", "value": "a"}], 10)
+    assert {row["key"] for row in store.drain(1, 11)} == {"second"}
+    assert {row["key"] for row in store.drain(1, 10)} == {"first"}
@@ -0,0 +1,28 @@
+import asyncio
+
+import numpy as np
+
+from memory.vector_index import LocalVectorIndex
+from memory.vector_service import RemoteVectorIndex, VectorIndexServer
+
+
+def test_remote_clients_track_the_service_index_size(tmp_path):
+    async def scenario():
+        index = LocalVectorIndex(index_path=str(tmp_path / "index"))
+        server = VectorIndexServer(index, str(tmp_path / "vectors.sock"))
+        await server.start()
+        writer = RemoteVectorIndex(server.socket_path, 2, refresh_interval=0.01)
+        reader = RemoteVectorIndex(server.socket_path, 2, refresh_interval=0.01)
+        try:
+            await reader.start()
+            before = reader.ntotal
+            vectors = np.random.rand(3, index.persistence.dim).astype("float32")
+            await writer.add(np.arange(1, 4, dtype="int64"), vectors)
+            await asyncio.sleep(0.05)
+            return before, writer.ntotal, reader.ntotal
+        finally:
+            await writer.close()
+            await reader.close()
+            await server.stop()
+
+    assert asyncio.run(scenario()) == (0, 3, 3)